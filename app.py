@@ -9,11 +9,23 @@ from flask_babel import Babel, gettext as _
 import smtplib
 from email.message import EmailMessage
 import bcrypt
+import senhas
 from dotenv import load_dotenv
 import stripe
 from functools import wraps
 from t_lux_unlock_api import enviar_desbloqueio
 import requests
+import http_client
+import db_pool
+import catalogo
+from paginacao import paginar, limite_pagina
+from log_config import configurar_logging, definir_request_id, log, request_id_var
+import metricas
+import metricas_upstream
+import perfil_sql
+
+# Logging estruturado (JSON + fila) antes de criar o app: o Flask não instala o handler padrão
+configurar_logging()
 
 # =======================================
 # T-LUX Flask App — inicialização principal (única)
@@ -29,13 +41,60 @@ API_KEY = os.getenv("IREMOVAL_API")
 API_URL = os.getenv("IREMOVAL_ENDPOINT", "https://bulk.iremove.tools/api/dhru/api/index.php")
 
 if USERNAME and API_KEY:
-    print(f"✅ iRemoval API configurada para o usuário {USERNAME}")
+    log("INFO", f"✅ iRemoval API configurada para o usuário {USERNAME}")
 else:
-    print("⚠️ iRemoval API não configurada — verifique o arquivo .env")
+    log("WARNING", "⚠️ iRemoval API não configurada — verifique o arquivo .env")
 
 app = Flask(__name__, static_folder='static', static_url_path='/static')
 app.secret_key = os.getenv("APP_SECRET", "chave-super-secreta")
 
+# -----------------------
+# Request ID (logs + fornecedores + jobs)
+# -----------------------
+@app.before_request
+def _definir_request_id():
+    g.request_id = definir_request_id(request.headers.get("X-Request-ID"))
+
+@app.after_request
+def _devolver_request_id(response):
+    if getattr(g, "request_id", None):
+        response.headers["X-Request-ID"] = g.request_id
+    return response
+
+@app.teardown_request
+def _limpar_request_id(erro=None):
+    # Fora do request, o que a thread enfileirar/logar não herda o id do último request
+    request_id_var.set(None)
+
+# -----------------------
+# Métricas por request (tempo total, SQL, fornecedores, nº de queries) → /metrics
+# -----------------------
+@app.before_request
+def _iniciar_metricas():
+    if request.endpoint != "static":
+        metricas.iniciar_request()
+        # Profiler SQL: lista de queries do request (debug ou SQL_PROFILE=1)
+        if app.debug or perfil_sql.SQL_PROFILE:
+            perfil_sql.iniciar_rastreio()
+
+@app.after_request
+def _registrar_metricas(response):
+    endpoint = request.endpoint or "sem_rota"
+    metricas.registro.finalizar_request(endpoint, request.method, response.status_code)
+    rastreio = perfil_sql.finalizar_rastreio()
+    if rastreio is not None:
+        perfil_sql.verificar_orcamento(endpoint, rastreio, avisar=app.debug)
+        dados = perfil_sql.resumo(rastreio)
+        response.headers["X-SQL-Queries"] = str(dados["queries"])
+        response.headers["X-SQL-Time-Ms"] = str(dados["ms"])
+    return response
+
+@app.teardown_request
+def _registrar_metricas_com_erro(erro=None):
+    # Exceção não tratada: o after_request não roda e o 500 sumiria do /metrics
+    if metricas.registro.finalizar_pendente(request.endpoint or "sem_rota", request.method):
+        perfil_sql.finalizar_rastreio()
+
 # ⚠️ DEV ONLY: empurra um contexto global para evitar o erro enquanto limpamos o arquivo
 app.app_context().push()
 
@@ -66,52 +125,58 @@ STRIPE_PUBLIC_KEY = os.getenv("STRIPE_PUBLIC_KEY")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
 if STRIPE_SECRET_KEY:
     stripe.api_key = STRIPE_SECRET_KEY
-    print("✅ Stripe carregado com sucesso!")
+    # Só para testes/benchmark (fornecedor_simulado): nunca definir em produção
+    if os.getenv("STRIPE_API_BASE"):
+        stripe.api_base = os.getenv("STRIPE_API_BASE")
+    log("INFO", "✅ Stripe carregado com sucesso!")
 else:
-    print("⚠️ Stripe não configurado (STRIPE_SECRET_KEY ausente).")
+    log("WARNING", "⚠️ Stripe não configurado (STRIPE_SECRET_KEY ausente).")
 
 # -----------------------
 # Mapeamento de modelos para SERVICEID reais
 # -----------------------
+SERVICE_IDS_IREMOVAL = {
+    "iPhone 5S": 1,
+    "iPhone 6/6+": 2,
+    "iPhone SE/6S/6S+": 3,
+    "iPhone 7/7+": 4,
+    "iPhone 8/8+": 5,
+    "iPhone X": 6,
+    "iPhone XR": 74,
+    "iPhone XS": 74,
+    "iPhone XS Max": 74,
+    "iPhone 11": 75,
+    "iPhone 11 Pro": 76,
+    "iPhone 11 Pro Max": 77,
+    "iPhone 12 Mini": 78,
+    "iPhone 12": 79,
+    "iPhone 12 Pro": 80,
+    "iPhone 12 Pro Max": 81,
+    "iPhone 13 Mini": 82,
+    "iPhone 13": 83,
+    "iPhone 13 Pro": 84,
+    "iPhone 13 Pro Max": 85,
+    "iPhone SE (2ND GEN)": 99,
+    "iPhone SE (3RD GEN)": 100,
+    "iPhone 14": 101,
+    "iPhone 14 Plus": 102,
+    "iPhone 14 Pro": 103,
+    "iPhone 14 Pro Max": 104,
+    "iPhone 15": 105,
+    "iPhone 15 Plus": 106,
+    "iPhone 15 Pro": 107,
+    "iPhone 15 Pro Max": 108,
+    "iPhone 16": 230,
+    "iPhone 16 Plus": 231,
+    "iPhone 16 Pro": 229,
+    "iPhone 16 Pro Max": 228,
+    "iPhone 16e": 232,
+}
+
+
 def obter_service_id(modelo: str) -> int | None:
-    mapping = {
-        "iPhone 5S": 1,
-        "iPhone 6/6+": 2,
-        "iPhone SE/6S/6S+": 3,
-        "iPhone 7/7+": 4,
-        "iPhone 8/8+": 5,
-        "iPhone X": 6,
-        "iPhone XR": 74,
-        "iPhone XS": 74,
-        "iPhone XS Max": 74,
-        "iPhone 11": 75,
-        "iPhone 11 Pro": 76,
-        "iPhone 11 Pro Max": 77,
-        "iPhone 12 Mini": 78,
-        "iPhone 12": 79,
-        "iPhone 12 Pro": 80,
-        "iPhone 12 Pro Max": 81,
-        "iPhone 13 Mini": 82,
-        "iPhone 13": 83,
-        "iPhone 13 Pro": 84,
-        "iPhone 13 Pro Max": 85,
-        "iPhone SE (2ND GEN)": 99,
-        "iPhone SE (3RD GEN)": 100,
-        "iPhone 14": 101,
-        "iPhone 14 Plus": 102,
-        "iPhone 14 Pro": 103,
-        "iPhone 14 Pro Max": 104,
-        "iPhone 15": 105,
-        "iPhone 15 Plus": 106,
-        "iPhone 15 Pro": 107,
-        "iPhone 15 Pro Max": 108,
-        "iPhone 16": 230,
-        "iPhone 16 Plus": 231,
-        "iPhone 16 Pro": 229,
-        "iPhone 16 Pro Max": 228,
-        "iPhone 16e": 232,
-    }
-    return mapping.get(modelo)
+    """SERVICEID do modelo (nome normalizado; "iPhone 6+" acha "iPhone 6/6+")."""
+    return tabela_precos_app.atual().service_id(modelo)
 
 
 # -----------------------
@@ -131,7 +196,7 @@ def criar_ordem(service_id: int, imei: str):
     }
 
     try:
-        resp = requests.post(API_URL, data=payload, timeout=30)
+        resp = http_client.post(API_URL, data=payload, action="placeimeiorder")
         resp.raise_for_status()
         data = resp.json()
 
@@ -165,7 +230,7 @@ def consultar_ordem(order_id: int):
     }
 
     try:
-        resp = requests.post(API_URL, data=payload, timeout=30)
+        resp = http_client.post(API_URL, data=payload, action="getimeiorder")
         resp.raise_for_status()
         return resp.json()
     except Exception as e:
@@ -186,39 +251,20 @@ def processar_pedido(modelo: str, imei: str):
     resultado = criar_ordem(service_id, imei)
     if resultado["status"] == "success":
         order_id = resultado["order_id"]
-        print(f"✅ Ordem criada com sucesso! ORDERID={order_id}")
+        log("INFO", f"✅ Ordem criada com sucesso! ORDERID={order_id}")
         return {"status": "success", "order_id": order_id}
     else:
-        print("❌ Erro ao criar ordem:", resultado)
+        log("ERROR", f"❌ Erro ao criar ordem: {resultado}")
         return resultado
 
 def atualizar_servicos():
-    payload = {
-        "username": USERNAME,
-        "apiaccesskey": API_KEY,
-        "action": "services"
-    }
+    """Sincroniza o catálogo na thread atual (diff + transação única, ver catalogo.py)."""
     try:
-        resp = requests.post(API_URL, data=payload, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
-
-        conn = get_db()
-        c = conn.cursor()
-
-        for grupo in data.get("SERVICES", []):
-            group_name = grupo.get("GROUPNAME", "Outros")
-            for servico in grupo.get("SERVICES", []):
-                c.execute("""
-                    INSERT OR REPLACE INTO services (id, nome, credit, group_name)
-                    VALUES (?, ?, ?, ?)
-                """, (servico["ID"], servico["NAME"], servico["CREDIT"], group_name))
-
-        conn.commit()
-        # conn.close() — fechado pelo teardown
+        catalogo.sincronizar(get_db(), lambda: catalogo.buscar_lista(API_URL, USERNAME, API_KEY))
+        cache_catalogo.invalidar()
         return True
     except Exception as e:
-        print("Erro ao atualizar serviços:", e)
+        log("ERROR", f"Erro ao atualizar serviços: {e}")
         return False
 
 def consultar_status(order_ref):
@@ -229,7 +275,7 @@ def consultar_status(order_ref):
         "id": order_ref
     }
     try:
-        resp = requests.post(API_URL, data=payload, timeout=30)
+        resp = http_client.post(API_URL, data=payload, action="order")
         resp.raise_for_status()
         return resp.json()
     except Exception as e:
@@ -297,7 +343,7 @@ def init_db():
     def add_coluna(nome, tipo):
         if nome not in colunas:
             c.execute(f"ALTER TABLE transactions ADD COLUMN {nome} {tipo}")
-            print(f"✅ Coluna '{nome}' adicionada à tabela transactions.")
+            log("INFO", f"✅ Coluna '{nome}' adicionada à tabela transactions.")
 
     add_coluna("imei", "TEXT")
     add_coluna("order_id", "TEXT")
@@ -362,6 +408,12 @@ def enviar_para_iremoval(imei, modelo):
 # Função para criar ordem real via API iRemoval
 # -----------------------
 def criar_ordem(service_id, imei):
+    """
+    Cria a ordem no fornecedor. Em caso de erro, "falha" diz o que aconteceu:
+      - "rejeitada": o fornecedor respondeu e recusou (ERROR, 4xx) — não adianta repetir
+      - "nao_enviada": a requisição não chegou ao fornecedor — seguro repetir
+      - "ambigua": pode ter sido aceita (read timeout, 5xx, resposta ilegível)
+    """
     payload_order = {
         "apiaccesskey": API_KEY,  # tua chave da API
         "action": "placeimeiorder",
@@ -370,18 +422,28 @@ def criar_ordem(service_id, imei):
     }
 
     try:
-        resp = requests.post(API_URL, data=payload_order, timeout=30)
-        resp.raise_for_status()
+        resp = http_client.post(API_URL, data=payload_order, action="placeimeiorder")
+    except Exception as e:
+        falha = "nao_enviada" if http_client.nao_enviado(e) else "ambigua"
+        return {"status": "error", "falha": falha, "message": str(e)}
+
+    if resp.status_code == 429:
+        return {"status": "error", "falha": "nao_enviada", "message": "HTTP 429"}
+    if resp.status_code >= 500:
+        return {"status": "error", "falha": "ambigua", "message": f"HTTP {resp.status_code}"}
+    if resp.status_code >= 400:
+        return {"status": "error", "falha": "rejeitada", "message": f"HTTP {resp.status_code}"}
+    try:
         data = resp.json()
+    except ValueError:
+        return {"status": "error", "falha": "ambigua", "message": "Resposta inválida do fornecedor"}
 
-        if "SUCCESS" in data:
-            order_id = data["SUCCESS"][0].get("ORDERID")
+    if "SUCCESS" in data:
+        order_id = data["SUCCESS"][0].get("ORDERID")
+        if order_id:
             return {"status": "success", "order_id": order_id}
-        else:
-            return {"status": "error", "message": data}
-
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+        return {"status": "error", "falha": "ambigua", "message": data}
+    return {"status": "error", "falha": "rejeitada", "message": data}
 
 def consultar_status(order_id: str) -> dict:
     """
@@ -395,7 +457,7 @@ def consultar_status(order_id: str) -> dict:
     }
 
     try:
-        response = requests.post(DHRU_API_URL, data=payload, timeout=30)
+        response = http_client.post(DHRU_API_URL, data=payload, action="order_status")
         response.raise_for_status()
         result = response.json()
 
@@ -432,6 +494,19 @@ def consultar_status_unlock(tx_id):
             "message": result.get("message", "")
         }
 
+from dhruapi import consultar_ordens
+
+# O status é consultado um ID por chamada (mesmo endpoint/credenciais de
+# consultar_status); DHRU_STATUS_WORKERS chamadas rodam em paralelo.
+DHRU_STATUS_WORKERS = int(os.getenv("DHRU_STATUS_WORKERS", "4"))
+
+def consultar_status_lote(order_ids) -> dict:
+    """
+    Consulta o status de várias ordens em paralelo via consultar_status().
+    Retorna dict {order_id (str): resultado}, no mesmo formato de consultar_status().
+    """
+    return consultar_ordens(consultar_status, order_ids, DHRU_STATUS_WORKERS)
+
 
 # -----------------------
 # Função integrada de processamento automático
@@ -609,7 +684,7 @@ def set_language(lang):
     """Altera o idioma da sessão e redireciona de volta."""
     if lang in app.config["LANGUAGES"]:
         session["lang"] = lang
-        print(f"🌍 Idioma alterado para: {lang}")
+        log("INFO", f"🌍 Idioma alterado para: {lang}")
     return redirect(request.referrer or url_for("home"))
 
 LANGUAGES={
@@ -1064,7 +1139,7 @@ MODELOS_FULL_SIGNAL = [
 def unlock_page():
     """
     Solicita desbloqueio de iPhones via iRemoval/DHRU.
-    Salva transação com custo e lucro, envia ordem, atualiza status e registra order_id.
+    Salva transação com custo e lucro e enfileira a ordem (enviada por um worker em background).
     """
     user = current_user()
 
@@ -1092,43 +1167,19 @@ def unlock_page():
         )
 
         # -----------------------
-        # Cria ordem via API (iRemoval/DHRU)
+        # Enfileira a ordem (o envio ao iRemoval/DHRU roda em background)
         # -----------------------
-        resultado = processar_desbloqueio(modelo, imei, "credit", user_email)
-
-        if isinstance(resultado, dict) and resultado.get("status") == "success":
-            status = "success"
-            message = "Ordem enviada com sucesso! Verifique o painel para status."
-            order_id = resultado.get("order_id")
-
-            # Atualiza transação com order_id
-            conn = get_db()
-            c = conn.cursor()
-            c.execute("UPDATE transactions SET order_id=?, updated_at=? WHERE id=?",
-                      (order_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), tx_id))
-            conn.commit()
-            # conn.close() — fechado pelo teardown
-
-            # Feedback
+        order_id = None
+        if _submit_unlock_order(user_email, modelo, tx_id):
+            status = "pending"
+            message = "Pedido recebido! A ordem está sendo enviada ao fornecedor — acompanhe o status no painel."
             flash(f"✅ {message}", "success")
-            log("INFO", f"Desbloqueio {modelo} IMEI {imei} solicitado por {user_email}")
-
-            # Email de confirmação (não obrigatório)
-            try:
-                send_email(
-                    user_email,
-                    "T-Lux - Desbloqueio solicitado",
-                    f"Modelo: {modelo}\nIMEI: {imei}\nStatus: {status}\nOrder ID: {order_id}"
-                )
-            except Exception:
-                pass
-
+            app.logger.info(f"Desbloqueio {modelo} IMEI {imei} solicitado por {user_email} (tx {tx_id})")
         else:
             status = "failed"
-            message = f"Falha ao criar ordem: {resultado}"
-            order_id = None
+            message = "Falha ao registrar o pedido. Tente novamente."
             flash(f"❌ {message}", "danger")
-            log("ERROR", f"Falha no desbloqueio {modelo} IMEI {imei}: {resultado}")
+            app.logger.error(f"Falha ao enfileirar desbloqueio {modelo} IMEI {imei} (tx {tx_id})")
 
         # -----------------------
         # Renderiza resultado
@@ -1149,7 +1200,7 @@ def unlock_page():
     # -----------------------
     # GET: exibe formulário
     # -----------------------
-    return render_template("unlock.html", modelos=MODELOS_IPHONE)
+    return render_template("unlock.html", modelos=tabela_precos_app.atual().modelos)
 
 import os
 from flask import Flask, request, session, redirect, url_for, render_template, flash
@@ -1188,28 +1239,64 @@ IMEI_BASE_URL = os.getenv("IMEI_BASE_URL", "https://api.imei.info")
 # -----------------------
 UNLOCK_PRECOS = {}
 
+# -----------------------
+# Livro de preços compilado (tabela_precos.py)
+# -----------------------
+# Os dicts acima são os valores padrão; PRICEBOOK_FILE (JSON com as mesmas
+# chaves) sobrescreve e é recarregado a quente quando muda.
+from tabela_precos import TabelaPrecos
+
+PRICEBOOK_FILE = os.getenv("PRICEBOOK_FILE", os.path.join(BASE_DIR, "precos.json"))
+tabela_precos_app = TabelaPrecos(
+    padrao={
+        "sinal": MODELOS_IPHONE_USD_SINAL,
+        "sem_sinal": MODELOS_IPHONE_SEM_SINAL_USD,
+        "custo_sinal": PRECO_IREMOVAL_USD,
+        "custo_sem_sinal": PRECO_IREMOVAL_SEM_SINAL_USD,
+        "unlock": UNLOCK_PRECOS,
+        "service_ids": SERVICE_IDS_IREMOVAL,
+        "pacotes": PACOTES,
+    },
+    taxas=EXCHANGE_RATES,
+    arquivo=PRICEBOOK_FILE,
+)
+
+# -----------------------
+# Câmbio (cambio.py)
+# -----------------------
+# EXCHANGE_RATES acima é o valor de partida; EXCHANGE_RATES_SOURCE (URL de API
+# ou arquivo JSON) é consultada a cada CAMBIO_INTERVALO segundos e cada mudança
+# fica gravada no banco (cambio_lotes / cambio_taxas). Taxas novas remontam o
+# livro de preços.
+import cambio
+
+CAMBIO_REFRESH_ENABLED = os.getenv("CAMBIO_REFRESH_ENABLED", "1") == "1"
+servico_cambio = cambio.ServicoCambio(
+    db_pool.DB_FILE,
+    fonte=cambio.fonte_de_config(os.getenv("EXCHANGE_RATES_SOURCE", ""), EXCHANGE_RATES),
+    padrao=EXCHANGE_RATES,
+)
+servico_cambio.ao_atualizar(lambda taxas: tabela_precos_app.recarregar(taxas=taxas))
+
 # -----------------------
 # Banco de Dados (SQLite) + Inicialização
 # -----------------------
 from flask import g
 import sqlite3, os
 
-DB_FILE = os.getenv("DB_FILE", os.path.join(os.path.dirname(__file__), "t-lux.db"))
+DB_FILE = db_pool.DB_FILE
 
 def get_db():
-    """Abre conexão SQLite com suporte a múltiplas threads e WAL ativo"""
+    """Conexão SQLite da thread atual (pool em db_pool: WAL e PRAGMAs já aplicados)"""
     if "db" not in g:
-        g.db = sqlite3.connect(DB_FILE, timeout=30, check_same_thread=False)
-        g.db.row_factory = sqlite3.Row
-        g.db.execute("PRAGMA journal_mode=WAL")
-        g.db.execute("PRAGMA foreign_keys = ON")
+        g.db = db_pool.get_connection()
     return g.db
 
 @app.teardown_appcontext
 def close_connection(exception):
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        db.close()  # devolve ao pool (rollback do que ficou pendente)
 
 def init_db():
     """Cria todas as tabelas necessárias se não existirem"""
@@ -1226,26 +1313,28 @@ def init_db():
     """)
     conn.commit()
     
-DB_PATH = os.getenv("DB_FILE", os.path.join(os.path.dirname(__file__), "t-lux.db"))
+DB_PATH = db_pool.DB_FILE
 SQL_FILE = os.path.join(os.path.dirname(__file__), "migrate_all.sql")
+from migrate_db import aplicar_migracoes  # migrações versionadas (migrations/NNNN_*.sql)
 
 def migrate_database():
-    print("🚀 Iniciando migração automática do banco T-Lux...")
+    log("INFO", "🚀 Iniciando migração automática do banco T-Lux...")
     if not os.path.exists(SQL_FILE):
-        print("❌ Arquivo migrate_all.sql não encontrado.")
+        log("ERROR", "❌ Arquivo migrate_all.sql não encontrado.")
         return
 
     with open(SQL_FILE, "r", encoding="utf-8") as f:
         sql_script = f.read()
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = db_pool.get_connection(DB_PATH)
     c = conn.cursor()
     try:
         c.executescript(sql_script)
         conn.commit()
-        print("✅ Migração concluída com sucesso.")
+        aplicar_migracoes(conn)
+        log("INFO", "✅ Migração concluída com sucesso.")
     except Exception as e:
-        print(f"⚠️ Erro durante a migração: {e}")
+        log("WARNING", f"⚠️ Erro durante a migração: {e}")
     finally:
         conn.close()
 # -----------------------
@@ -1256,21 +1345,19 @@ def clean_expired_codes():
     db.execute("DELETE FROM verification_codes WHERE expires_at < datetime('now')")
     db.commit()
 
+# Eventos gravados em lote por uma thread (event_log): nada de INSERT+COMMIT por request
+from event_log import EventLog
+
+EVENT_LOG_ASYNC = os.getenv("EVENT_LOG_ASYNC", "1") == "1"
+log_eventos = EventLog(DB_FILE)
+
 def registrar_evento(user_id, descricao):
     import sqlite3
     try:
-        # 🔒 Abre conexão nova, totalmente independente do Flask
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("""
-            INSERT INTO eventos (user_id, descricao, data)
-            VALUES (?, ?, datetime('now', 'localtime'))
-        """, (user_id, descricao))
-        conn.commit()
-        # conn.close() — fechado pelo teardown
-        print(f"[OK] Evento registrado para o usuário {user_id}: {descricao}")
+        # Só vai para o buffer; a thread de eventos grava a cada EVENT_FLUSH_MS / EVENT_FLUSH_ROWS
+        log_eventos.registrar(user_id, descricao)
     except Exception as e:
-        print(f"[ERRO] Falha ao registrar evento: {e}")
+        log("ERROR", f"[ERRO] Falha ao registrar evento: {e}")
 
         # -----------------------
         # USERS
@@ -1484,7 +1571,7 @@ def registrar_evento(user_id, descricao):
         for email, password, is_admin in usuarios_iniciais:
             c.execute("SELECT id FROM users WHERE email = ?", (email,))
             if c.fetchone() is None:
-                pw_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+                pw_hash = senhas.hash_senha(password)
                 c.execute("""
                     INSERT INTO users (email, password_hash, is_admin, region, email_verified, created_at)
                     VALUES (?, ?, ?, ?, ?, ?)
@@ -1502,13 +1589,10 @@ def get_preco(modelo: str, sem_sinal: bool) -> tuple[float, float, float]:
     Retorna (preco_venda, preco_fornecedor, lucro) para o modelo.
     Levanta KeyError se não existir.
     """
-    if sem_sinal:
-        pv = MODELOS_IPHONE_SEM_SINAL_USD[modelo]
-        pf = PRECO_IREMOVAL_SEM_SINAL_USD[modelo]
-    else:
-        pv = MODELOS_IPHONE_USD[modelo]
-        pf = PRECO_IREMOVAL_USD.get(modelo, 0.0)
-    return pv, pf, round(pv - pf, 2)
+    item = tabela_precos_app.atual().preco(modelo, sem_sinal=sem_sinal)
+    if item is None or item.custo_usd is None:
+        raise KeyError(modelo)
+    return item.preco_usd, item.custo_usd, item.margem_usd
 
 
 def gravar_transacao_unlock(user_id: int, modelo: str, imei: str, sem_sinal: int, preco_venda: float, preco_fornecedor: float, lucro: float) -> int:
@@ -1532,21 +1616,72 @@ def generate_license_key():
 def now_str():
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-def current_user():
-    """Retorna o utilizador logado com base na sessão."""
-    user_id = session.get("user_id")
-    if not user_id:
-        return None
+# -----------------------
+# Cache do utilizador logado
+# -----------------------
+# Nível 1: g._current_user — um único SELECT por request (hard_guards,
+#          inject_user, require_role e a view compartilham o mesmo dict).
+#          Guarda junto o objeto request: o app_context empurrado no import
+#          faz o `g` sobreviver entre requests da mesma thread.
+# Nível 2: cache em memória entre requests, com TTL curto (USER_CACHE_TTL,
+#          segundos; 0 desativa). Invalidado nas ações que alteram o usuário.
+import threading
+import time
+from functools import lru_cache
 
-    conn = get_db()
-    c = conn.cursor()
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "5"))
+
+_cache_usuarios = {}  # user_id -> (expira_em, dict)
+_cache_usuarios_lock = threading.Lock()
+_SEM_USUARIO = object()
+
+
+def invalidar_cache_usuario(user_id=None):
+    """Remove o usuário do cache (ou todo o cache se user_id for None)."""
+    with _cache_usuarios_lock:
+        if user_id is None:
+            _cache_usuarios.clear()
+        else:
+            _cache_usuarios.pop(int(user_id), None)
+    if g and g.get("_current_user"):
+        user = g._current_user[1]
+        if user_id is None or user is _SEM_USUARIO or user.get("id") == int(user_id):
+            g.pop("_current_user", None)
+
+
+def _carregar_usuario(user_id):
+    if USER_CACHE_TTL > 0:
+        with _cache_usuarios_lock:
+            item = _cache_usuarios.get(user_id)
+        if item and item[0] > time.monotonic():
+            return dict(item[1])
+
+    c = get_db().cursor()
     c.execute("SELECT * FROM users WHERE id = ?", (user_id,))
     row = c.fetchone()
-
     if not row:
         return None
 
     user = dict(row)
+    if USER_CACHE_TTL > 0:
+        with _cache_usuarios_lock:
+            _cache_usuarios[user_id] = (time.monotonic() + USER_CACHE_TTL, dict(user))
+    return user
+
+
+def current_user():
+    """Retorna o utilizador logado com base na sessão (cacheado por request)."""
+    user_id = session.get("user_id")
+    if not user_id:
+        return None
+
+    atual = request._get_current_object()
+    req, user = g.get("_current_user") or (None, None)
+    if req is atual and (user is _SEM_USUARIO or user.get("id") == user_id):
+        return None if user is _SEM_USUARIO else user
+
+    user = _carregar_usuario(user_id)
+    g._current_user = (atual, user if user is not None else _SEM_USUARIO)
     # ✅ NÃO fecha conn aqui (Flask gerencia automaticamente)
     return user
 
@@ -1574,14 +1709,14 @@ def _issue_license_from_tx(tx_id):
         return False
 
     # Recupera info do pacote
-    pacote_info = PACOTES_USD.get(pacote)
+    pacote_info = tabela_precos_app.atual().pacote(pacote)
     if not pacote_info:
         # conn.close() — fechado pelo teardown
         app.logger.error(f"Pacote {pacote} não existe.")
         return False
 
     # Calcula validade da licença
-    dias = pacote_info.get("duration_days", 7)
+    dias = pacote_info.get("dias", 7)
     expiry_date = datetime.now() + timedelta(days=dias)
     access_key = secrets.token_hex(16)
 
@@ -1616,6 +1751,7 @@ def _issue_license_from_tx(tx_id):
     """, ("license_issued", now_str(), tx_id))
 
     conn.commit()
+    invalidar_cache_usuario(user_id)
     # conn.close() — fechado pelo teardown
 
     app.logger.info(f"✅ Licença emitida para user {user_id} (pacote {pacote}, expira em {expiry_date}).")
@@ -1640,16 +1776,16 @@ mail = Mail(app)
 def send_email(to_email: str, subject: str, body_text: str = None, body_html: str = None, bcc: list[str] = None):
     try:
         # --- Desativado temporariamente ---
-        print("📧 [DEBUG - EMAIL DESATIVADO]")
-        print(f"Para: {to_email}")
-        print(f"Assunto: {subject}")
+        log("DEBUG", "📧 [DEBUG - EMAIL DESATIVADO]")
+        log("DEBUG", f"Para: {to_email}")
+        log("DEBUG", f"Assunto: {subject}")
         if body_text:
-            print("Texto:", body_text)
+            log("DEBUG", f"Texto: {body_text}")
         if body_html:
-            print("HTML:", body_html)
+            log("DEBUG", f"HTML: {body_html}")
         return True
     except Exception as e:
-        print(f"❌ [EMAIL] ERRO simulado ao enviar para {to_email}: {e}")
+        log("ERROR", f"❌ [EMAIL] ERRO simulado ao enviar para {to_email}: {e}")
         return False
 
 # 🔹 Rota de teste de envio (apenas admin)
@@ -1678,38 +1814,34 @@ def _debug_email():
 # -----------------------
 # Função de envio de e-mail (T-Lux via Zoho)
 # -----------------------
-from email.message import EmailMessage
-import smtplib, ssl
+# O envio SMTP roda nos workers de email_service (sessão Zoho persistente,
+# lotes, retry). send_email() só grava na fila e retorna na hora.
+from email_service import ServicoEmail
+from email_templates import precompilar as precompilar_emails, renderizar_email
+from job_queue import JobQueue
+
+EMAIL_QUEUE_ENABLED = os.getenv("EMAIL_QUEUE_ENABLED", "1") == "1"
+servico_email = ServicoEmail(JobQueue(DB_FILE))
 
-def send_email(to_email, subject, body_text=None, body_html=None):
+def send_email(to_email, subject, body_text=None, body_html=None, bcc=None):
     """
-    Envia e-mails usando Zoho SMTP com suporte a HTML.
-    As credenciais são carregadas do .env.
+    Enfileira um e-mail (texto e/ou HTML) para envio via Zoho SMTP.
+    As credenciais são carregadas do .env pelos workers de envio.
     """
-    smtp_host = os.getenv("ZOHO_SMTP_HOST", "smtp.zoho.com")
-    smtp_port = int(os.getenv("ZOHO_SMTP_PORT", 587))
-    smtp_user = os.getenv("ZOHO_SMTP_USER")
-    smtp_pass = os.getenv("ZOHO_SMTP_PASS")
-
-    msg = EmailMessage()
-    msg["From"] = f"T-Lux Systems <{smtp_user}>"
-    msg["To"] = to_email
-    msg["Subject"] = subject
-
-    # HTML ou texto simples
-    if body_html:
-        msg.add_alternative(body_html, subtype="html")
-    else:
-        msg.set_content(body_text or "")
-
-    # Conexão segura
-    context = ssl.create_default_context()
-    with smtplib.SMTP(smtp_host, smtp_port) as server:
-        server.starttls(context=context)
-        server.login(smtp_user, smtp_pass)
-        server.send_message(msg)
+    try:
+        servico_email.enfileirar(to_email, subject, body_text=body_text, body_html=body_html, bcc=bcc)
+    except Exception as e:
+        log("ERROR", f"❌ [E-MAIL] Falha ao enfileirar e-mail para {to_email}: {e}")
+        return False
+    log("INFO", f"📨 [E-MAIL] Enfileirado para {to_email}")
+    return True
 
-    print(f"✅ [E-MAIL] Enviado com sucesso para {to_email}")
+def _idioma_email(padrao="en"):
+    """Idioma dos e-mails transacionais: o da sessão/navegador quando há request."""
+    try:
+        return get_locale() or padrao
+    except Exception:
+        return padrao
 
 #---------------------------
 # Bloqueio de tentativas
@@ -1725,8 +1857,38 @@ BLOCK_TIME_MINUTES = LOGIN_BLOCK_MINUTES
 def _now_iso():
     return datetime.now(UTC).isoformat()
 
+# Contadores de falhas em memória (rate_limiter); só o bloqueio vai para o banco
+from rate_limiter import LoginLimiter
+
+def _persistir_bloqueio(email: str, ip: str, ate_epoch: float) -> None:
+    """Grava a decisão de bloqueio em blocked_users (visível para todos os workers)."""
+    blocked_until = datetime.fromtimestamp(ate_epoch, UTC).isoformat()
+    try:
+        conn = get_db()
+        c = conn.cursor()
+        c.execute(
+            "UPDATE blocked_users SET blocked_until = ? WHERE email = ? AND ip_address = ?",
+            (blocked_until, email, ip),
+        )
+        if c.rowcount == 0:
+            c.execute(
+                "INSERT INTO blocked_users (email, ip_address, blocked_until) VALUES (?, ?, ?)",
+                (email, ip, blocked_until),
+            )
+        conn.commit()
+        app.logger.warning(f"🚫 [LOGIN] Bloqueado até {blocked_until}: {email} / {ip}")
+    except Exception as e:
+        app.logger.error(f"[DB ERROR] block_user failed: {e}")
+
+limitador_login = LoginLimiter(
+    MAX_FAILED_ATTEMPTS, BLOCK_TIME_MINUTES, BLOCK_TIME_MINUTES,
+    persistir_bloqueio=_persistir_bloqueio,
+)
+
 def is_blocked(email: str, ip: str) -> bool:
-    """Verifica se email OU IP está bloqueado neste momento."""
+    """Verifica se email OU IP está bloqueado neste momento (cache local, depois o banco)."""
+    if limitador_login.bloqueado_localmente(email, ip):
+        return True
     conn = get_db()
     c = conn.cursor()
     now = _now_iso()
@@ -1744,90 +1906,25 @@ def is_blocked(email: str, ip: str) -> bool:
 
 def failed_attempts(email: str, ip: str) -> int:
     """
-    Conta tentativas falhadas recentes para este email+IP dentro da janela BLOCK_TIME_MINUTES.
-    Considera status='failed'.
+    Tentativas falhadas recentes (email ou IP) na janela BLOCK_TIME_MINUTES.
+    Lido da memória do processo — não consulta o banco.
     """
-    conn = get_db()
-    c = conn.cursor()
-    time_limit = (datetime.now(UTC) - timedelta(minutes=BLOCK_TIME_MINUTES)).isoformat()
-    c.execute(
-        """
-        SELECT COUNT(*) AS total
-        FROM login_attempts
-        WHERE (email = ? OR ip_address = ?)
-          AND status = 'failed'
-          AND created_at >= ?
-        """,
-        (email, ip, time_limit),
-    )
-    row = c.fetchone()
-    # row pode ser tupla (0) ou dict-like; normaliza pra int
-    try:
-        return int(row[0] if row is not None else 0)
-    except Exception:
-        return int((row["total"] if row and "total" in row.keys() else 0))
+    return limitador_login.falhas_recentes(email, ip)
+
+def block_user(email: str, ip: str) -> None:
+    """Bloqueia email+IP por BLOCK_TIME_MINUTES (não regrava se já estiver bloqueado)."""
+    limitador_login.bloquear(email, ip)
 
 def register_login_attempt(email: str, ip: str, status: str, conn=None) -> None:
     """
-    Registra tentativa (success/failed) e aplica bloqueio se exceder o limite.
-    Usa a conexão passada ou get_db(); NÃO fecha aqui (teardown fecha no fim da request).
+    Registra tentativa (success/failed) no limitador em memória e bloqueia
+    se exceder o limite. Só a decisão de bloqueio escreve no banco.
+    `conn` é aceito por compatibilidade com as chamadas antigas.
     """
-    close_after = False
-    if conn is None:
-        conn = get_db()
-        close_after = True
-
-    c = conn.cursor()
-    try:
-        # 1) Registra a tentativa
-        c.execute(
-            """
-            INSERT INTO login_attempts (email, ip_address, status, created_at)
-            VALUES (?, ?, ?, ?)
-            """,
-            (email, ip, status, _now_iso()),
-        )
-        conn.commit()
-
-        # 2) Se falhou, checa se deve bloquear
-        if status == "failed":
-            total = failed_attempts(email, ip)
-            if total >= MAX_FAILED_ATTEMPTS:
-                blocked_until = (datetime.now(UTC) + timedelta(minutes=BLOCK_TIME_MINUTES)).isoformat()
-
-                # Atualiza ou insere novo bloqueio
-                c.execute(
-                    """
-                    UPDATE blocked_users
-                       SET blocked_until = ?
-                     WHERE email = ? OR ip_address = ?
-                    """,
-                    (blocked_until, email, ip),
-                )
-                if c.rowcount == 0:
-                    c.execute(
-                        """
-                        INSERT INTO blocked_users (email, ip_address, blocked_until)
-                        VALUES (?, ?, ?)
-                        """,
-                        (email, ip, blocked_until),
-                    )
-                conn.commit()
-
-    except Exception as e:
-        try:
-            conn.rollback()
-        except Exception:
-            pass
-        app.logger.error(f"[DB ERROR] register_login_attempt failed: {e}")
-
-    finally:
-        # opcional: fecha se foi aberta internamente
-        if close_after:
-            try:
-                conn.close()
-            except Exception:
-                pass
+    if status == "failed":
+        limitador_login.registrar_falha(email, ip)
+    else:
+        limitador_login.registrar_sucesso(email, ip)
 
 # -----------------------
 # Password Reset (Forgot Password)
@@ -1907,10 +2004,15 @@ def reset_password():
             return redirect(url_for("forgot_password"))
 
         # atualiza senha
-        hashed = bcrypt.hashpw(new_password.encode("utf-8"), bcrypt.gensalt())
-        c.execute("UPDATE users SET password=?, email_verified=1 WHERE id=?", (hashed, row["user_id"]))
+        try:
+            hashed = senhas.hash_senha(new_password)
+        except senhas.SobrecargaSenhas:
+            flash(_("⏳ Server busy. Please try again in a moment."), "warning")
+            return redirect(url_for("reset_password"))
+        c.execute("UPDATE users SET password_hash=?, email_verified=1 WHERE id=?", (hashed, row["user_id"]))
         c.execute("UPDATE verification_codes SET used=1 WHERE id=?", (row["id"],))
         conn.commit()
+        invalidar_cache_usuario(row["user_id"])
 
         registrar_evento(row["user_id"], "Password reset successfully")
         flash(_("✅ Password reset successful. You can now log in."), "success")
@@ -2060,6 +2162,7 @@ def verify_email_token(token: str) -> Tuple[bool, str]:
         c.execute("UPDATE users SET email_verified = 1 WHERE id = ?", (user_id,))
         c.execute("UPDATE email_verifications SET used = 1 WHERE id = ?", (row["id"],))
         conn.commit()
+        invalidar_cache_usuario(user_id)
 
         return True, "✅ Email verified successfully!"
 
@@ -2069,7 +2172,7 @@ def verify_email_token(token: str) -> Tuple[bool, str]:
             conn.rollback()
         except Exception:
             pass
-        print(f"[DB ERROR] verify_email_token failed: {e}")
+        log("ERROR", f"[DB ERROR] verify_email_token failed: {e}")
         return False, "❌ An unexpected error occurred during verification."
 
     # ❌ NÃO fecha a conexão aqui — o teardown faz isso automaticamente
@@ -2170,35 +2273,11 @@ def create_verification_code(email: str, user_id: Optional[int] = None, length:
     subject = "🔐 Your T-Lux Verification Code"
     minutes_lbl = f"{minutes_valid} minute{'s' if minutes_valid != 1 else ''}"
 
-    body_text = (
-        f"T-Lux Verification\n\n"
-        f"Your verification code is: {code}\n"
-        f"This code will expire in {minutes_lbl}.\n\n"
-        f"If you did not request this, just ignore this email.\n"
-        f"— T-Lux Unlock Systems"
+    body_html, body_text = renderizar_email(
+        "email_codigo_otp.html", _idioma_email(),
+        code=code, minutes_lbl=minutes_lbl,
     )
 
-    body_html = f"""
-    <div style="font-family:Arial,sans-serif;background:#f7f7f7;padding:20px;">
-      <div style="max-width:600px;margin:auto;background:#ffffff;padding:28px;border-radius:12px;
-                  box-shadow:0 6px 18px rgba(0,0,0,0.08);text-align:center;">
-        <h2 style="color:#d4af37;margin-bottom:6px;">🔐 T-Lux Verification</h2>
-        <p style="color:#555;">Use the code below to continue your verification:</p>
-        <div style="margin:20px 0;">
-          <span style="display:inline-block;font-size:30px;letter-spacing:8px;color:#0d6efd;
-                       font-weight:800;border:2px dashed #0d6efd;border-radius:10px;padding:12px 20px;">
-            {code}
-          </span>
-        </div>
-        <p style="color:#555;">This code will expire in <strong>{minutes_lbl}</strong>.</p>
-        <hr style="border:none;border-top:1px solid #eee;margin:25px 0;">
-        <p style="font-size:12px;color:#777;">
-          © 2025 T-Lux Unlock Systems — Secure Global Platform
-        </p>
-      </div>
-    </div>
-    """
-
     try:
         send_email(email, subject, body_text=body_text, body_html=body_html)
         app.logger.info(f"✅ Verification code sent to {email}")
@@ -2406,7 +2485,7 @@ def _issue_license_from_tx(tx_id: int):
         return True, "Transação não é de pacote (nenhuma licença emitida)."
 
     pacote = tx["pacote"]
-    duration_days = PACOTES.get(pacote, {}).get("duration_days", 30)
+    duration_days = (tabela_precos_app.atual().pacote(pacote) or {}).get("dias", 30)
     expires_at = (datetime.now() + timedelta(days=duration_days)).strftime("%Y-%m-%d %H:%M:%S")
     license_key = generate_license_key()
 
@@ -2418,6 +2497,7 @@ def _issue_license_from_tx(tx_id: int):
     c.execute("UPDATE users SET access_key=?, access_expiry=? WHERE id=?",
               (license_key, expires_at, tx["user_id"]))
     conn.commit()
+    invalidar_cache_usuario(tx["user_id"])
 
     # Notifica usuário
     c.execute("SELECT email, language FROM users WHERE id=?", (tx["user_id"],))
@@ -2454,14 +2534,13 @@ def get_currency_for_region(region_code):
 
 def convert_local_to_usd(local_amount, currency_code):
     """
-    Converte um valor local (ex: MZN) para USD usando EXCHANGE_RATES.
+    Converte um valor local (ex: MZN) para USD com as taxas atuais do servico_cambio.
+    Moeda desconhecida é tratada como USD.
     """
-    rate = EXCHANGE_RATES.get(currency_code or "USD", 1.0)
     try:
-        rate = float(rate) if rate else 1.0
-    except Exception:
-        rate = 1.0
-    return round(float(local_amount) / rate, 2)
+        return servico_cambio.para_usd([float(local_amount)], currency_code)[0]
+    except KeyError:
+        return round(float(local_amount), 2)
 
 # -----------------------
 # Rotas principais
@@ -2520,7 +2599,11 @@ def register():
             return redirect(url_for("register"))
 
         # 4️⃣ Hash password
-        hashed_pw = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+        try:
+            hashed_pw = senhas.hash_senha(password)
+        except senhas.SobrecargaSenhas:
+            flash("⏳ Server busy. Please try again in a moment.", "warning")
+            return redirect(url_for("register"))
 
         conn = get_db()
         c = conn.cursor()
@@ -2564,8 +2647,8 @@ def register():
 
             # 9️⃣ Send verification email
             try:
-                html_body = render_template(
-                    "email_verificacao.html",
+                html_body, _texto = renderizar_email(
+                    "email_verificacao_message.html", _idioma_email(),
                     first_name=first_name,
                     link_verificacao=verify_link
                 )
@@ -2677,6 +2760,7 @@ def verify_email_route(token=None):
             c.execute("UPDATE users SET email_verified=1 WHERE id=?", (user_id,))
             c.execute("UPDATE email_tokens SET used=1 WHERE token=?", (token,))
             conn.commit()
+            invalidar_cache_usuario(user_id)
 
             registrar_evento(user_id, "Email verified via link")
             flash(_("✅ Your email has been verified successfully!"), "success")
@@ -2720,6 +2804,7 @@ def verify_email_route(token=None):
             c.execute("UPDATE users SET email_verified=1 WHERE id=?", (user_id,))
             c.execute("UPDATE verification_codes SET used=1 WHERE id=?", (vc["id"],))
             conn.commit()
+            invalidar_cache_usuario(user_id)
 
             registrar_evento(user_id, "Email verified via OTP")
 
@@ -2808,6 +2893,7 @@ def verify_step2():
         # Marca o e-mail como verificado
         c.execute("UPDATE users SET email_verified=1 WHERE id=?", (user_id,))
         conn.commit()
+        invalidar_cache_usuario(user_id)
 
         registrar_evento(user_id, "Email verified via OTP (2-step)")
 
@@ -2855,9 +2941,14 @@ def login():
             flash("❌ Invalid email or password.", "danger")
             return render_template("login.html")
 
-        # 2️⃣ Password validation
+        # 2️⃣ Password validation (pool de bcrypt; sobrecarga → 503 imediato)
         stored_pw = user["password_hash"]
-        if not bcrypt.checkpw(password, stored_pw.encode("utf-8")):
+        try:
+            senha_ok = senhas.verificar_senha(password, stored_pw)
+        except senhas.SobrecargaSenhas:
+            flash("⏳ Server busy. Please try again in a moment.", "warning")
+            return render_template("login.html"), 503
+        if not senha_ok:
             register_login_attempt(email, ip, "failed", conn=conn)
             if failed_attempts(email, ip) >= MAX_FAILED_ATTEMPTS:
                 block_user(email, ip)
@@ -2866,6 +2957,15 @@ def login():
                 flash("❌ Invalid email or password.", "danger")
             return render_template("login.html")
 
+        # Custo do bcrypt mudou (BCRYPT_ROUNDS): regrava o hash com a senha correta
+        if senhas.precisa_rehash(stored_pw):
+            try:
+                c.execute("UPDATE users SET password_hash=? WHERE id=?", (senhas.hash_senha(password), user["id"]))
+                conn.commit()
+                invalidar_cache_usuario(user["id"])
+            except Exception as e:
+                app.logger.warning(f"[LOGIN] Rehash da senha falhou para {email}: {e}")
+
         # 3️⃣ Blocked or unapproved users
         if "blocked" in user.keys() and user["blocked"]:
             flash("🚫 Your account is currently blocked. Contact support.", "danger")
@@ -2880,6 +2980,7 @@ def login():
             try:
                 c.execute("UPDATE users SET email_verified=1 WHERE email=?", (email,))
                 conn.commit()
+                invalidar_cache_usuario()
             except Exception as e:
                 app.logger.warning(f"[ADMIN VERIFY] Failed: {e}")
 
@@ -2891,14 +2992,15 @@ def login():
             create_verification_code(email, user_id=user["id"], length=8, minutes_valid=10)
 
             try:
-                html_body = render_template(
-                    "email_verificacao.html",
+                html_body, text_body = renderizar_email(
+                    "email_verificacao_message.html", _idioma_email(),
                     first_name=user["first_name"],
                     link_verificacao=verify_url
                 )
                 send_email(
                     to_email=email,
                     subject="🔐 Verify your email — T-Lux Unlock Systems",
+                    body_text=text_body,
                     body_html=html_body
                 )
                 flash("📩 A new verification link and code were sent to your email.", "info")
@@ -2986,8 +3088,8 @@ def resend_verification_code_route():
         create_verification_code(email, user_id=user_id, length=8, minutes_valid=10)
 
         # 🔹 Monta o corpo do e-mail
-        html_body = render_template(
-            "email_verificacao.html",
+        html_body, _texto = renderizar_email(
+            "email_verificacao_message.html", _idioma_email(),
             first_name=user["first_name"],
             link_verificacao=verify_link
         )
@@ -3097,24 +3199,30 @@ def check_email():
 # -----------------------
 # Verifica se usuário tem licença ativa
 # -----------------------
+@lru_cache(maxsize=4096)
+def _parse_expiry(valor: str) -> datetime:
+    """access_expiry (ISO) → datetime; memoizado, o mesmo texto é lido a cada request."""
+    return datetime.fromisoformat(valor)
+
 def has_active_access(user):
     """
     Verifica se o usuário tem licença ativa OU é um usuário demo.
+    Aceita dict ou sqlite3.Row.
     """
     if not user:
         return False
 
     # ✅ Permite acesso livre ao modo demo
-    if user.get("email") == "demo@tlux-unlock.com":
+    if user["email"] == "demo@tlux-unlock.com":
         return True
 
     try:
-        exp = user.get("access_expiry")
+        exp = user["access_expiry"]
         if not exp:
             return False
 
         if isinstance(exp, str):
-            exp = datetime.fromisoformat(exp)
+            exp = _parse_expiry(exp)
 
         return exp > datetime.now()
     except Exception as e:
@@ -3166,7 +3274,7 @@ def dashboard():
         desbloqueios=desbloqueios,
         transacoes=transacoes,
         licenses=licenses,
-        modelos=MODELOS_IPHONE_USD_SINAL,
+        modelos=tabela_precos_app.atual().tabela_sinal,
         licenca_ativa=licenca_ativa
     )
 
@@ -3191,7 +3299,7 @@ def choose_package():
     return render_template(
         "choose_package.html",
         user=user,
-        pacotes=PACOTES,
+        pacotes=tabela_precos_app.atual().pacotes,
         publishable_key=os.getenv("STRIPE_PUBLISHABLE_KEY")
     )
 
@@ -3209,7 +3317,7 @@ def pagar_pacote():
     pacote_nome = request.form.get("pacote", "").strip()
 
     # 🔒 Procurar o pacote pelo nome
-    pacote = next((p for p in PACOTES if p["nome"] == pacote_nome), None)
+    pacote = tabela_precos_app.atual().pacote(pacote_nome)
     if not pacote:
         flash("❌ Invalid package selection.", "danger")
         app.logger.warning(f"Tentativa de pacote inválido: {pacote_nome}")
@@ -3263,8 +3371,8 @@ def pagar_pacote():
         conn.commit()
         # conn.close() — fechado pelo teardown
 
-        print(f"✅ Stripe session created: {session_stripe.id}")
-        print(f"🔗 Checkout link: {session_stripe.url}")
+        log("INFO", f"✅ Stripe session created: {session_stripe.id}")
+        log("INFO", f"🔗 Checkout link: {session_stripe.url}")
 
         return redirect(session_stripe.url, code=303)
 
@@ -3371,7 +3479,7 @@ def iremoval_unlock(modelo: str, imei: str, user_email: str):
     }
 
     try:
-        r = requests.post(DHRU_API_URL, data=payload, timeout=30)
+        r = http_client.post(DHRU_API_URL, data=payload, action="place_order")
 
         if r.status_code != 200:
             app.logger.error(f"[iRemoval] HTTP {r.status_code} → {r.text}")
@@ -3441,7 +3549,7 @@ def consulta_imei(numero):
         headers = {"Authorization": f"Token {IMEI_API_KEY}"}
         params = {"imei": numero}
 
-        resp = requests.get(url, headers=headers, params=params, timeout=10)
+        resp = http_client.get(url, headers=headers, params=params, action="imei_info")
         if resp.status_code != 200:
             app.logger.warning(f"IMEI.info status {resp.status_code}: {resp.text}")
             return None
@@ -3474,8 +3582,7 @@ def verificar_serial():
         flash("Ative sua conta adquirindo um pacote.", "warning")
         return redirect(url_for("choose_package"))
 
-    # 🧠 Dicionário unificado (Signal + No-Signal)
-    MODELOS_IPHONE = {**MODELOS_IPHONE_USD_SINAL, **MODELOS_IPHONE_USD_NO_SIGNAL}
+    livro = tabela_precos_app.atual()
 
     if request.method == "POST":
         modelo = request.form.get("modelo", "").strip()
@@ -3485,16 +3592,14 @@ def verificar_serial():
             flash("Escolha um modelo e digite a serial/IMEI.", "danger")
             return redirect(url_for("verificar_serial"))
 
-        # 💰 Busca preços
-        preco_cliente = MODELOS_IPHONE.get(modelo)
-        preco_fornecedor = PRECO_IREMOVAL_USD.get(modelo, 0.0)
-
-        if not preco_cliente:
+        # 💰 Busca preços (livro unificado: Signal + No-Signal)
+        item = livro.preco(modelo)
+        if not item:
             flash(f"Modelo {modelo} não está disponível para desbloqueio.", "warning")
             app.logger.warning(f"Tentativa inválida: modelo {modelo} não listado")
             return redirect(url_for("verificar_serial"))
 
-        lucro = preco_cliente - preco_fornecedor
+        preco_cliente, preco_fornecedor, lucro = item.preco_usd, item.custo_usd, item.margem_usd
 
         return render_template(
             "confirmar_desbloqueio.html",
@@ -3511,8 +3616,8 @@ def verificar_serial():
     return render_template(
     "verificar_serial.html",
     user=user,
-    MODELOS_IPHONE_USD_SINAL=MODELOS_IPHONE_USD_SINAL,
-    MODELOS_IPHONE_SEM_SINAL_USD=MODELOS_IPHONE_SEM_SINAL_USD
+    MODELOS_IPHONE_USD_SINAL=livro.tabela_sinal,
+    MODELOS_IPHONE_SEM_SINAL_USD=livro.tabela_sem_sinal
 )
 
 #-----------------------
@@ -3539,14 +3644,13 @@ def pagar_desbloqueio():
         flash("Escolha um modelo e insira a serial/IMEI.", "danger")
         return redirect(url_for("verificar_serial"))
 
-    if modelo not in MODELOS_IPHONE_USD:
+    item = tabela_precos_app.atual().preco(modelo)
+    if not item:
         flash("Modelo inválido.", "danger")
         app.logger.warning(f"Tentativa de desbloqueio com modelo inválido: {modelo}")
         return redirect(url_for("verificar_serial"))
 
-    preco_cliente = MODELOS_IPHONE_USD[modelo]
-    preco_fornecedor = PRECO_IREMOVAL_USD.get(modelo, 0.0)
-    lucro = preco_cliente - preco_fornecedor
+    preco_cliente, preco_fornecedor, lucro = item.preco_usd, item.custo_usd, item.margem_usd
 
     tx_ref = f"TLUXULK-{user['id']}-{secrets.token_hex(6)}-{int(datetime.now().timestamp())}"
     success_url = url_for("process_unlock", tx_ref=tx_ref, _external=True)
@@ -3591,8 +3695,8 @@ def pagar_desbloqueio():
         conn.commit()
         # conn.close() — fechado pelo teardown
 
-        print(f"✅ Sessão Stripe criada: {session_stripe.id}")
-        print(f"🔗 Link de checkout: {session_stripe.url}")
+        log("INFO", f"✅ Sessão Stripe criada: {session_stripe.id}")
+        log("INFO", f"🔗 Link de checkout: {session_stripe.url}")
 
         return redirect(session_stripe.url, code=303)
 
@@ -3636,106 +3740,16 @@ def stripe_webhook():
         app.logger.error(f"[WEBHOOK] ⚠️ Erro inesperado na verificação: {e}")
         return abort(400)
 
-    # 🎯 Processa apenas evento de pagamento concluído
-    if event["type"] == "checkout.session.completed":
-        session_obj = event["data"]["object"]
-
-        # Recupera referência única
-        tx_ref = (
-            session_obj.get("metadata", {}).get("tx_ref")
-            or session_obj.get("client_reference_id")
-        )
-
-        if not tx_ref:
-            app.logger.error("[WEBHOOK] Sessão Stripe sem tx_ref detectada")
-            return abort(400)
-
-        conn = get_db()
-        try:
-            c = conn.cursor()
-            c.execute("SELECT * FROM transactions WHERE tx_ref=?", (tx_ref,))
-            tx = c.fetchone()
-
-            if not tx:
-                app.logger.error(f"[WEBHOOK] Transação não encontrada (tx_ref={tx_ref})")
-                return abort(404)
-
-            # ✅ Atualiza status da transação
-            c.execute("""
-                UPDATE transactions
-                SET status=?, stripe_id=?, updated_at=?
-                WHERE id=?
-            """, ("successful", session_obj.get("id"), now_str(), tx["id"]))
-            conn.commit()
-
-            purpose = (tx["purpose"] or "").lower()
-
-            # --------------------------
-            # 🟢 Ativação de Pacote (Licença)
-            # --------------------------
-            if purpose == "package":
-                pacote_nome = tx["pacote"]
-                pacote = next((p for p in PACOTES if p["nome"] == pacote_nome), None)
-
-                if not pacote:
-                    app.logger.warning(f"[WEBHOOK] Pacote '{pacote_nome}' não encontrado na lista.")
-                else:
-                    dias = pacote["dias"]
-
-                    try:
-                        # Calcula validade
-                        data_inicio = datetime.now()
-                        data_expira = (
-                            data_inicio + timedelta(days=dias)
-                            if dias < 9999 else None  # permanente
-                        )
-
-                        # Atualiza acesso do usuário
-                        c.execute("""
-                            UPDATE users
-                            SET access_key=?, access_expiry=?
-                            WHERE id=?
-                        """, (
-                            f"KEY-{secrets.token_hex(12)}",
-                            data_expira.isoformat() if data_expira else None,
-                            tx["user_id"]
-                        ))
-                        conn.commit()
-
-                        app.logger.info(f"[WEBHOOK] ✅ Licença '{pacote_nome}' ativada por {dias} dias (tx_ref={tx_ref})")
-
-                    except Exception as e:
-                        app.logger.error(f"[WEBHOOK] Erro ao emitir licença (tx_ref={tx_ref}) → {e}")
-
-            # --------------------------
-            # 🔓 Pedido de desbloqueio automático
-            # --------------------------
-            elif purpose == "unlock":
-                try:
-                    c.execute("SELECT email FROM users WHERE id=?", (tx["user_id"],))
-                    row = c.fetchone()
-                    user_email = row["email"] if row else None
-
-                    ok = _submit_unlock_order(user_email, tx["modelo"], tx["id"])
-                    if ok:
-                        app.logger.info(f"[WEBHOOK] 🔓 Pedido de desbloqueio submetido (tx_ref={tx_ref})")
-                    else:
-                        app.logger.warning(f"[WEBHOOK] Falha ao submeter desbloqueio (tx_ref={tx_ref})")
-                except Exception as e:
-                    app.logger.error(f"[WEBHOOK] Erro ao processar desbloqueio (tx_ref={tx_ref}) → {e}")
-
-            else:
-                app.logger.warning(f"[WEBHOOK] Propósito desconhecido: {purpose} (tx_ref={tx_ref})")
+    # 📒 Grava o evento no ledger (event_id UNIQUE) e responde na hora;
+    # a entrega (licença / ordem de desbloqueio) roda no worker do ledger.
+    try:
+        novo = ledger_stripe.registrar(event["id"], event["type"], payload)
+    except sqlite3.Error as e:
+        app.logger.error(f"[WEBHOOK] Falha ao gravar evento {event.get('id')} → {e}")
+        return abort(500)  # Stripe repete a entrega
 
-        except Exception as e:
-            app.logger.error(f"[WEBHOOK] Falha geral ao processar tx_ref={tx_ref} → {e}")
-            return abort(500)
-        finally:
-            try:
-                # conn.close() — fechado pelo teardown automaticamente
-                pass
-            except Exception:
-                pass
+    if not novo:
+        app.logger.info(f"[WEBHOOK] Evento {event['id']} já registrado — ignorado")
 
     return Response(status=200)
 
@@ -3756,7 +3770,7 @@ def receipt_package(tx_ref):
 
     dias = 0
     if tx["pacote"]:
-        pacote = next((p for p in PACOTES if p["nome"] == tx["pacote"]), None)
+        pacote = tabela_precos_app.atual().pacote(tx["pacote"])
         if pacote:
             dias = pacote["dias"]
 
@@ -3855,12 +3869,15 @@ def painel_tech_requests():
             except Exception as e:
                 flash(f"Erro ao atualizar solicitação: {e}", "danger")
 
-    # Busca todas as solicitações
-    c.execute("SELECT * FROM tech_requests ORDER BY criado_em DESC")
-    requests_list = c.fetchall()
+    # Busca as solicitações (paginadas por cursor)
+    requests_list, proximo_cursor = paginar(
+        conn, "SELECT * FROM tech_requests", coluna="criado_em",
+        cursor=request.args.get("cursor"), limite=limite_pagina(request.args.get("limit")),
+    )
     # conn.close() — fechado pelo teardown
 
-    return render_template("painel_tech_requests.html", requests=requests_list, user=user)
+    return render_template("painel_tech_requests.html", requests=requests_list, user=user,
+                           proximo_cursor=proximo_cursor)
 
 
 # -----------------------
@@ -3872,7 +3889,7 @@ def desbloquear():
     # Mantida como compat: preferir fluxo verificar_serial -> pagar_desbloqueio
     user = current_user()
     modelo = request.form.get("modelo")
-    if not modelo or modelo not in MODELOS_IPHONE:
+    if not modelo or not tabela_precos_app.atual().preco(modelo):
         flash("Modelo inválido para desbloqueio.", "danger")
         return redirect(url_for("dashboard"))
     flash(f"Solicitação de desbloqueio para {modelo} recebida (fluxo antigo). Use o fluxo novo com serial.", "info")
@@ -3897,17 +3914,21 @@ def admin():
     conn = get_db()
     c = conn.cursor()
 
+    # Listagens paginadas por cursor (cada tabela com o seu parâmetro na URL)
+    limite = limite_pagina(request.args.get("limit"))
+
     # Users
-    c.execute("SELECT * FROM users ORDER BY created_at DESC")
-    users = [dict(row) for row in c.fetchall()]
+    users, users_cursor = paginar(conn, "SELECT * FROM users", cursor=request.args.get("users_cursor"), limite=limite)
+    users = [dict(row) for row in users]
 
     # Transactions
-    c.execute("SELECT * FROM transactions ORDER BY created_at DESC")
-    transactions = [dict(row) for row in c.fetchall()]
+    transactions, tx_cursor = paginar(conn, "SELECT * FROM transactions", cursor=request.args.get("tx_cursor"), limite=limite)
+    transactions = [dict(row) for row in transactions]
 
     # Licenses
-    c.execute("SELECT * FROM licenses ORDER BY issued_at DESC")
-    licenses = [dict(row) for row in c.fetchall()]
+    licenses, lic_cursor = paginar(conn, "SELECT * FROM licenses", coluna="issued_at",
+                                   cursor=request.args.get("lic_cursor"), limite=limite)
+    licenses = [dict(row) for row in licenses]
 
     # Count unread messages to admin
     try:
@@ -3916,20 +3937,25 @@ def admin():
     except Exception:
         unread_count = 0  # Safe fallback in case messages table not ready yet
 
-    # Quick stats
-    total_users = len(users)
-    total_transactions = len(transactions)
+    # Quick stats (rollup — não dependem da página carregada)
+    stats = ler_estatisticas(conn)
+    total_users = stats["usuarios_total"]
+    total_transactions = stats["tx_total"]
     total_revenue = sum(
-        [float(t.get("amount") or 0) for t in transactions if t.get("status") in ("success", "successful")]
+        stats["tx_por_status"].get(st, {}).get("valor", 0.0) for st in ("success", "successful")
     )
-    total_licenses = len(licenses)
+    total_licenses = stats["licencas_total"]
 
     # Render admin dashboard (correct path)
     return render_template(
         "admin_dashboard.html",
         users=users,
         transactions=transactions,
+        tx=transactions,
         licenses=licenses,
+        users_cursor=users_cursor,
+        tx_cursor=tx_cursor,
+        lic_cursor=lic_cursor,
         total_users=total_users,
         total_transactions=total_transactions,
         total_revenue=total_revenue,
@@ -3948,15 +3974,19 @@ def admin_licenses():
 
     conn = get_db()
     c = conn.cursor()
-    c.execute("""
+    licenses, proximo_cursor = paginar(
+        conn,
+        """
         SELECT l.*, u.email AS user_email
         FROM licenses l
         LEFT JOIN users u ON u.id = l.user_id
-        ORDER BY l.issued_at DESC
-    """)
-    licenses = [dict(row) for row in c.fetchall()]
+        """,
+        coluna="l.issued_at", id_col="l.id",
+        cursor=request.args.get("cursor"), limite=limite_pagina(request.args.get("limit")),
+    )
+    licenses = [dict(row) for row in licenses]
 
-    return render_template("admin/licenses.html", licenses=licenses)
+    return render_template("admin/licenses.html", licenses=licenses, proximo_cursor=proximo_cursor)
 
 @app.get("/admin/chart_data")
 @require_role("admin")
@@ -3964,15 +3994,16 @@ def admin_chart_data():
     conn = get_db(); c = conn.cursor()
     # Agrupa receitas, custos e lucros por dia
     c.execute("""
-        SELECT 
-            strftime('%Y-%m-%d', created_at) AS day,
-            SUM(amount) AS total_revenue,
-            SUM(preco_fornecedor) AS total_cost,
-            SUM(lucro) AS profit
-        FROM transactions
-        WHERE status='successful'
-        GROUP BY day
-        ORDER BY day DESC
+        SELECT
+            dia AS day,
+            SUM(valor) AS total_revenue,
+            SUM(fornecedor) AS total_cost,
+            SUM(lucro) AS profit,
+            SUM(qtd) AS total_transactions
+        FROM stats_transacoes
+        WHERE status='successful' AND dia != ''
+        GROUP BY dia
+        ORDER BY dia DESC
         LIMIT 14
     """)
     data = [dict(row) for row in c.fetchall()]
@@ -4041,6 +4072,7 @@ def admin_license_revoke(lic_id):
     c.execute("DELETE FROM licenses WHERE id=?", (lic_id,))
     c.execute("UPDATE users SET access_key=NULL, access_expiry=NULL WHERE id=? AND access_key=?", (user_id, lic_key))
     conn.commit()
+    invalidar_cache_usuario(user_id)
     # conn.close() — fechado pelo teardown
     flash("Licença revogada.", "info")
     return redirect(url_for("admin"))
@@ -4072,6 +4104,58 @@ def admin_logs():
 from datetime import datetime
 import os
 
+# -----------------------
+# Estatísticas agregadas (rollup)
+# -----------------------
+# stats_transacoes / stats_licencas / stats_usuarios são mantidas por triggers
+# (migrations/0002_estatisticas_agregadas.sql). Os painéis leem só essas linhas.
+def ler_estatisticas(conn=None) -> dict:
+    """Lê os contadores agregados usados por admin_overview e admin_dashboard."""
+    conn = conn or get_db()
+    c = conn.cursor()
+
+    c.execute("""
+        SELECT status, SUM(qtd) AS qtd, SUM(valor) AS valor, SUM(fornecedor) AS fornecedor, SUM(lucro) AS lucro
+        FROM stats_transacoes GROUP BY status
+    """)
+    tx_por_status = {
+        row["status"]: {
+            "qtd": row["qtd"] or 0,
+            "valor": round(row["valor"] or 0.0, 2),
+            "fornecedor": round(row["fornecedor"] or 0.0, 2),
+            "lucro": round(row["lucro"] or 0.0, 2),
+        }
+        for row in c.fetchall()
+    }
+
+    c.execute("SELECT purpose, SUM(qtd) FROM stats_transacoes GROUP BY purpose")
+    tx_por_purpose = {purpose: qtd or 0 for purpose, qtd in c.fetchall()}
+
+    c.execute("SELECT role, qtd FROM stats_usuarios")
+    usuarios_por_role = {role: qtd for role, qtd in c.fetchall()}
+
+    # Licenças expiradas: dias anteriores pelo rollup + as de hoje pela faixa do índice
+    agora = datetime.utcnow()
+    hoje = agora.strftime("%Y-%m-%d")
+    c.execute("SELECT COALESCE(SUM(qtd), 0) FROM stats_licencas")
+    licencas_total = c.fetchone()[0]
+    c.execute("SELECT COALESCE(SUM(qtd), 0) FROM stats_licencas WHERE dia_expira != '' AND dia_expira < ?", (hoje,))
+    licencas_expiradas = c.fetchone()[0]
+    c.execute("SELECT COUNT(*) FROM licenses WHERE expires_at >= ? AND expires_at < ?", (hoje, agora.isoformat()))
+    licencas_expiradas += c.fetchone()[0]
+
+    return {
+        "tx_por_status": tx_por_status,
+        "tx_por_purpose": tx_por_purpose,
+        "tx_total": sum(st["qtd"] for st in tx_por_status.values()),
+        "tx_valor_total": round(sum(st["valor"] for st in tx_por_status.values()), 2),
+        "tx_fornecedor_total": round(sum(st["fornecedor"] for st in tx_por_status.values()), 2),
+        "usuarios_por_role": usuarios_por_role,
+        "usuarios_total": sum(usuarios_por_role.values()),
+        "licencas_total": licencas_total,
+        "licencas_expiradas": licencas_expiradas,
+    }
+
 @app.route("/admin/overview")
 @login_required
 def admin_overview():
@@ -4084,33 +4168,23 @@ def admin_overview():
     conn = get_db()
     c = conn.cursor()
 
-    # --- Funções auxiliares internas ---
-    def count(query, params=()):
-        c.execute(query, params)
-        result = c.fetchone()
-        return result[0] if result else 0
-
-    def sum_amount(query, params=()):
-        c.execute(query, params)
-        result = c.fetchone()
-        return float(result[0] or 0)
-
-    # --- Tempo atual (para checar licenças expiradas) ---
-    now = datetime.utcnow().isoformat()
+    # --- Estatísticas gerais (tabelas de rollup, mantidas por triggers) ---
+    stats = ler_estatisticas(conn)
+    por_status = stats["tx_por_status"]
+    sucesso = [por_status.get(st, {}) for st in ("success", "successful")]
 
-    # --- Estatísticas gerais ---
     overview = {
-        "total_users": count("SELECT COUNT(*) FROM users"),
-        "tech_users": count("SELECT COUNT(*) FROM users WHERE role='tech'"),
-        "admin_users": count("SELECT COUNT(*) FROM users WHERE role='admin'"),
-        "total_tx": count("SELECT COUNT(*) FROM transactions"),
-        "pending_tx": count("SELECT COUNT(*) FROM transactions WHERE status='pending'"),
-        "successful_tx": count("SELECT COUNT(*) FROM transactions WHERE status IN ('success','successful')"),
-        "failed_tx": count("SELECT COUNT(*) FROM transactions WHERE status='failed'"),
-        "total_licenses": count("SELECT COUNT(*) FROM licenses"),
-        "expired_licenses": count("SELECT COUNT(*) FROM licenses WHERE expires_at < ?", (now,)),
-        "total_revenue": sum_amount("SELECT SUM(amount) FROM transactions WHERE status IN ('success','successful')"),
-        "supplier_cost": sum_amount("SELECT SUM(cost_price) FROM transactions WHERE status IN ('success','successful')"),
+        "total_users": stats["usuarios_total"],
+        "tech_users": stats["usuarios_por_role"].get("tech", 0),
+        "admin_users": stats["usuarios_por_role"].get("admin", 0),
+        "total_tx": stats["tx_total"],
+        "pending_tx": por_status.get("pending", {}).get("qtd", 0),
+        "successful_tx": sum(st.get("qtd", 0) for st in sucesso),
+        "failed_tx": por_status.get("failed", {}).get("qtd", 0),
+        "total_licenses": stats["licencas_total"],
+        "expired_licenses": stats["licencas_expiradas"],
+        "total_revenue": sum(st.get("valor", 0.0) for st in sucesso),
+        "supplier_cost": sum(st.get("fornecedor", 0.0) for st in sucesso),
     }
 
     # --- Módulos / APIs ---
@@ -4133,12 +4207,25 @@ def admin_overview():
     return render_template(
         "admin_overview.html",
         overview=overview,
+        total_techs=overview["tech_users"],
+        **overview,
         stripe_ok=stripe_ok,
         stripe_public=stripe_public,
         iremoval_ok=iremoval_ok,
         iremoval_user=iremoval_user,
         mail_ok=mail_ok,
         mail_sender=mail_sender,
+        db_stats=db_pool.estatisticas(),
+        event_stats=log_eventos.estatisticas(),
+        stripe_ledger=ledger_stripe.contagem(),
+        catalogo_sync=catalogo.ultima_execucao(get_db()),
+        slow_queries=perfil_sql.lentas_recentes()[:10],
+        upstream=metricas_upstream.registro.resumo(),
+        upstream_slo={
+            "p95_ms": metricas_upstream.UPSTREAM_SLO_P95_MS,
+            "erro_pct": metricas_upstream.UPSTREAM_SLO_ERRO_PCT,
+            "janela_min": metricas_upstream.UPSTREAM_SLO_JANELA_MIN,
+        },
     )
 
 # -----------------------
@@ -4153,8 +4240,8 @@ def update_services():
         flash("🚫 Access denied!", "danger")
         return redirect(url_for("dashboard"))
 
-    if atualizar_servicos():
-        flash("✅ Services list successfully updated!", "success")
+    if agendar_sync_catalogo():
+        flash("🔁 Services sync started — progress on the admin overview.", "info")
     else:
         flash("❌ Failed to update service list.", "danger")
     return redirect(url_for("services"))
@@ -4165,15 +4252,18 @@ def update_services():
 def admin_transactions():
     conn = get_db()
     c = conn.cursor()
-    c.execute("""
+    rows, proximo_cursor = paginar(
+        conn,
+        """
         SELECT t.id, u.email, t.modelo, t.imei, t.amount AS sale_price,
                t.preco_fornecedor, t.lucro, t.status, t.order_id, t.created_at
         FROM transactions t
         LEFT JOIN users u ON t.user_id = u.id
-        ORDER BY t.created_at DESC
-    """)
-    rows = c.fetchall()
-    return render_template("admin_transactions.html", transactions=rows)
+        """,
+        coluna="t.created_at", id_col="t.id",
+        cursor=request.args.get("cursor"), limite=limite_pagina(request.args.get("limit")),
+    )
+    return render_template("admin_transactions.html", transactions=rows, proximo_cursor=proximo_cursor)
 
 
 # -----------------------
@@ -4217,6 +4307,7 @@ def admin_approve_user(user_id):
     c = conn.cursor()
     c.execute("UPDATE users SET approved=1 WHERE id=?", (user_id,))
     conn.commit()
+    invalidar_cache_usuario(user_id)
     registrar_evento(session["user_id"], f"Approved user ID {user_id}")
     flash("✅ User approved successfully.", "success")
     return redirect(url_for("admin_home"))
@@ -4257,8 +4348,8 @@ def admin_add_license():
 
     # Send email notification
     try:
-        html_body = render_template(
-            "email_nova_licenca.html",
+        html_body, text_body = renderizar_email(
+            "email_nova_licenca.html", _idioma_email(),
             first_name=user["first_name"] or user["email"].split("@")[0],
             pacote=pacote,
             license_key=key,
@@ -4268,6 +4359,7 @@ def admin_add_license():
         send_email(
             to_email=user["email"],
             subject=f"🔑 Your New {pacote} License — T-Lux Unlock System",
+            body_text=text_body,
             body_html=html_body
         )
         flash(f"✅ License {pacote} created and email sent to {user['email']}.", "success")
@@ -4284,6 +4376,7 @@ def admin_block_user(user_id):
     c = conn.cursor()
     c.execute("UPDATE users SET blocked=1 WHERE id=?", (user_id,))
     conn.commit()
+    invalidar_cache_usuario(user_id)
     registrar_evento(session["user_id"], f"Blocked user ID {user_id}")
     flash("⛔ User blocked.", "warning")
     return redirect(url_for("admin_home"))
@@ -4296,6 +4389,7 @@ def admin_unblock_user(user_id):
     c = conn.cursor()
     c.execute("UPDATE users SET blocked=0 WHERE id=?", (user_id,))
     conn.commit()
+    invalidar_cache_usuario(user_id)
     registrar_evento(session["user_id"], f"Unblocked user ID {user_id}")
     flash("✅ User unblocked.", "success")
     return redirect(url_for("admin_home"))
@@ -4315,6 +4409,7 @@ def admin_change_role(user_id):
     c = conn.cursor()
     c.execute("UPDATE users SET role=? WHERE id=?", (new_role, user_id))
     conn.commit()
+    invalidar_cache_usuario(user_id)
     registrar_evento(session["user_id"], f"Changed role of user {user_id} to {new_role}")
     flash(f"🔄 Role changed to {new_role.capitalize()}.", "info")
     return redirect(url_for("admin_home"))
@@ -4337,6 +4432,7 @@ def admin_adjust_balance(user_id):
     c.execute("UPDATE users SET balance = IFNULL(balance, 0) + ? WHERE id=?", (amount, user_id))
     c.execute("INSERT INTO balance_ledger (user_id, amount, reason) VALUES (?, ?, ?)", (user_id, amount, reason))
     conn.commit()
+    invalidar_cache_usuario(user_id)
 
     registrar_evento(session["user_id"], f"Adjusted balance of user {user_id} by ${amount:.2f} ({reason})")
     flash(f"💰 Balance updated successfully (+${amount:.2f})", "success")
@@ -4475,6 +4571,484 @@ def chat_with_user(user_id):
 
     return render_template("chat.html", target=target, me=me)
 
+# -----------------------
+# Poller de status dos desbloqueios (background)
+# -----------------------
+# Atualiza periodicamente transactions.status das ordens ainda abertas no
+# fornecedor. Os painéis leem apenas do SQLite — nenhuma chamada à iRemoval
+# acontece durante o request. Ordens em estado terminal nunca são consultadas.
+import socket
+import threading
+
+UNLOCK_STATUS_ABERTOS = ("pending", "processing")
+UNLOCK_POLL_ENABLED = os.getenv("UNLOCK_POLL_ENABLED", "1") == "1"
+UNLOCK_POLL_INTERVAL = int(os.getenv("UNLOCK_POLL_INTERVAL", "120"))  # segundos
+UNLOCK_POLL_BATCH = int(os.getenv("UNLOCK_POLL_BATCH", "200"))        # ordens por ciclo
+
+# Vocabulário do fornecedor (DHRU/iRemoval) → status interno
+_STATUS_FORNECEDOR = {
+    "0": "pending", "new": "pending", "pending": "pending", "waiting": "pending",
+    "1": "processing", "in process": "processing", "processing": "processing",
+    "4": "success", "available": "success", "completed": "success", "success": "success",
+    "3": "failed", "rejected": "failed", "cancelled": "failed", "canceled": "failed", "failed": "failed",
+}
+
+_poller_unlocks_thread = None
+_poller_unlocks_stop = threading.Event()
+
+
+def _app_real():
+    """Retorna o objeto Flask real (o nome `app` pode ser o proxy current_app)."""
+    return app._get_current_object() if hasattr(app, "_get_current_object") else app
+
+
+def normalizar_status_fornecedor(result: dict):
+    """
+    Converte a resposta de consulta do fornecedor em (status, mensagem).
+    Retorna None quando a própria consulta falhou (rede/credenciais) —
+    nesse caso o status gravado não deve ser alterado.
+    """
+    if not isinstance(result, dict) or "error" in result:
+        return None
+
+    bruto = result.get("status", result.get("STATUS", result.get("state", "pending")))
+    status = _STATUS_FORNECEDOR.get(str(bruto).strip().lower(), "pending")
+    mensagem = result.get("message") or result.get("msg") or result.get("CODE") or ""
+    return status, str(mensagem)
+
+
+def garantir_coluna_status_message():
+    """Garante a coluna transactions.status_message (última mensagem do fornecedor)."""
+    conn = get_db()
+    c = conn.cursor()
+    c.execute("PRAGMA table_info(transactions)")
+    if "status_message" not in [col[1] for col in c.fetchall()]:
+        c.execute("ALTER TABLE transactions ADD COLUMN status_message TEXT")
+        conn.commit()
+        app.logger.info("✅ Coluna 'status_message' adicionada à tabela transactions.")
+
+
+def atualizar_status_desbloqueios(limite: int = UNLOCK_POLL_BATCH) -> int:
+    """
+    Consulta o fornecedor apenas para ordens abertas (pending/processing) e grava
+    o resultado em transactions. Processa primeiro as atualizadas há mais tempo.
+    Retorna quantas transações mudaram de status.
+    """
+    conn = get_db()
+    c = conn.cursor()
+    c.execute("""
+        SELECT id, order_id, status
+        FROM transactions
+        WHERE purpose='unlock'
+          AND status IN ('pending','processing')
+          AND order_id IS NOT NULL AND order_id != ''
+        ORDER BY COALESCE(updated_at, created_at) ASC
+        LIMIT ?
+    """, (limite,))
+    abertas = c.fetchall()
+
+    # Uma chamada por ordem ao fornecedor, em paralelo (DHRU_STATUS_WORKERS threads)
+    resultados = consultar_status_lote([tx["order_id"] for tx in abertas])
+
+    alteradas = 0
+    for tx in abertas:
+        resultado = resultados.get(str(tx["order_id"]), {"error": "sem resposta"})
+        normalizado = normalizar_status_fornecedor(resultado)
+        if normalizado is None:
+            continue
+
+        status, mensagem = normalizado
+        # A condição no WHERE evita sobrescrever uma mudança feita em paralelo (ex.: admin)
+        c.execute("""
+            UPDATE transactions
+            SET status=?, status_message=?, updated_at=?
+            WHERE id=? AND status IN ('pending','processing')
+        """, (status, mensagem, now_str(), tx["id"]))
+        if status != tx["status"]:
+            alteradas += 1
+
+    conn.commit()
+    return alteradas
+
+
+def assumir_lease_poller(nome: str, dono: str, duracao: float) -> bool:
+    """
+    Lease em SQLite: só um processo (worker gunicorn) por vez roda o poller `nome`.
+    O dono renova a cada ciclo; se ele morrer, outro assume quando o lease expira.
+    Retorna True se `dono` detém o lease agora.
+    """
+    conn = get_db()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS poller_lease (
+            nome TEXT PRIMARY KEY,
+            dono TEXT NOT NULL,
+            expira_em REAL NOT NULL
+        )
+    """)
+    agora = time.time()
+    cur = conn.execute("""
+        INSERT INTO poller_lease (nome, dono, expira_em) VALUES (?, ?, ?)
+        ON CONFLICT(nome) DO UPDATE SET dono=excluded.dono, expira_em=excluded.expira_em
+        WHERE poller_lease.dono=excluded.dono OR poller_lease.expira_em < ?
+    """, (nome, dono, agora + duracao, agora))
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def _loop_poller_unlocks(flask_app):
+    with flask_app.app_context():
+        try:
+            garantir_coluna_status_message()
+        except Exception as e:
+            flask_app.logger.error(f"[UNLOCK POLLER] Falha ao preparar schema: {e}")
+
+    dono = f"{socket.gethostname()}:{os.getpid()}"
+    while not _poller_unlocks_stop.is_set():
+        try:
+            with flask_app.app_context():
+                # Vários workers gunicorn sobem o poller; só o dono do lease consulta
+                if not assumir_lease_poller("unlocks", dono, UNLOCK_POLL_INTERVAL * 3):
+                    alteradas = 0
+                else:
+                    alteradas = atualizar_status_desbloqueios()
+            if alteradas:
+                flask_app.logger.info(f"[UNLOCK POLLER] {alteradas} desbloqueio(s) com novo status.")
+        except Exception as e:
+            flask_app.logger.error(f"[UNLOCK POLLER] Erro no ciclo de consulta: {e}")
+        _poller_unlocks_stop.wait(UNLOCK_POLL_INTERVAL)
+
+
+def iniciar_poller_unlocks():
+    """
+    Inicia o poller em thread daemon (uma por processo).
+    Com vários workers gunicorn, todos sobem a thread mas só o que detém o lease
+    `poller_lease` consulta o fornecedor a cada ciclo (os outros ficam de reserva).
+    """
+    global _poller_unlocks_thread
+    if _poller_unlocks_thread and _poller_unlocks_thread.is_alive():
+        return
+    _poller_unlocks_stop.clear()
+    _poller_unlocks_thread = threading.Thread(
+        target=_loop_poller_unlocks, args=(_app_real(),),
+        name="tlux-unlock-poller", daemon=True
+    )
+    _poller_unlocks_thread.start()
+
+
+# -----------------------
+# Fila de envio de ordens de desbloqueio (background)
+# -----------------------
+# O request (unlock_page / webhook Stripe) só grava o job e retorna; workers
+# em thread chamam criar_ordem() no fornecedor. placeimeiorder cobra: só há retry
+# quando a requisição não chegou ao fornecedor; recusa é definitiva e resultado
+# incerto (read timeout, 5xx, envio interrompido) vai para revisão ('review').
+# A chave de idempotência é o tx_id: a mesma transação nunca gera dois jobs.
+from job_queue import JobQueue, JobFatal, iniciar_workers
+
+UNLOCK_QUEUE_ENABLED = os.getenv("UNLOCK_QUEUE_ENABLED", "1") == "1"
+UNLOCK_QUEUE_WORKERS = int(os.getenv("UNLOCK_QUEUE_WORKERS", "2"))
+UNLOCK_QUEUE_MAX_ATTEMPTS = int(os.getenv("UNLOCK_QUEUE_MAX_ATTEMPTS", "5"))
+JOB_UNLOCK_ORDER = "unlock_order"
+
+fila_jobs = JobQueue(DB_FILE)
+
+
+def _submit_unlock_order(user_email, modelo, tx_id) -> bool:
+    """Enfileira o envio da ordem da transação `tx_id`. Retorna True se foi aceito na fila."""
+    try:
+        fila_jobs.enfileirar(
+            JOB_UNLOCK_ORDER,
+            {"tx_id": tx_id, "email": user_email, "modelo": modelo},
+            idempotency_key=str(tx_id),
+            max_attempts=UNLOCK_QUEUE_MAX_ATTEMPTS,
+        )
+        return True
+    except sqlite3.Error as e:
+        app.logger.error(f"[UNLOCK QUEUE] Falha ao enfileirar tx {tx_id}: {e}")
+        return False
+
+
+def _job_enviar_ordem_unlock(payload: dict):
+    """Worker: cria a ordem no fornecedor e grava order_id na transação."""
+    tx_id = payload["tx_id"]
+    conn = get_db()
+    c = conn.cursor()
+    c.execute("SELECT id, modelo, imei, order_id, status FROM transactions WHERE id=?", (tx_id,))
+    tx = c.fetchone()
+    if not tx:
+        raise JobFatal(f"Transação {tx_id} não encontrada")
+    if tx["order_id"]:
+        return  # já enviada (job repetido após queda do worker)
+    if tx["status"] == "review":
+        raise JobFatal(f"tx {tx_id} aguarda revisão manual; não reenviamos")
+    if tx["status"] == "submitting":
+        # Uma tentativa anterior não terminou (worker caiu ou lease expirou): a
+        # ordem pode existir no fornecedor, então não reenviamos
+        _marcar_revisao_unlock(tx_id, "Envio anterior interrompido — conferir no fornecedor")
+        raise JobFatal(f"Envio da tx {tx_id} interrompido; enviado para revisão manual")
+
+    service_id = obter_service_id(tx["modelo"])
+    if not service_id:
+        raise JobFatal(f"Service ID não encontrado para modelo {tx['modelo']}")
+
+    c.execute("UPDATE transactions SET status='submitting', updated_at=? WHERE id=?", (now_str(), tx_id))
+    conn.commit()
+
+    resultado = criar_ordem(service_id, tx["imei"])
+    if resultado.get("status") != "success":
+        falha = resultado.get("falha")
+        if falha == "nao_enviada":
+            c.execute("UPDATE transactions SET status=? WHERE id=?", (tx["status"], tx_id))
+            conn.commit()
+            raise RuntimeError(f"Fornecedor indisponível: {resultado.get('message')}")
+        if falha == "ambigua":
+            _marcar_revisao_unlock(tx_id, f"Resposta ambígua do fornecedor: {resultado.get('message')}")
+            raise JobFatal(f"Resultado incerto da ordem (tx {tx_id}); enviado para revisão manual")
+        raise JobFatal(f"Ordem recusada pelo fornecedor: {resultado.get('message')}")
+
+    order_id = resultado["order_id"]
+    c.execute("UPDATE transactions SET order_id=?, status='pending', updated_at=? WHERE id=?",
+              (order_id, now_str(), tx_id))
+    conn.commit()
+    app.logger.info(f"[UNLOCK QUEUE] Ordem {order_id} criada (tx {tx_id}, IMEI {tx['imei']})")
+
+    if payload.get("email"):
+        try:
+            send_email(
+                payload["email"],
+                "T-Lux - Desbloqueio solicitado",
+                f"Modelo: {tx['modelo']}\nIMEI: {tx['imei']}\nStatus: pending\nOrder ID: {order_id}"
+            )
+        except Exception:
+            pass
+
+
+def _marcar_revisao_unlock(tx_id: int, motivo: str):
+    """A ordem pode ter sido criada no fornecedor: status 'review' para o admin conferir."""
+    conn = get_db()
+    conn.execute(
+        "UPDATE transactions SET status='review', status_message=?, updated_at=? WHERE id=? AND (order_id IS NULL OR order_id='')",
+        (motivo[:500], now_str(), tx_id)
+    )
+    conn.commit()
+    app.logger.error(f"[UNLOCK QUEUE] tx {tx_id} precisa de revisão manual: {motivo}")
+
+
+def _job_unlock_falhou(payload: dict, erro):
+    """Esgotadas as tentativas (ou erro definitivo): marca a transação como failed para o painel/admin."""
+    conn = get_db()
+    conn.execute(
+        "UPDATE transactions SET status='failed', status_message=?, updated_at=? "
+        "WHERE id=? AND (order_id IS NULL OR order_id='') AND status != 'review'",
+        (str(erro)[:500], now_str(), payload["tx_id"])
+    )
+    conn.commit()
+    app.logger.error(f"[UNLOCK QUEUE] tx {payload['tx_id']} falhou definitivamente: {erro}")
+
+
+def iniciar_workers_unlock():
+    """Sobe os workers da fila de ordens (threads daemon, por processo)."""
+    flask_app = _app_real()
+    with flask_app.app_context():
+        try:
+            garantir_coluna_status_message()
+        except Exception as e:
+            # Banco novo: init_db() ainda não criou transactions
+            flask_app.logger.error(f"[UNLOCK QUEUE] Falha ao preparar schema: {e}")
+    fila_jobs.garantir_tabela()
+    return iniciar_workers(
+        fila_jobs, JOB_UNLOCK_ORDER, _job_enviar_ordem_unlock,
+        quantidade=UNLOCK_QUEUE_WORKERS,
+        on_failure=_job_unlock_falhou,
+        contexto=flask_app.app_context,
+    )
+
+
+# -----------------------
+# Entrega adiada dos eventos Stripe (ledger)
+# -----------------------
+# stripe_webhook() só grava o evento na fila (kind stripe_event) e responde 200; este
+# worker drena o ledger em ordem. Cada event_id é gravado uma única vez, então
+# os retries do Stripe não repetem a entrega.
+from stripe_eventos import LedgerStripe
+
+STRIPE_LEDGER_ENABLED = os.getenv("STRIPE_LEDGER_ENABLED", "1") == "1"
+ledger_stripe = LedgerStripe(DB_FILE)
+
+
+def _cumprir_evento_stripe(event: dict):
+    """Worker: aplica um evento do ledger (só checkout.session.completed gera entrega)."""
+    if event.get("type") != "checkout.session.completed":
+        return
+
+    session_obj = event["data"]["object"]
+    tx_ref = (
+        (session_obj.get("metadata") or {}).get("tx_ref")
+        or session_obj.get("client_reference_id")
+    )
+    if not tx_ref:
+        raise JobFatal(f"Sessão Stripe {session_obj.get('id')} sem tx_ref")
+
+    conn = get_db()
+    c = conn.cursor()
+    c.execute("SELECT * FROM transactions WHERE tx_ref=?", (tx_ref,))
+    tx = c.fetchone()
+    if not tx:
+        raise JobFatal(f"Transação não encontrada (tx_ref={tx_ref})")
+
+    purpose = (tx["purpose"] or "").lower()
+    ja_pago = tx["status"] == "successful" and tx["stripe_id"] == session_obj.get("id")
+
+    # ✅ Status da transação (+ licença) num único commit: uma nova tentativa
+    # depois de uma queda nunca emite a licença duas vezes
+    c.execute("""
+        UPDATE transactions
+        SET status=?, stripe_id=?, updated_at=?
+        WHERE id=? AND (order_id IS NULL OR order_id='')
+    """, ("successful", session_obj.get("id"), now_str(), tx["id"]))
+
+    # --------------------------
+    # 🟢 Ativação de Pacote (Licença)
+    # --------------------------
+    if purpose == "package":
+        pacote_nome = tx["pacote"]
+        pacote = tabela_precos_app.atual().pacote(pacote_nome)
+
+        if not pacote:
+            conn.commit()
+            app.logger.warning(f"[WEBHOOK] Pacote '{pacote_nome}' não encontrado na lista.")
+        elif ja_pago:
+            conn.commit()
+            app.logger.info(f"[WEBHOOK] Licença de tx_ref={tx_ref} já emitida")
+        else:
+            dias = pacote["dias"]
+            data_expira = datetime.now() + timedelta(days=dias) if dias < 9999 else None  # permanente
+            c.execute("""
+                UPDATE users
+                SET access_key=?, access_expiry=?
+                WHERE id=?
+            """, (
+                f"KEY-{secrets.token_hex(12)}",
+                data_expira.isoformat() if data_expira else None,
+                tx["user_id"]
+            ))
+            conn.commit()
+            invalidar_cache_usuario(tx["user_id"])
+            app.logger.info(f"[WEBHOOK] ✅ Licença '{pacote_nome}' ativada por {dias} dias (tx_ref={tx_ref})")
+
+    # --------------------------
+    # 🔓 Pedido de desbloqueio automático
+    # --------------------------
+    elif purpose == "unlock":
+        conn.commit()
+        c.execute("SELECT email FROM users WHERE id=?", (tx["user_id"],))
+        row = c.fetchone()
+        user_email = row["email"] if row else None
+
+        # idempotency_key = tx_id: repetir aqui não gera um segundo job
+        if not _submit_unlock_order(user_email, tx["modelo"], tx["id"]):
+            raise RuntimeError(f"Falha ao submeter desbloqueio (tx_ref={tx_ref})")
+        app.logger.info(f"[WEBHOOK] 🔓 Pedido de desbloqueio enfileirado (tx_ref={tx_ref})")
+
+    else:
+        conn.commit()
+        app.logger.warning(f"[WEBHOOK] Propósito desconhecido: {purpose} (tx_ref={tx_ref})")
+
+
+def iniciar_worker_stripe():
+    """Sobe o worker do ledger de eventos Stripe (thread daemon, por processo)."""
+    return ledger_stripe.iniciar(_cumprir_evento_stripe, contexto=_app_real().app_context)
+
+
+# -----------------------
+# Sincronização do catálogo de serviços (background)
+# -----------------------
+# O admin só agenda; um worker busca a lista do fornecedor uma vez, compara
+# pelo content_hash e grava as mudanças numa transação (catalogo.py).
+# O progresso fica em catalogo_sync (admin_overview / /admin/sync-services/status).
+CATALOGO_SYNC_ENABLED = os.getenv("CATALOGO_SYNC_ENABLED", "1") == "1"
+JOB_CATALOGO_SYNC = "catalog_sync"
+
+
+def agendar_sync_catalogo():
+    """Cria a execução e enfileira o job. Retorna o id da execução (None se falhou)."""
+    try:
+        execucao_id = catalogo.nova_execucao(get_db())
+        fila_jobs.enfileirar(JOB_CATALOGO_SYNC, {"execucao_id": execucao_id},
+                             idempotency_key=str(execucao_id), max_attempts=3)
+        return execucao_id
+    except sqlite3.Error as e:
+        app.logger.error(f"[CATALOGO] Falha ao agendar sincronização: {e}")
+        return None
+
+
+def _job_sync_catalogo(payload: dict):
+    conn = get_db()
+    execucao_id = payload["execucao_id"]
+    try:
+        resumo = catalogo.sincronizar(
+            conn, lambda: catalogo.buscar_lista(API_URL, USERNAME, API_KEY),
+            progresso=lambda etapa, feitos, total: catalogo.registrar_progresso(
+                conn, execucao_id, etapa, feitos, total),
+        )
+    except ValueError as e:
+        raise JobFatal(str(e)) from e
+    except Exception as e:
+        catalogo.registrar_progresso(conn, execucao_id, f"erro, nova tentativa: {e}"[:200], 0, 0)
+        raise
+    catalogo.finalizar_execucao(conn, execucao_id, resumo=resumo)
+    cache_catalogo.invalidar()
+
+
+def _job_sync_catalogo_falhou(payload: dict, erro):
+    catalogo.finalizar_execucao(get_db(), payload["execucao_id"], erro=erro)
+    app.logger.error(f"[CATALOGO] Sincronização {payload['execucao_id']} falhou: {erro}")
+
+
+def iniciar_worker_catalogo():
+    """Um worker basta: sincronizações são raras e não devem rodar em paralelo."""
+    flask_app = _app_real()
+    with flask_app.app_context():
+        catalogo.garantir_tabela_execucoes(get_db())
+    fila_jobs.garantir_tabela()
+    return iniciar_workers(
+        fila_jobs, JOB_CATALOGO_SYNC, _job_sync_catalogo,
+        quantidade=1, intervalo=5.0,
+        on_failure=_job_sync_catalogo_falhou,
+        contexto=flask_app.app_context,
+    )
+
+
+def _linha_desbloqueio(tx) -> dict:
+    """Formata uma transação de desbloqueio (lida do SQLite) para os painéis."""
+    tx = dict(tx)
+    modelo = tx.get("modelo") or "Desconhecido"
+
+    # Full Signal direto ou precisa restaurar
+    if modelo in MODELOS_FULL_SIGNAL:
+        full_signal = "Sim"
+        full_signal_message = "🔓 Full Signal desbloqueado com sucesso!"
+    else:
+        full_signal = "Restauração necessária"
+        full_signal_message = "🔧 Para ativar Full Signal, restaure o iPhone via iTunes/Finder."
+
+    return {
+        "tx_id": tx.get("id"),
+        "modelo": modelo,
+        "imei": tx.get("imei") or "",
+        "preco": tx.get("amount") or 0.0,
+        "preco_cliente": tx.get("amount") or 0.0,
+        "preco_fornecedor": tx.get("preco_fornecedor") or 0.0,
+        "lucro": tx.get("lucro") or 0.0,
+        "order_id": tx.get("order_id"),
+        "status": tx.get("status") or "pending",
+        "message": tx.get("status_message") or "",
+        "full_signal": full_signal,
+        "full_signal_message": full_signal_message,
+        "created_at": tx.get("created_at"),
+        "updated_at": tx.get("updated_at"),
+    }
+
 # -----------------------
 # Painel: Lista de desbloqueios com status
 # -----------------------
@@ -4482,8 +5056,8 @@ def chat_with_user(user_id):
 @login_required
 def painel_unlocks():
     """
-    Exibe todos os desbloqueios do usuário logado,
-    mostrando status em tempo real usando order_id da iRemoval.
+    Exibe todos os desbloqueios do usuário logado.
+    O status vem do SQLite, mantido atualizado pelo poller em background.
     """
     user_id = session["user_id"]
     conn = get_db()
@@ -4492,23 +5066,9 @@ def painel_unlocks():
         "SELECT * FROM transactions WHERE user_id=? AND purpose='unlock' ORDER BY created_at DESC",
         (user_id,)
     )
-    rows = c.fetchall()
+    desbloqueios = [_linha_desbloqueio(tx) for tx in c.fetchall()]
     # conn.close() — fechado pelo teardown
 
-    desbloqueios = []
-    for tx in rows:
-        status_info = consultar_status_unlock(tx["id"])
-        desbloqueios.append({
-            "tx_id": tx["id"],
-            "modelo": tx["modelo"],
-            "imei": tx.get("modelo", ""),  # ou a coluna correta do IMEI
-            "preco": tx["amount"],
-            "created_at": tx["created_at"],
-            "status": status_info["status"],
-            "message": status_info["message"],
-            "order_id": tx.get("order_id")
-        })
-
     return render_template("painel_unlocks.html", desbloqueios=desbloqueios)
 
 @app.route("/admin/balance")
@@ -4522,24 +5082,30 @@ def admin_balance():
 
     conn = get_db()
     c = conn.cursor()
+    limite = limite_pagina(request.args.get("limit"))
+
     # Tabela principal: ledger (histórico de créditos)
-    c.execute("""
+    ledger, ledger_cursor = paginar(
+        conn,
+        """
         SELECT b.*, u.email AS user_email
         FROM balance_ledger b
         LEFT JOIN users u ON u.id = b.user_id
-        ORDER BY b.created_at DESC
-    """)
-    ledger = [dict(row) for row in c.fetchall()]
+        """,
+        coluna="b.created_at", id_col="b.id",
+        cursor=request.args.get("cursor"), limite=limite,
+    )
+    ledger = [dict(row) for row in ledger]
 
-    # Resumo total por utilizador
-    c.execute("""
-        SELECT u.email, u.balance
-        FROM users u
-        ORDER BY u.balance DESC
-    """)
-    balances = [dict(row) for row in c.fetchall()]
+    # Resumo total por utilizador (maiores saldos)
+    balances, balances_cursor = paginar(
+        conn, "SELECT u.email, u.balance FROM users u", coluna="u.balance", id_col="u.id",
+        cursor=request.args.get("balances_cursor"), limite=limite,
+    )
+    balances = [dict(row) for row in balances]
 
-    return render_template("admin_balance.html", ledger=ledger, balances=balances)
+    return render_template("admin_balance.html", ledger=ledger, balances=balances,
+                           ledger_cursor=ledger_cursor, balances_cursor=balances_cursor)
     
 from datetime import datetime
 
@@ -4556,7 +5122,7 @@ def settings():
     config = {
         "version": "1.1.0",
         "env": os.getenv("FLASK_ENV", "production"),
-        "db_file": os.getenv("DB_FILE", "t-lux.db"),
+        "db_file": DB_FILE,
 
         # 🔐 iRemoval API
         "api_url": os.getenv("IREMOVAL_ENDPOINT", "https://bulk.iremove.tools/api/dhru/api/index.php"),
@@ -4597,6 +5163,7 @@ def painel_unlocks_status():
     """
     Retorna o status de todos os desbloqueios do usuário logado em JSON.
     Inclui informações de Full Signal e mensagens personalizadas.
+    Lê apenas do SQLite — o poller em background mantém o status atualizado.
     """
     user_id = session.get("user_id")
     if not user_id:
@@ -4612,38 +5179,10 @@ def painel_unlocks_status():
         rows = c.fetchall()
         # conn.close() — fechado pelo teardown
     except Exception as e:
-        log("ERROR", f"Erro ao buscar desbloqueios do usuário {user_id}: {e}")
+        app.logger.error(f"Erro ao buscar desbloqueios do usuário {user_id}: {e}")
         return {"desbloqueios": []}, 500
 
-    desbloqueios = []
-    for tx in rows:
-        status_info = consultar_status_unlock(tx["id"])
-
-        modelo = tx.get("modelo", "Desconhecido")
-        imei = tx.get("imei") or tx.get("modelo", "")
-
-        # Full Signal direto ou precisa restaurar
-        if modelo in MODELOS_FULL_SIGNAL:
-            full_signal = "Sim"
-            full_signal_message = "🔓 Full Signal desbloqueado com sucesso!"
-        else:
-            full_signal = "Restauração necessária"
-            full_signal_message = "🔧 Para ativar Full Signal, restaure o iPhone via iTunes/Finder."
-
-        desbloqueios.append({
-            "tx_id": tx.get("id"),
-            "modelo": modelo,
-            "imei": imei,
-            "preco": tx.get("amount", 0),
-            "created_at": tx.get("created_at"),
-            "status": status_info.get("status", "pendente"),
-            "message": status_info.get("message", ""),
-            "order_id": tx.get("order_id"),
-            "full_signal": full_signal,
-            "full_signal_message": full_signal_message
-        })
-
-    return {"desbloqueios": desbloqueios}
+    return {"desbloqueios": [_linha_desbloqueio(tx) for tx in rows]}
     
 # -----------------------------
 # 🔍 Função para obter transação pelo tx_ref
@@ -4895,8 +5434,10 @@ def admin_unlocks():
     """)
     pendentes = [dict(r) for r in c.fetchall()]
 
-    # 🔹 Histórico de desbloqueios
-    c.execute("""
+    # 🔹 Histórico de desbloqueios (paginado por cursor)
+    historico, proximo_cursor = paginar(
+        conn,
+        """
         SELECT 
             t.id, 
             u.email AS user_email, 
@@ -4909,12 +5450,12 @@ def admin_unlocks():
             t.created_at
         FROM transactions t
         JOIN users u ON u.id = t.user_id
-        WHERE t.purpose = 'unlock' 
-          AND t.status NOT IN ('pending','processing')
-        ORDER BY t.created_at DESC
-        LIMIT 50
-    """)
-    historico = [dict(r) for r in c.fetchall()]
+        """,
+        coluna="t.created_at", id_col="t.id",
+        where="t.purpose = 'unlock' AND t.status NOT IN ('pending','processing')",
+        cursor=request.args.get("cursor"), limite=limite_pagina(request.args.get("limit")),
+    )
+    historico = [dict(r) for r in historico]
 
     # conn.close() — fechado pelo teardown
 
@@ -4923,7 +5464,8 @@ def admin_unlocks():
         user=user,
         stats=stats,
         pendentes=pendentes,
-        historico=historico
+        historico=historico,
+        proximo_cursor=proximo_cursor
     )
 
 
@@ -4931,8 +5473,8 @@ def admin_unlocks():
 @login_required
 def admin_unlocks_status():
     """
-    Retorna em JSON todos os desbloqueios (admin).
-    Inclui informações do usuário, valores e status.
+    Retorna em JSON os desbloqueios (admin), paginados por cursor
+    (?cursor=<next_cursor>&limit=N). Inclui informações do usuário, valores e status.
     """
     user = current_user()
     if not user.get("is_admin"):
@@ -4940,17 +5482,18 @@ def admin_unlocks_status():
         return redirect(url_for("dashboard"))
 
     conn = get_db()
-    c = conn.cursor()
-    c.execute("""
+    rows, proximo_cursor = paginar(
+        conn,
+        """
         SELECT t.id, t.user_id, u.email, u.username, t.modelo, t.imei,
                t.amount AS preco_cliente, t.preco_fornecedor, t.lucro,
                t.order_id, t.status, t.created_at, t.updated_at
         FROM transactions t
         LEFT JOIN users u ON u.id = t.user_id
-        WHERE t.purpose='unlock'
-        ORDER BY t.created_at DESC
-    """)
-    rows = c.fetchall()
+        """,
+        coluna="t.created_at", id_col="t.id", where="t.purpose='unlock'",
+        cursor=request.args.get("cursor"), limite=limite_pagina(request.args.get("limit")),
+    )
     # conn.close() — fechado pelo teardown
 
     desbloqueios = []
@@ -4971,7 +5514,59 @@ def admin_unlocks_status():
             "updated_at": row["updated_at"]
         })
 
-    return jsonify({"desbloqueios": desbloqueios})
+    return jsonify({"desbloqueios": desbloqueios, "next_cursor": proximo_cursor})
+
+# -----------------------
+# Admin - Exportação (CSV / NDJSON em streaming)
+# -----------------------
+from flask import stream_with_context
+from exportacao import FORMATOS, exportar
+
+
+@app.route("/admin/export/<entidade>.<formato>")
+@require_role("admin")
+def admin_exportar(entidade, formato):
+    """
+    Exporta transactions, unlocks, orders, licenses ou balance_ledger.
+    Filtros: ?desde=AAAA-MM-DD&ate=AAAA-MM-DD&status=success,pending
+    As linhas saem do cursor direto para a resposta (memória constante).
+    """
+    conn = get_db()
+    try:
+        gerador = exportar(
+            conn, entidade, formato,
+            desde=request.args.get("desde"),
+            ate=request.args.get("ate"),
+            status=request.args.get("status"),
+        )
+    except KeyError:
+        abort(404)
+    # conn.close() — fechado pelo teardown (stream_with_context mantém o request vivo até o fim)
+
+    nome = f"tlux-{entidade}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{formato}"
+    app.logger.info(f"📤 Exportação {entidade}.{formato} por {session.get('user_id')}")
+    return Response(
+        stream_with_context(gerador),
+        content_type=FORMATOS[formato],
+        headers={
+            "Content-Disposition": f'attachment; filename="{nome}"',
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+# -----------------------
+# Admin - Métricas (formato Prometheus)
+# -----------------------
+@app.route("/metrics")
+@require_role("admin")
+def metrics():
+    """Histogramas de latência por endpoint (total, SQL, fornecedores), queries por request e fornecedores."""
+    return Response(
+        metricas.registro.exposicao_prometheus() + metricas_upstream.registro.exposicao_prometheus(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
 
 # -----------------------
 # Admin - Forçar atualização de status (forçar consulta ao iRemoval)
@@ -5036,6 +5631,27 @@ def admin_forcar_status(tx_id):
     flash(f"Status atualizado para '{new_status}'. {message}", "info")
     return redirect(url_for("admin_unlocks"))
 
+# -----------------------
+# Admin - Atualizar status de todos os desbloqueios pendentes (em lote)
+# -----------------------
+@app.route("/admin/forcar_status_pendentes", methods=["POST"], endpoint="admin_forcar_status_pendentes")
+@login_required
+def admin_forcar_status_pendentes():
+    """
+    Atualiza agora as ordens abertas (pending/processing) há mais tempo sem
+    atualização — no máximo UNLOCK_POLL_BATCH por clique, como um ciclo do
+    poller, para o request não ficar preso consultando o fornecedor.
+    """
+    user = current_user()
+    if not user.get("is_admin"):
+        flash("Acesso negado. Apenas administradores.", "danger")
+        return redirect(url_for("dashboard"))
+
+    # Falhas do fornecedor não levantam: a ordem só fica com o status atual
+    alteradas = atualizar_status_desbloqueios(limite=UNLOCK_POLL_BATCH)
+    flash(f"🔄 Pendentes atualizados. {alteradas} desbloqueio(s) com novo status.", "info")
+    return redirect(url_for("admin_unlocks"))
+
 @app.route("/admin/dashboard")
 @login_required
 def admin_dashboard():
@@ -5046,27 +5662,20 @@ def admin_dashboard():
     conn = get_db()
     c = conn.cursor()
 
-    # Total de usuários
-    c.execute("SELECT COUNT(*) as total_users FROM users")
-    row = c.fetchone()
-    total_users = row["total_users"] or 0
-
-    # Transações totais e receita
-    c.execute("SELECT COUNT(*) as total_tx, COALESCE(SUM(amount),0) as total_valor FROM transactions")
-    tx_stats = c.fetchone()
-    total_transactions = tx_stats["total_tx"] or 0
-    receita_total = tx_stats["total_valor"] or 0.0
+    # Totais (tabelas de rollup — custo constante, independe do tamanho de transactions)
+    stats = ler_estatisticas(conn)
+    total_users = stats["usuarios_total"]
+    total_transactions = stats["tx_total"]
+    receita_total = stats["tx_valor_total"]
 
     # Total pago ao fornecedor
-    c.execute("SELECT COALESCE(SUM(preco_fornecedor),0) as total_fornecedor FROM transactions")
-    fornecedor = c.fetchone()["total_fornecedor"] or 0.0
+    fornecedor = stats["tx_fornecedor_total"]
 
     # Lucro líquido (opcional)
     lucro = receita_total - fornecedor
 
     # Total de desbloqueios (considerando transactions.purpose = 'unlock')
-    c.execute("SELECT COUNT(*) as total_unlocks FROM transactions WHERE purpose = 'unlock'")
-    total_unlocks = c.fetchone()["total_unlocks"] or 0
+    total_unlocks = stats["tx_por_purpose"].get("unlock", 0)
 
     # Desbloqueios pendentes (limit 10)
     c.execute("""
@@ -5162,18 +5771,19 @@ def create_checkout_session():
 
         # Valor conforme o pacote ou desbloqueio
         if purpose == "package":
-            pacote_info = PACOTES_USD.get(pacote)
+            pacote_info = tabela_precos_app.atual().pacote(pacote)
             if not pacote_info:
                 # conn.close() — fechado pelo teardown
                 return jsonify({"error": "Pacote inválido"}), 400
-            amount = int(pacote_info["price"] * 100)  # Stripe espera em centavos
+            amount = int(round(pacote_info["preco_usd"] * 100))  # Stripe espera em centavos
             description = f"Pacote {pacote}"
         else:  # desbloqueio
             if not modelo:
                 # conn.close() — fechado pelo teardown
                 return jsonify({"error": "Modelo obrigatório para unlock"}), 400
-            preco_unlock = UNLOCK_PRECOS.get(modelo, 99.99)  # fallback
-            amount = int(preco_unlock * 100)
+            item = tabela_precos_app.atual().preco(modelo)
+            preco_unlock = item.preco_usd if item else 99.99  # fallback
+            amount = int(round(preco_unlock * 100))
             description = f"Desbloqueio {modelo}"
 
         # Cria referência única de transação
@@ -5221,14 +5831,15 @@ def checkout_page(purpose, item):
     preco_usd = 0.0
 
     if purpose == "package":
-        pacote_info = PACOTES_USD.get(item)
+        pacote_info = tabela_precos_app.atual().pacote(item)
         if not pacote_info:
             flash("Pacote inválido.", "danger")
             return redirect(url_for("dashboard"))
-        preco_usd = pacote_info["price"]
+        preco_usd = pacote_info["preco_usd"]
 
     elif purpose == "unlock":
-        preco_usd = UNLOCK_PRECOS.get(item, 99.99)  # fallback se não definido
+        item_preco = tabela_precos_app.atual().preco(item)
+        preco_usd = item_preco.preco_usd if item_preco else 99.99  # fallback se não definido
 
     else:
         flash("Tipo de checkout inválido.", "danger")
@@ -5242,27 +5853,77 @@ def checkout_page(purpose, item):
         preco_usd=preco_usd
     )
 
+# -----------------------
+# Catálogo em cache (snapshot por processo, invalidado pela versão da sync)
+# -----------------------
+from flask import make_response
+
+cache_catalogo = catalogo.CacheCatalogo(db_pool.get_connection)
+
+
+def resposta_condicional(etag: str, ultima_modificacao, gerar, publico: bool = False):
+    """
+    GET condicional: se o cliente já tem `etag` (If-None-Match) ou nada mudou desde
+    If-Modified-Since, responde 304 sem chamar `gerar()`. Sempre revalida (no-cache).
+    Sem `ultima_modificacao` (None) só o ETag vale.
+    Com flash pendente a página sai completa e sem validadores (no-store): o 304
+    esconderia a mensagem e a cópia guardada a repetiria depois.
+    """
+    if session.get("_flashes"):
+        resp = make_response(gerar())
+        resp.cache_control.no_store = True
+        return resp
+    if request.if_none_match:
+        atual = request.if_none_match.contains(etag)
+    else:
+        atual = (bool(request.if_modified_since) and ultima_modificacao is not None
+                 and ultima_modificacao <= request.if_modified_since)
+    resp = Response(status=304) if atual else make_response(gerar())
+    resp.set_etag(etag)
+    resp.last_modified = ultima_modificacao
+    resp.cache_control.no_cache = True
+    if publico:
+        resp.cache_control.public = True
+    else:
+        resp.cache_control.private = True
+    return resp
+
+
 @app.route("/services")
 @login_required
 def services():
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT * FROM services ORDER BY group_name, nome")
-    servicos = c.fetchall()
-    # conn.close() — fechado pelo teardown
-    return render_template("services.html", servicos=servicos)
+    snap = cache_catalogo.snapshot()
+    # A página tem o menu do usuário (com os links de admin) e o idioma: entram no ETag
+    etag = f"{snap.etag}-u{session.get('user_id')}-a{int(bool(session.get('is_admin')))}-{_idioma_email()}"
+    return resposta_condicional(etag, snap.atualizado_em,
+                                lambda: render_template("services.html", servicos=snap.servicos))
+
+
+@app.route("/api/precos")
+def api_precos():
+    """
+    Tabela de preços inteira numa moeda (?moeda=MZN ou ?region=MZ), direto do
+    livro de preços (ItemPreco.locais, remontado quando as taxas mudam).
+    """
+    moeda = (request.args.get("moeda") or get_currency_for_region(request.args.get("region"))).upper()
+    livro = tabela_precos_app.atual()
+    try:
+        precos = livro.precos_em(moeda)
+    except KeyError:
+        return jsonify({"error": f"Moeda não suportada: {moeda}"}), 400
+    etag = f"precos-{moeda}-{livro.assinatura}"
+    return resposta_condicional(etag, None, lambda: jsonify({
+        "moeda": moeda,
+        "taxa": livro.taxas[moeda],
+        "precos": dict(precos),
+    }), publico=True)
 
 @app.route("/comprar_servico/<int:service_id>", methods=["GET", "POST"])
 @login_required
 def comprar_servico(service_id):
     user = current_user()
 
-    # Buscar serviço no banco
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT * FROM services WHERE id = ?", (service_id,))
-    servico = c.fetchone()
-    # conn.close() — fechado pelo teardown
+    servico = cache_catalogo.servico(service_id)
 
     if not servico:
         flash("❌ Serviço não encontrado.", "danger")
@@ -5297,7 +5958,7 @@ def comprar_servico(service_id):
             # Caso contrário → não precisa de nada
 
         try:
-            resp = requests.post(DHRU_API_URL, data=payload, timeout=30)  # ✅ URL do .env
+            resp = http_client.post(DHRU_API_URL, data=payload, action="place_order")  # ✅ URL do .env
             resp.raise_for_status()
             result = resp.json()
 
@@ -5376,11 +6037,13 @@ def admin_orders():
 
     conn = get_db()
     c = conn.cursor()
-    c.execute("SELECT * FROM orders ORDER BY created_at DESC")
-    pedidos = c.fetchall()
+    pedidos, proximo_cursor = paginar(
+        conn, "SELECT * FROM orders",
+        cursor=request.args.get("cursor"), limite=limite_pagina(request.args.get("limit")),
+    )
     # conn.close() — fechado pelo teardown
 
-    return render_template("admin_orders.html", pedidos=pedidos)
+    return render_template("admin_orders.html", pedidos=pedidos, proximo_cursor=proximo_cursor)
 
 @app.route("/pricing")
 def pricing():
@@ -5397,19 +6060,26 @@ def admin_sync_services():
     if not session.get("is_admin"):
         flash("Unauthorized", "danger")
         return redirect(url_for("dashboard"))
-    # importa e executa script sync_services.py (ou função)
-    import sync_services
-    sync_services.main()
-    flash("Services synchronized.", "success")
+    if agendar_sync_catalogo():
+        flash("Services sync started.", "info")
+    else:
+        flash("Failed to start services sync.", "danger")
     return redirect(url_for("admin_dashboard"))
 
+
+@app.route("/admin/sync-services/status")
+@require_role("admin")
+def admin_sync_services_status():
+    """Progresso da última sincronização do catálogo (polling do painel)."""
+    return jsonify(catalogo.ultima_execucao(get_db()) or {})
+
 import re, json, sqlite3, requests, os
 from flask import request, render_template, redirect, url_for, flash
 from datetime import datetime
 from dotenv import load_dotenv
 
 load_dotenv()
-DB_PATH = os.getenv("DB_PATH", "t-lux.db")
+DB_PATH = db_pool.DB_FILE
 DHRU_API_URL = os.getenv("DHRU_API_URL")
 DHRU_API_KEY = os.getenv("DHRU_API_KEY")
 DHRU_USERNAME = os.getenv("DHRU_USERNAME", "T-Lux")
@@ -5425,7 +6095,7 @@ def dhru_check_imei(imei):
         "service_id": "212",
         "imei": imei
     }
-    r = requests.post(DHRU_API_URL, data=payload, timeout=30)
+    r = http_client.post(DHRU_API_URL, data=payload, action="place_order")
     r.raise_for_status()
     return r.json()
 
@@ -5540,23 +6210,17 @@ import os
 import sqlite3
 import requests
 from flask import request, jsonify
-from requests.adapters import HTTPAdapter, Retry
 
 # Lê variáveis de ambiente do .env
 IREMOVAL_ENDPOINT = os.getenv("IREMOVAL_ENDPOINT", "https://bulk.iremove.tools/api/dhru/api/index.php")
 IREMOVAL_USER = os.getenv("IREMOVAL_USER")
 IREMOVAL_API = os.getenv("IREMOVAL_API")
-DB_PATH = "t-lux.db"
+DB_PATH = db_pool.DB_FILE
 
 # Garante que o endpoint termina corretamente
 if not IREMOVAL_ENDPOINT.endswith("/api/index.php"):
     IREMOVAL_ENDPOINT = IREMOVAL_ENDPOINT.rstrip("/") + "/api/index.php"
 
-# Sessão dedicada ao iRemoval Tools (evita conflito com Flask.session)
-iremove_session = requests.Session()
-retries = Retry(total=3, backoff_factor=0.6, status_forcelist=[429, 500, 502, 503, 504])
-iremove_session.mount("https://", HTTPAdapter(max_retries=retries))
-
 def iremoval_post(action, parameters="", requestformat="json"):
     """Faz POST para o endpoint Dhru com os dados necessários"""
     data = {
@@ -5569,7 +6233,8 @@ def iremoval_post(action, parameters="", requestformat="json"):
         data["parameters"] = parameters
 
     try:
-        r = iremove_session.post(IREMOVAL_ENDPOINT, data=data, timeout=20)
+        # Sessão/pool, retry e circuit breaker ficam no http_client
+        r = http_client.post(IREMOVAL_ENDPOINT, data=data, action=action)
         try:
             j = r.json()
         except ValueError:
@@ -5583,17 +6248,13 @@ def iremoval_post(action, parameters="", requestformat="json"):
 # -----------------------
 @app.route("/iremoval/list_services", methods=["GET"])
 def list_iremoval_services():
-    res = iremoval_post("imeiservicelist")
-    if not res.get("ok"):
-        return jsonify({"ok": False, "error": "provider_error", "detail": res.get("error", res.get("text"))}), 502
-    return jsonify(res.get("json"))
+    # Lista do catálogo sincronizado (mesmo formato do imeiservicelist), sem ir ao fornecedor
+    snap = cache_catalogo.snapshot()
+    return resposta_condicional(snap.etag, snap.atualizado_em, lambda: jsonify(snap.lista_dhru()), publico=True)
 
 # -----------------------
 # 🔓 Enviar pedido de desbloqueio (iRemoval Tools)
 # -----------------------
-import requests
-iremove_session = requests.Session()
-
 @app.route("/iremoval/place_order", methods=["POST"])
 def place_iremoval_order():
     """
@@ -5636,7 +6297,7 @@ def place_iremoval_order():
             status = j["ERROR"][0].get("MESSAGE", "error")
 
     # Salva no banco local
-    with sqlite3.connect(DB_PATH) as conn:
+    with db_pool.get_connection(DB_PATH) as conn:
         c = conn.cursor()
         c.execute("""
             CREATE TABLE IF NOT EXISTS iremoval_orders (
@@ -5711,11 +6372,49 @@ def inject_user():
         user = current_user()
         return dict(current_user=user)
     except Exception as e:
-        print(f"[WARN] inject_user() error: {e}")
+        log("WARNING", f"[WARN] inject_user() error: {e}")
         return dict(current_user=None)
 # -----------------------
 # Bootstrap
 # -----------------------
+# Migrações versionadas pendentes (idempotentes — seguro com vários workers)
+try:
+    aplicar_migracoes()
+except Exception as e:
+    app.logger.error(f"[MIGRATIONS] Falha ao aplicar migrações: {e}")
+# Colunas de services usadas pela sincronização (available, content_hash, ...)
+try:
+    catalogo.garantir_schema(db_pool.get_connection())
+except Exception as e:
+    app.logger.error(f"[CATALOGO] Falha ao preparar a tabela services: {e}")
+
+# Workers em background (um por processo)
+if UNLOCK_POLL_ENABLED:
+    iniciar_poller_unlocks()
+if UNLOCK_QUEUE_ENABLED:
+    iniciar_workers_unlock()
+if STRIPE_LEDGER_ENABLED:
+    iniciar_worker_stripe()
+if CATALOGO_SYNC_ENABLED:
+    iniciar_worker_catalogo()
+# Taxas de câmbio: último lote gravado já no arranque, depois atualização periódica
+try:
+    servico_cambio.carregar()
+except Exception as e:
+    app.logger.error(f"[CAMBIO] Falha ao carregar as taxas gravadas: {e}")
+if CAMBIO_REFRESH_ENABLED:
+    servico_cambio.iniciar()
+if EVENT_LOG_ASYNC:
+    log_eventos.iniciar()
+if EMAIL_QUEUE_ENABLED:
+    servico_email.iniciar()
+
+# Templates de e-mail compilados uma vez por idioma (OTP, verificação, licença)
+try:
+    precompilar_emails(app.config.get("LANGUAGES") or ("en",))
+except Exception as e:
+    app.logger.error(f"[EMAIL] Falha ao pré-compilar templates: {e}")
+
 if __name__ == "__main__":
     with app.app_context():
         init_db()
@@ -0,0 +1,445 @@
+# benchmark_funil.py — Benchmark do funil de compra de desbloqueio (sem rede)
+#
+# Cada usuário virtual repete o funil:
+#   login → /verificar_serial → /pagar_desbloqueio → /stripe/webhook → /painel/unlocks/status
+# (o status é consultado até a ordem aparecer, i.e. até o worker da fila ter
+# chamado placeimeiorder no fornecedor simulado).
+#
+# Tudo roda local: banco SQLite temporário, fornecedor_simulado no lugar de
+# Dhru/iRemoval, IMEI.info e Stripe (latências configuráveis), webhook assinado
+# com o STRIPE_WEBHOOK_SECRET do benchmark. Os níveis de concorrência rodam em
+# sequência e o resultado vai para um JSON (compare execuções com --comparar).
+#
+# Exemplos:
+#   python benchmark_funil.py
+#   python benchmark_funil.py --concorrencia 1,4,16 --funis 30 --latencia placeimeiorder=0.4,stripe_checkout=0.15
+#   python benchmark_funil.py --gunicorn 4            # servidor real (gunicorn) em vez do test client
+#   python benchmark_funil.py --comparar resultados_benchmark/funil-20261017-101500.json
+#
+# Espera de lock do SQLite (só no modo test client, onde as queries rodam neste
+# processo): o tempo de cada INSERT/UPDATE/DELETE acima da mediana das escritas
+# no primeiro nível (sem disputa) é contado como espera por lock.
+import argparse
+import json
+import os
+import platform
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from fornecedor_simulado import FornecedorSimulado, assinatura_stripe
+from metricas import Histograma
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ETAPAS = ("login", "verificar_serial", "pagar_desbloqueio", "stripe_webhook", "unlocks_status")
+SENHA = "bench-senha-123"
+WEBHOOK_SECRET = "whsec_benchmark"
+MODELO = "iPhone X"
+ESCRITAS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+# ===============================
+#  Ambiente (banco + fornecedor)
+# ===============================
+def criar_banco(caminho: str, usuarios: int, bcrypt_rounds: int):
+    """Schema completo (migrate_all.sql + migrations/) e `usuarios` contas com acesso ativo."""
+    import bcrypt
+    from migrate_db import aplicar_migracoes
+
+    conn = sqlite3.connect(caminho)
+    with open(os.path.join(BASE_DIR, "migrate_all.sql"), encoding="utf-8") as f:
+        conn.executescript(f.read())
+    aplicar_migracoes(conn)
+    senha_hash = bcrypt.hashpw(SENHA.encode("utf-8"), bcrypt.gensalt(bcrypt_rounds)).decode("utf-8")
+    conn.executemany(
+        """INSERT INTO users (email, password_hash, first_name, role, email_verified, approved,
+                              access_expiry, created_at)
+           VALUES (?, ?, 'Bench', 'user', 1, 1, '2099-12-31T00:00:00', datetime('now'))""",
+        [(f"bench{i}@t-lux.test", senha_hash) for i in range(usuarios)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def variaveis_ambiente(db: str, fornecedor: FornecedorSimulado, args) -> dict:
+    return {
+        "DB_FILE": db,
+        "IREMOVAL_USER": "bench",
+        "IREMOVAL_API": "bench",
+        "IREMOVAL_ENDPOINT": fornecedor.url_dhru,
+        "DHRU_API_URL": fornecedor.url_dhru,
+        "IMEI_BASE_URL": fornecedor.url,
+        "STRIPE_SECRET_KEY": "sk_test_benchmark",
+        "STRIPE_WEBHOOK_SECRET": WEBHOOK_SECRET,
+        "STRIPE_API_BASE": fornecedor.url,
+        "UNLOCK_POLL_ENABLED": "0",
+        "UNLOCK_QUEUE_ENABLED": "1",
+        "UNLOCK_QUEUE_WORKERS": str(args.workers_fila),
+        "EMAIL_QUEUE_ENABLED": "0",
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "ERROR"),
+    }
+
+
+# ===============================
+#  Clientes (test client / HTTP)
+# ===============================
+class _Resposta:
+    __slots__ = ("status", "location", "texto")
+
+    def __init__(self, status, location, texto):
+        self.status, self.location, self.texto = status, location or "", texto
+
+    def json(self):
+        return json.loads(self.texto)
+
+
+class ClienteFlask:
+    """Um test client por usuário virtual (cookies próprios); as rotas rodam neste processo."""
+
+    def __init__(self, flask_app):
+        self._c = flask_app.test_client()
+
+    def get(self, caminho):
+        r = self._c.get(caminho)
+        return _Resposta(r.status_code, r.headers.get("Location"), r.get_data(as_text=True))
+
+    def post(self, caminho, dados=None, corpo=None, headers=None):
+        r = self._c.post(caminho, data=corpo if corpo is not None else dados, headers=headers or {})
+        return _Resposta(r.status_code, r.headers.get("Location"), r.get_data(as_text=True))
+
+
+class ClienteHttp:
+    def __init__(self, base_url):
+        import requests
+        self._base = base_url.rstrip("/")
+        self._s = requests.Session()
+
+    def get(self, caminho):
+        r = self._s.get(self._base + caminho, allow_redirects=False, timeout=60)
+        return _Resposta(r.status_code, r.headers.get("Location"), r.text)
+
+    def post(self, caminho, dados=None, corpo=None, headers=None):
+        r = self._s.post(self._base + caminho, data=corpo if corpo is not None else dados,
+                         headers=headers or {}, allow_redirects=False, timeout=60)
+        return _Resposta(r.status_code, r.headers.get("Location"), r.text)
+
+
+# ===============================
+#  Medições
+# ===============================
+class Medicoes:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.etapas = {etapa: Histograma(1e-6) for etapa in ETAPAS}
+        self.erros = dict.fromkeys(ETAPAS, 0)
+        self.ate_ordem = Histograma(1e-6)
+        self.funis_ok = 0
+        self.escritas = []   # segundos de cada INSERT/UPDATE/DELETE (modo test client)
+
+    def etapa(self, nome, segundos, ok=True):
+        with self._lock:
+            self.etapas[nome].registrar(segundos * 1_000_000)
+            if not ok:
+                self.erros[nome] += 1
+
+    def observar_sql(self, sql, segundos):
+        if sql.lstrip()[:7].upper().startswith(ESCRITAS):
+            with self._lock:
+                self.escritas.append(segundos)
+
+
+def _ms(h: Histograma, p) -> float:
+    return round(h.percentil(p) * 1000, 2)
+
+
+def _cronometrar(medicoes, etapa, funcao, esperado):
+    inicio = time.perf_counter()
+    try:
+        r = funcao()
+    except Exception:
+        medicoes.etapa(etapa, time.perf_counter() - inicio, ok=False)
+        raise
+    medicoes.etapa(etapa, time.perf_counter() - inicio, ok=r.status in esperado)
+    if r.status not in esperado:
+        raise RuntimeError(f"{etapa}: HTTP {r.status}")
+    return r
+
+
+def rodar_funil(cliente, fornecedor, medicoes, usuario: int, serial: str, espera_ordem: float):
+    _cronometrar(medicoes, "login", lambda: cliente.post(
+        "/login", {"email": f"bench{usuario}@t-lux.test", "password": SENHA}), (302,))
+    _cronometrar(medicoes, "verificar_serial", lambda: cliente.post(
+        "/verificar_serial", {"modelo": MODELO, "serial": serial}), (200,))
+    r = _cronometrar(medicoes, "pagar_desbloqueio", lambda: cliente.post(
+        "/pagar_desbloqueio", {"modelo": MODELO, "serial": serial}), (302, 303))
+    sessao_id = r.location.rstrip("/").rsplit("/", 1)[-1]
+    if not sessao_id.startswith("cs_test_"):
+        medicoes.etapa("pagar_desbloqueio", 0, ok=False)
+        raise RuntimeError(f"pagar_desbloqueio não redirecionou ao checkout: {r.location}")
+
+    payload = json.dumps(fornecedor.evento_checkout_concluido(sessao_id))
+    _cronometrar(medicoes, "stripe_webhook", lambda: cliente.post(
+        "/stripe/webhook", corpo=payload,
+        headers={"Stripe-Signature": assinatura_stripe(payload, WEBHOOK_SECRET),
+                 "Content-Type": "application/json"}), (200,))
+
+    pago_em = time.perf_counter()
+    limite = pago_em + espera_ordem
+    while True:
+        r = _cronometrar(medicoes, "unlocks_status", lambda: cliente.get("/painel/unlocks/status"), (200,))
+        minha = next((d for d in r.json().get("desbloqueios", []) if d["imei"] == serial), None)
+        if minha and minha.get("order_id"):
+            with medicoes._lock:
+                medicoes.ate_ordem.registrar((time.perf_counter() - pago_em) * 1_000_000)
+                medicoes.funis_ok += 1
+            return
+        if time.perf_counter() >= limite:
+            raise RuntimeError(f"ordem de {serial} não apareceu em {espera_ordem}s")
+        time.sleep(0.05)
+
+
+def rodar_nivel(novo_cliente, fornecedor, concorrencia: int, funis: int, espera_ordem: float,
+                nivel: int, perfil_sql=None) -> dict:
+    """Um nível de concorrência. `perfil_sql` (modo test client) liga a medição das escritas."""
+    medicoes = Medicoes()
+    falhas = []
+
+    def usuario_virtual(vu):
+        cliente = novo_cliente()
+        for j in range(funis):
+            serial = f"35{nivel:02d}{vu:04d}{j:07d}"
+            try:
+                rodar_funil(cliente, fornecedor, medicoes, vu, serial, espera_ordem)
+            except Exception as e:
+                falhas.append(str(e)[:200])
+                cliente = novo_cliente()
+
+    if perfil_sql:
+        perfil_sql.observar(medicoes.observar_sql)
+    inicio = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+            list(pool.map(usuario_virtual, range(concorrencia)))
+    finally:
+        duracao = time.perf_counter() - inicio
+        if perfil_sql:
+            perfil_sql.parar_de_observar(medicoes.observar_sql)
+
+    requisicoes = sum(h.total for h in medicoes.etapas.values())
+    total = Histograma(1e-6)
+    for h in medicoes.etapas.values():
+        total.mesclar(h)
+    return {
+        "concorrencia": concorrencia,
+        "funis": concorrencia * funis,
+        "funis_ok": medicoes.funis_ok,
+        "duracao_s": round(duracao, 3),
+        "requisicoes": requisicoes,
+        "throughput_rps": round(requisicoes / duracao, 2) if duracao else 0.0,
+        "funis_por_s": round(medicoes.funis_ok / duracao, 3) if duracao else 0.0,
+        "p50_ms": _ms(total, 50),
+        "p99_ms": _ms(total, 99),
+        "etapas": {
+            etapa: {"n": h.total, "p50_ms": _ms(h, 50), "p99_ms": _ms(h, 99),
+                    "max_ms": round(h.maximo / 1000, 2), "erros": medicoes.erros[etapa]}
+            for etapa, h in medicoes.etapas.items()
+        },
+        "pagamento_ate_ordem": {"p50_ms": _ms(medicoes.ate_ordem, 50), "p99_ms": _ms(medicoes.ate_ordem, 99)},
+        "falhas": falhas[:10],
+        "_escritas": medicoes.escritas,
+    }
+
+
+def espera_lock(escritas: list, base: float) -> dict:
+    """Escritas acima da mediana sem disputa (`base`) → tempo esperando lock."""
+    esperas = sorted(max(0.0, s - base) for s in escritas)
+    if not esperas:
+        return {"escritas": 0, "lock_wait_ms_total": 0.0, "lock_wait_p99_ms": 0.0}
+    return {
+        "escritas": len(esperas),
+        "lock_wait_ms_total": round(sum(esperas) * 1000, 2),
+        "lock_wait_p99_ms": round(esperas[min(len(esperas) - 1, int(len(esperas) * 0.99))] * 1000, 2),
+    }
+
+
+# ===============================
+#  Servidor (test client / gunicorn)
+# ===============================
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def subir_gunicorn(workers: int, ambiente: dict):
+    porta = _porta_livre()
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "--threads", "4",
+         "-b", f"127.0.0.1:{porta}", "app:_app_real()"],
+        cwd=BASE_DIR, env={**os.environ, **ambiente},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{porta}"
+    limite = time.time() + 60
+    while time.time() < limite:
+        try:
+            with socket.create_connection(("127.0.0.1", porta), timeout=0.5):
+                return processo, url
+        except OSError:
+            if processo.poll() is not None:
+                raise RuntimeError("gunicorn não subiu (veja os logs rodando o comando à mão)")
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError("gunicorn não respondeu em 60s")
+
+
+def _latencias(texto: str) -> dict:
+    latencias = {}
+    for par in (texto or "").split(","):
+        if "=" in par:
+            acao, segundos = par.split("=", 1)
+            latencias[acao.strip()] = float(segundos)
+    return latencias
+
+
+def _commit_git() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+
+def executar(args) -> dict:
+    pasta = tempfile.mkdtemp(prefix="tlux-bench-")
+    db = os.path.join(pasta, "bench.db")
+    niveis = [int(n) for n in args.concorrencia.split(",")]
+
+    fornecedor = FornecedorSimulado(_latencias(args.latencia), latencia_padrao=args.latencia_padrao).iniciar()
+    ambiente = variaveis_ambiente(db, fornecedor, args)
+    # Antes de qualquer import que leia DB_FILE (db_pool, migrate_db, app)
+    os.environ.update(ambiente)
+    processo = perfil_sql = None
+    try:
+        criar_banco(db, max(niveis), args.bcrypt_rounds)
+        if args.gunicorn:
+            processo, url = subir_gunicorn(args.gunicorn, ambiente)
+            novo_cliente = lambda: ClienteHttp(url)  # noqa: E731
+        else:
+            import app as tlux
+            import perfil_sql
+            flask_app = tlux._app_real()
+            flask_app.config["TESTING"] = True
+            novo_cliente = lambda: ClienteFlask(flask_app)  # noqa: E731
+
+        # Aquecimento (imports preguiçosos, workers do gunicorn, caches): não entra no resultado
+        for i in range(args.aquecimento):
+            rodar_funil(novo_cliente(), fornecedor, Medicoes(), 0, f"3599{i:011d}", args.espera_ordem)
+
+        resultados, base_escrita = [], None
+        for i, concorrencia in enumerate(niveis):
+            nivel = rodar_nivel(novo_cliente, fornecedor, concorrencia, args.funis, args.espera_ordem,
+                                i, perfil_sql)
+            escritas = nivel.pop("_escritas")
+            if perfil_sql:
+                if base_escrita is None and escritas:
+                    base_escrita = sorted(escritas)[len(escritas) // 2]
+                nivel["sqlite"] = espera_lock(escritas, base_escrita or 0.0)
+            else:
+                nivel["sqlite"] = None
+            resultados.append(nivel)
+            _imprimir_nivel(nivel)
+    finally:
+        if processo:
+            processo.terminate()
+            processo.wait(10)
+        fornecedor.parar()
+
+    return {
+        "benchmark": "funil_desbloqueio",
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_git(),
+        "python": platform.python_version(),
+        "modo": f"gunicorn x{args.gunicorn}" if args.gunicorn else "flask test client",
+        "parametros": {
+            "concorrencia": niveis, "funis_por_usuario": args.funis, "bcrypt_rounds": args.bcrypt_rounds,
+            "workers_fila": args.workers_fila, "latencia_padrao_s": args.latencia_padrao,
+            "latencias_s": _latencias(args.latencia), "espera_ordem_s": args.espera_ordem,
+            "aquecimento": args.aquecimento,
+        },
+        "chamadas_fornecedor": dict(fornecedor.chamadas),
+        "niveis": resultados,
+    }
+
+
+# ===============================
+#  Saída / comparação
+# ===============================
+def _imprimir_nivel(n: dict):
+    sqlite_txt = ""
+    if n.get("sqlite"):
+        sqlite_txt = f" · lock wait {n['sqlite']['lock_wait_ms_total']} ms (p99 {n['sqlite']['lock_wait_p99_ms']} ms)"
+    print(f"  c={n['concorrencia']:>3}  {n['throughput_rps']:>8} req/s  {n['funis_por_s']:>7} funis/s  "
+          f"p50 {n['p50_ms']} ms  p99 {n['p99_ms']} ms  ok {n['funis_ok']}/{n['funis']}{sqlite_txt}")
+    for etapa, e in n["etapas"].items():
+        print(f"        {etapa:<18} n={e['n']:<5} p50 {e['p50_ms']:>8} ms  p99 {e['p99_ms']:>8} ms  erros {e['erros']}")
+
+
+def comparar(atual: dict, anterior: dict):
+    print(f"\n📊 Comparação com {anterior.get('quando')} ({anterior.get('commit') or '?'})")
+    antes = {n["concorrencia"]: n for n in anterior.get("niveis", [])}
+    for n in atual["niveis"]:
+        a = antes.get(n["concorrencia"])
+        if not a:
+            continue
+
+        def delta(campo):
+            if not a[campo]:
+                return "n/a"
+            return f"{(n[campo] - a[campo]) / a[campo] * 100:+.1f}%"
+
+        print(f"  c={n['concorrencia']:>3}  throughput {delta('throughput_rps'):>8}  "
+              f"p50 {delta('p50_ms'):>8}  p99 {delta('p99_ms'):>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do funil de desbloqueio (sem rede).")
+    parser.add_argument("--concorrencia", default="1,2,4,8", help="níveis de usuários virtuais (ex.: 1,4,16)")
+    parser.add_argument("--funis", type=int, default=20, help="funis por usuário virtual em cada nível")
+    parser.add_argument("--latencia", default="", help="latência por ação do fornecedor, ex.: placeimeiorder=0.3,stripe_checkout=0.1")
+    parser.add_argument("--latencia-padrao", type=float, default=0.05, help="latência das demais ações (s)")
+    parser.add_argument("--espera-ordem", type=float, default=15.0, help="tempo máximo até a ordem aparecer no status (s)")
+    parser.add_argument("--workers-fila", type=int, default=2, help="UNLOCK_QUEUE_WORKERS")
+    parser.add_argument("--aquecimento", type=int, default=2, help="funis descartados antes de medir")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4, help="custo do bcrypt das contas do benchmark")
+    parser.add_argument("--gunicorn", type=int, default=0, metavar="WORKERS", help="usa gunicorn local em vez do test client")
+    parser.add_argument("--saida", default=None, help="arquivo JSON (padrão: resultados_benchmark/funil-<data>.json)")
+    parser.add_argument("--comparar", default=None, help="JSON de uma execução anterior")
+    args = parser.parse_args(argv)
+
+    print(f"🏁 Funil de desbloqueio — níveis {args.concorrencia}, {args.funis} funis por usuário")
+    resultado = executar(args)
+
+    saida = args.saida or os.path.join(
+        BASE_DIR, "resultados_benchmark", f"funil-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"💾 Resultado salvo em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(resultado, json.load(f))
+    return resultado
+
+
+if __name__ == "__main__":
+    main()
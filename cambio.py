@@ -0,0 +1,268 @@
+# cambio.py — Taxas de câmbio: atualização periódica, histórico no SQLite e conversão em lote
+#
+# - a fonte é plugável: qualquer callable que devolva {moeda: unidades por 1 USD}
+#   (FonteArquivo nos testes / JSON local, FonteHTTP para uma API, FonteFixa
+#   com o EXCHANGE_RATES do código como último recurso)
+# - cada mudança vira um lote em cambio_lotes/cambio_taxas (histórico); um lote
+#   recente gravado por outro worker é reaproveitado em vez de consultar a fonte
+# - converter(valores, moeda) converte a lista inteira com uma única busca de
+#   taxa; taxas novas remontam o livro de preços (ao_atualizar), que já traz o
+#   preço de cada modelo em todas as moedas
+import json
+import logging
+import math
+import os
+import threading
+import time
+from types import MappingProxyType
+
+import db_pool
+
+logger = logging.getLogger(__name__)
+
+CAMBIO_INTERVALO = float(os.getenv("CAMBIO_INTERVALO", "3600"))
+
+
+# ===============================
+#  Fontes
+# ===============================
+class FonteFixa:
+    def __init__(self, taxas: dict):
+        self.taxas = dict(taxas)
+        self.nome = "fixa"
+
+    def __call__(self) -> dict:
+        return dict(self.taxas)
+
+
+class FonteArquivo:
+    """JSON {"rates": {...}} ou direto {moeda: taxa}."""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.nome = f"arquivo:{os.path.basename(caminho)}"
+
+    def __call__(self) -> dict:
+        with open(self.caminho, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        return dados.get("rates", dados)
+
+
+class FonteHTTP:
+    """API no formato {"base": "USD", "rates": {...}} (ex.: open.er-api.com/v6/latest/USD)."""
+
+    def __init__(self, url: str, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+        self.nome = "http"
+
+    def __call__(self) -> dict:
+        import http_client  # só quem usa a fonte HTTP precisa de requests
+
+        resp = http_client.get(self.url, provider="cambio", action="latest", timeout=self.timeout)
+        resp.raise_for_status()
+        dados = resp.json()
+        base = (dados.get("base") or dados.get("base_code") or "USD").upper()
+        if base != "USD":
+            raise ValueError(f"Fonte de câmbio com base {base} (esperado USD)")
+        return dados.get("rates") or {}
+
+
+def fonte_de_config(valor: str, padrao: dict):
+    """EXCHANGE_RATES_SOURCE: vazio → taxas fixas; http(s)://… → API; caminho (ou file:…) → JSON."""
+    valor = (valor or "").strip()
+    if not valor:
+        return FonteFixa(padrao)
+    if valor.startswith(("http://", "https://")):
+        return FonteHTTP(valor)
+    return FonteArquivo(valor[len("file:"):] if valor.startswith("file:") else valor)
+
+
+def validar(taxas: dict) -> dict:
+    """Só moedas de 3 letras com taxa finita > 0; USD é sempre 1."""
+    limpas = {}
+    for moeda, taxa in (taxas or {}).items():
+        try:
+            taxa = float(taxa)
+        except (TypeError, ValueError):
+            continue
+        if isinstance(moeda, str) and len(moeda) == 3 and math.isfinite(taxa) and taxa > 0:
+            limpas[moeda.upper()] = taxa
+    limpas["USD"] = 1.0
+    return limpas
+
+
+# ===============================
+#  Serviço
+# ===============================
+class ServicoCambio:
+    def __init__(self, db_path: str, fonte, padrao: dict, intervalo: float = CAMBIO_INTERVALO):
+        self.db_path = db_path
+        self.fonte = fonte
+        self.intervalo = intervalo
+        self.versao = 1
+        self._taxas = MappingProxyType(validar(padrao))
+        self._lote = None
+        self._lock = threading.Lock()
+        self._ouvintes = []
+        self._schema_ok = False
+        self._parar = threading.Event()
+        self._thread = None
+
+    # ===============================
+    #  Persistência
+    # ===============================
+    def _connect(self):
+        return db_pool.get_connection(self.db_path)
+
+    def garantir_tabela(self):
+        if self._schema_ok:
+            return
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cambio_lotes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fonte TEXT,
+                coletado_em REAL NOT NULL,
+                conferido_em REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cambio_taxas (
+                lote_id INTEGER NOT NULL,
+                moeda TEXT NOT NULL,
+                taxa REAL NOT NULL,
+                PRIMARY KEY (lote_id, moeda)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cambio_taxas_moeda ON cambio_taxas(moeda, lote_id)")
+        conn.commit()
+        self._schema_ok = True
+
+    def _ultimo_lote(self, conn):
+        lote = conn.execute(
+            "SELECT id, conferido_em FROM cambio_lotes ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        if not lote:
+            return None, None, {}
+        taxas = {m: t for m, t in conn.execute("SELECT moeda, taxa FROM cambio_taxas WHERE lote_id=?", (lote[0],))}
+        return lote[0], lote[1], taxas
+
+    def historico(self, moeda: str, limite: int = 30) -> list:
+        """[(coletado_em, taxa)] da moeda, mais recente primeiro."""
+        self.garantir_tabela()
+        return self._connect().execute("""
+            SELECT l.coletado_em, t.taxa FROM cambio_taxas t JOIN cambio_lotes l ON l.id = t.lote_id
+            WHERE t.moeda=? ORDER BY t.lote_id DESC LIMIT ?
+        """, ((moeda or "").upper(), limite)).fetchall()
+
+    # ===============================
+    #  Atualização
+    # ===============================
+    def carregar(self) -> bool:
+        """Adota o último lote gravado (arranque sem depender da fonte). True se havia um."""
+        self.garantir_tabela()
+        lote_id, _, taxas = self._ultimo_lote(self._connect())
+        if not lote_id:
+            return False
+        with self._lock:
+            self._adotar(lote_id, taxas)
+        return True
+
+    def atualizar(self, forcar: bool = False) -> bool:
+        """
+        Consulta a fonte (se o último lote não for recente) e grava um lote novo
+        quando as taxas mudam. Retorna True se as taxas em uso mudaram.
+        """
+        self.garantir_tabela()
+        conn = self._connect()
+        lote_id, conferido_em, gravadas = self._ultimo_lote(conn)
+        with self._lock:
+            if not forcar and lote_id and time.time() - conferido_em < self.intervalo:
+                # Outro worker (ou este) já consultou a fonte há pouco
+                return self._adotar(lote_id, gravadas)
+
+            # Valida só o que veio da fonte: um valor ruim (ex.: "n/a") não apaga a taxa anterior
+            novas = {**self._taxas, **gravadas, **validar(self.fonte())}
+            agora = time.time()
+            if lote_id and novas == gravadas:
+                conn.execute("UPDATE cambio_lotes SET conferido_em=? WHERE id=?", (agora, lote_id))
+                conn.commit()
+                return self._adotar(lote_id, gravadas)
+
+            try:
+                cur = conn.execute(
+                    "INSERT INTO cambio_lotes (fonte, coletado_em, conferido_em) VALUES (?, ?, ?)",
+                    (getattr(self.fonte, "nome", None), agora, agora))
+                novo_id = cur.lastrowid
+                conn.executemany("INSERT INTO cambio_taxas (lote_id, moeda, taxa) VALUES (?, ?, ?)",
+                                 [(novo_id, m, t) for m, t in sorted(novas.items())])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            logger.info("Câmbio: lote %s gravado (%s moedas)", novo_id, len(novas), extra={"lote": novo_id})
+            return self._adotar(novo_id, novas)
+
+    def _adotar(self, lote_id: int, taxas: dict) -> bool:
+        """Troca as taxas em uso (com self._lock). Avisa os ouvintes se mudaram."""
+        if lote_id == self._lote or not taxas:
+            return False
+        self._lote = lote_id
+        if dict(self._taxas) == taxas:
+            return False
+        self._taxas = MappingProxyType(dict(taxas))
+        self.versao += 1
+        for ouvinte in self._ouvintes:
+            try:
+                ouvinte(self._taxas)
+            except Exception:
+                logger.exception("Erro ao aplicar novas taxas de câmbio")
+        return True
+
+    def ao_atualizar(self, ouvinte):
+        """`ouvinte(taxas)` roda sempre que as taxas em uso mudam (ex.: remontar o livro de preços)."""
+        self._ouvintes.append(ouvinte)
+
+    def iniciar(self):
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        self._parar.clear()
+
+        def loop():
+            while not self._parar.is_set():
+                try:
+                    self.atualizar()
+                except Exception as e:
+                    logger.warning("Câmbio: falha ao atualizar as taxas: %s", e)
+                self._parar.wait(min(self.intervalo, 300))
+
+        self._thread = threading.Thread(target=loop, name="tlux-cambio", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def parar(self, timeout: float = 5.0):
+        self._parar.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # ===============================
+    #  Conversão
+    # ===============================
+    def taxas(self):
+        return self._taxas
+
+    def taxa(self, moeda: str) -> float:
+        """Unidades de `moeda` por 1 USD. KeyError se a moeda não é conhecida."""
+        return self._taxas[(moeda or "USD").upper()]
+
+    def converter(self, valores_usd, moeda: str) -> list:
+        """USD → `moeda` para a lista inteira (uma busca de taxa, um passe)."""
+        taxa = self.taxa(moeda)
+        return [round(v * taxa, 2) for v in valores_usd]
+
+    def para_usd(self, valores_locais, moeda: str) -> list:
+        """`moeda` → USD para a lista inteira."""
+        inversa = 1.0 / self.taxa(moeda)
+        return [round(v * inversa, 2) for v in valores_locais]
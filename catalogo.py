@@ -0,0 +1,391 @@
+# catalogo.py — Sincronização do catálogo de serviços do fornecedor (tabela `services`)
+#
+# Uma sincronização:
+#   1. busca a lista do fornecedor UMA vez (imeiservicelist)
+#   2. normaliza para linhas (id, nome, group_name, credit)
+#   3. compara com as linhas atuais pelo content_hash
+#   4. aplica só o que mudou, com executemany, numa única transação:
+#      novos → INSERT, alterados → UPDATE, sumidos → available=0
+#   5. se algo mudou, incrementa catalogo_versao (mesma transação)
+#
+# CacheCatalogo guarda o catálogo já agrupado e ordenado em memória e só
+# recarrega quando catalogo_versao muda (checada no máximo a cada ttl segundos).
+#
+# `progresso(etapa, feitos, total)` é chamado a cada etapa (o job do app grava
+# isso em catalogo_sync para o painel admin acompanhar). Nunca é chamado dentro
+# da transação, então pode commitar na mesma conexão.
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import http_client
+
+logger = logging.getLogger(__name__)
+
+CATALOGO_CACHE_TTL = float(os.getenv("CATALOGO_CACHE_TTL", "5"))
+# Recarga completa mesmo sem nova versão (edições feitas fora da sync)
+CATALOGO_CACHE_MAX_AGE = float(os.getenv("CATALOGO_CACHE_MAX_AGE", "300"))
+
+# id = SERVICEID do fornecedor (é o que vai no placeimeiorder)
+_COLUNAS = {
+    "nome": "TEXT",
+    "credit": "REAL",
+    "group_name": "TEXT",
+    "available": "INTEGER DEFAULT 1",
+    "content_hash": "TEXT",
+    "updated_at": "TEXT",
+}
+
+
+def garantir_schema(conn):
+    """Cria a tabela services (schema do migrate_all.sql) e as colunas que a sync usa."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS services (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT,
+            credit REAL,
+            group_name TEXT
+        )
+    """)
+    existentes = {col[1] for col in conn.execute("PRAGMA table_info(services)")}
+    for coluna, tipo in _COLUNAS.items():
+        if coluna not in existentes:
+            conn.execute(f"ALTER TABLE services ADD COLUMN {coluna} {tipo}")
+    # Versão do catálogo: a sync incrementa quando algo muda → caches e ETags invalidam
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS catalogo_versao (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            versao INTEGER NOT NULL,
+            atualizado_em TEXT NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO catalogo_versao (id, versao, atualizado_em) VALUES (1, 1, datetime('now'))")
+    conn.commit()
+
+
+# ===============================
+#  Fornecedor
+# ===============================
+def buscar_lista(api_url: str, username: str, api_key: str) -> dict:
+    """Uma chamada imeiservicelist; devolve o JSON cru."""
+    resp = http_client.post(api_url, data={
+        "username": username,
+        "apiaccesskey": api_key,
+        "action": "imeiservicelist",
+    }, action="imeiservicelist")
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _credito(valor):
+    """'8.00', '8.00 USD', 8 → 8.0 (None se não der para ler)."""
+    if valor is None or valor == "":
+        return None
+    try:
+        return float(str(valor).split()[0].replace(",", ""))
+    except ValueError:
+        return None
+
+
+def normalizar(resposta: dict) -> list:
+    """
+    Aceita os dois formatos que o fornecedor devolve:
+      {"SUCCESS": [{"LIST": {grupo: {"SERVICES": {sid: {SERVICEID, SERVICENAME, CREDIT}}}}}]}
+      {"SERVICES": [{"GROUPNAME": ..., "SERVICES": [{ID, NAME, CREDIT}]}]}
+    Retorna [{id, nome, group_name, credit}] ordenado por id (sem ids repetidos).
+    """
+    servicos = {}
+
+    def adicionar(sid, nome, credito, grupo):
+        try:
+            sid = int(sid)
+        except (TypeError, ValueError):
+            return
+        if not nome:
+            return
+        servicos[sid] = {
+            "id": sid,
+            "nome": str(nome).strip(),
+            "group_name": (grupo or "Outros").strip(),
+            "credit": _credito(credito),
+        }
+
+    bloco = (resposta.get("SUCCESS") or [{}])[0] if isinstance(resposta, dict) else {}
+    for chave, grupo in (bloco.get("LIST") or {}).items():
+        nome_grupo = grupo.get("GROUPNAME") or chave
+        itens = grupo.get("SERVICES") or {}
+        for item in (itens.values() if isinstance(itens, dict) else itens):
+            adicionar(item.get("SERVICEID"), item.get("SERVICENAME"), item.get("CREDIT"), nome_grupo)
+
+    if isinstance(resposta, dict):
+        for grupo in resposta.get("SERVICES") or []:
+            for item in grupo.get("SERVICES") or []:
+                adicionar(item.get("ID"), item.get("NAME"), item.get("CREDIT"), grupo.get("GROUPNAME"))
+
+    return [servicos[sid] for sid in sorted(servicos)]
+
+
+def hash_servico(s: dict) -> str:
+    """Hash do conteúdo exibido/cobrado: mudou o hash, a linha é regravada."""
+    bruto = json.dumps([s["nome"], s["group_name"], s["credit"]], ensure_ascii=False)
+    return hashlib.sha1(bruto.encode("utf-8")).hexdigest()
+
+
+# ===============================
+#  Diff + aplicação
+# ===============================
+def diferenca(atuais: dict, novos: list, presentes=None) -> dict:
+    """
+    `atuais` = {id: (content_hash, available)} do banco.
+    Retorna {"inserir": [...], "atualizar": [...], "indisponiveis": [ids], "inalterados": n}.
+    Serviço que voltou (available=0 com o mesmo hash) conta como atualização.
+    `presentes` = ids que o fornecedor ainda oferece (padrão: os de `novos`); só
+    os ausentes dele viram indisponíveis.
+    """
+    inserir, atualizar, inalterados = [], [], 0
+    vistos = set()
+    for s in novos:
+        s = {**s, "content_hash": hash_servico(s)}
+        vistos.add(s["id"])
+        atual = atuais.get(s["id"])
+        if atual is None:
+            inserir.append(s)
+        elif atual[0] != s["content_hash"] or not atual[1]:
+            atualizar.append(s)
+        else:
+            inalterados += 1
+    if presentes is not None:
+        vistos = set(presentes)
+    indisponiveis = [sid for sid, (_, disponivel) in atuais.items() if disponivel and sid not in vistos]
+    return {"inserir": inserir, "atualizar": atualizar, "indisponiveis": sorted(indisponiveis),
+            "inalterados": inalterados}
+
+
+def _nada(etapa, feitos, total):
+    pass
+
+
+def aplicar(conn, novos: list, progresso=_nada, presentes=None) -> dict:
+    """Compara e grava as mudanças numa transação (ver diferenca). Retorna as contagens."""
+    garantir_schema(conn)
+    agora = time.strftime("%Y-%m-%d %H:%M:%S")
+    total = len(novos)
+    progresso("gravando", 0, total)
+
+    if conn.in_transaction:
+        conn.commit()
+    try:
+        # BEGIN IMMEDIATE: ninguém muda services entre a leitura e a gravação
+        conn.execute("BEGIN IMMEDIATE")
+        atuais = {
+            r[0]: (r[1], r[2])
+            for r in conn.execute("SELECT id, content_hash, COALESCE(available, 1) FROM services")
+        }
+        diff = diferenca(atuais, novos, presentes)
+
+        conn.executemany("""
+            INSERT INTO services (id, nome, credit, group_name, available, content_hash, updated_at)
+            VALUES (:id, :nome, :credit, :group_name, 1, :content_hash, :agora)
+        """, [{**s, "agora": agora} for s in diff["inserir"]])
+        conn.executemany("""
+            UPDATE services
+            SET nome=:nome, credit=:credit, group_name=:group_name, available=1,
+                content_hash=:content_hash, updated_at=:agora
+            WHERE id=:id
+        """, [{**s, "agora": agora} for s in diff["atualizar"]])
+        conn.executemany(
+            "UPDATE services SET available=0, updated_at=? WHERE id=?",
+            [(agora, sid) for sid in diff["indisponiveis"]]
+        )
+        if diff["inserir"] or diff["atualizar"] or diff["indisponiveis"]:
+            conn.execute("UPDATE catalogo_versao SET versao=versao+1, atualizado_em=datetime('now') WHERE id=1")
+        versao = conn.execute("SELECT versao FROM catalogo_versao WHERE id=1").fetchone()[0]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    resumo = {
+        "total": total,
+        "inseridos": len(diff["inserir"]),
+        "atualizados": len(diff["atualizar"]),
+        "indisponiveis": len(diff["indisponiveis"]),
+        "inalterados": diff["inalterados"],
+        "versao": versao,
+    }
+    progresso("concluido", total, total)
+    logger.info("Catálogo sincronizado: %s", resumo, extra=resumo)
+    return resumo
+
+
+def sincronizar(conn, buscar, filtro=None, progresso=_nada) -> dict:
+    """
+    `buscar()` → JSON cru do fornecedor. `filtro(servico)` opcional decide o que
+    esta sync insere/atualiza; o que ele deixa de fora não é mexido (só some,
+    available=0, o que o fornecedor não oferece mais).
+    Lista vazia não é aplicada: quase sempre é erro do fornecedor, não catálogo vazio.
+    """
+    progresso("buscando", 0, 0)
+    todos = normalizar(buscar())
+    novos = [s for s in todos if filtro(s)] if filtro else todos
+    if not novos:
+        raise ValueError("Fornecedor devolveu 0 serviços — catálogo mantido")
+    return aplicar(conn, novos, progresso, presentes=[s["id"] for s in todos])
+
+
+# ===============================
+#  Execuções (progresso para o painel)
+# ===============================
+def garantir_tabela_execucoes(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS catalogo_sync (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            etapa TEXT,
+            feitos INTEGER DEFAULT 0,
+            total INTEGER DEFAULT 0,
+            resumo TEXT,
+            erro TEXT,
+            criado_em TEXT DEFAULT (datetime('now')),
+            atualizado_em TEXT
+        )
+    """)
+    conn.commit()
+
+
+def nova_execucao(conn) -> int:
+    garantir_tabela_execucoes(conn)
+    cur = conn.execute("INSERT INTO catalogo_sync (status, etapa) VALUES ('queued', 'na fila')")
+    conn.commit()
+    return cur.lastrowid
+
+
+def registrar_progresso(conn, execucao_id: int, etapa: str, feitos: int, total: int):
+    # Fora da transação da sync: o painel enxerga o progresso enquanto ela roda
+    conn.execute("""
+        UPDATE catalogo_sync SET status='running', etapa=?, feitos=?, total=?, atualizado_em=datetime('now')
+        WHERE id=?
+    """, (etapa, feitos, total, execucao_id))
+    conn.commit()
+
+
+def finalizar_execucao(conn, execucao_id: int, resumo: dict = None, erro=None):
+    conn.execute("""
+        UPDATE catalogo_sync SET status=?, resumo=?, erro=?, atualizado_em=datetime('now')
+        WHERE id=?
+    """, ("failed" if erro else "done", json.dumps(resumo) if resumo else None,
+          str(erro)[:1000] if erro else None, execucao_id))
+    conn.commit()
+
+
+def ultima_execucao(conn) -> dict:
+    garantir_tabela_execucoes(conn)
+    row = conn.execute("""
+        SELECT id, status, etapa, feitos, total, resumo, erro, criado_em, atualizado_em
+        FROM catalogo_sync ORDER BY id DESC LIMIT 1
+    """).fetchone()
+    if not row:
+        return None
+    execucao = dict(zip(("id", "status", "etapa", "feitos", "total", "resumo", "erro",
+                         "criado_em", "atualizado_em"), row))
+    execucao["resumo"] = json.loads(execucao["resumo"]) if execucao["resumo"] else None
+    return execucao
+
+
+# ===============================
+#  Snapshot em memória (/services, comprar_servico, API)
+# ===============================
+class Snapshot:
+    """Catálogo disponível, imutável depois de montado (compartilhado entre threads)."""
+    __slots__ = ("versao", "atualizado_em", "etag", "servicos", "grupos", "por_id", "_lista_dhru")
+
+    def __init__(self, versao: int, atualizado_em: datetime, servicos: list):
+        self.versao = versao
+        self.atualizado_em = atualizado_em
+        self.servicos = tuple(servicos)
+        self.por_id = {s["id"]: s for s in self.servicos}
+        grupos = {}
+        for s in self.servicos:
+            grupos.setdefault(s["group_name"] or "", []).append(s)
+        self.grupos = {g: tuple(itens) for g, itens in grupos.items()}
+        conteudo = json.dumps([[s["id"], s["nome"], s["group_name"], s["credit"]] for s in self.servicos],
+                              ensure_ascii=False)
+        self.etag = f"cat-{versao}-{hashlib.sha1(conteudo.encode('utf-8')).hexdigest()[:16]}"
+        self._lista_dhru = None
+
+    def lista_dhru(self) -> dict:
+        """O catálogo no formato imeiservicelist (para quem consumia a lista do fornecedor)."""
+        if self._lista_dhru is None:
+            self._lista_dhru = {"SUCCESS": [{"MESSAGE": "IMEI Service List", "LIST": {
+                grupo: {"GROUPNAME": grupo, "SERVICES": {
+                    str(s["id"]): {"SERVICEID": s["id"], "SERVICENAME": s["nome"],
+                                   "CREDIT": f"{s['credit']:.2f}" if s["credit"] is not None else ""}
+                    for s in itens
+                }}
+                for grupo, itens in self.grupos.items()
+            }}]}
+        return self._lista_dhru
+
+
+def ler_versao(conn) -> tuple:
+    """(versao, atualizado_em UTC) de catalogo_versao."""
+    versao, atualizado = conn.execute("SELECT versao, atualizado_em FROM catalogo_versao WHERE id=1").fetchone()
+    return versao, datetime.strptime(atualizado, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+
+
+def carregar_snapshot(conn) -> Snapshot:
+    versao, atualizado_em = ler_versao(conn)
+    rows = conn.execute("""
+        SELECT id, nome, credit, group_name FROM services
+        WHERE COALESCE(available, 1)=1
+        ORDER BY group_name, nome
+    """).fetchall()
+    servicos = [{"id": r[0], "nome": r[1], "credit": r[2], "group_name": r[3]} for r in rows]
+    return Snapshot(versao, atualizado_em, servicos)
+
+
+class CacheCatalogo:
+    """
+    Um Snapshot por processo. `conexao()` devolve a conexão da thread atual.
+    A versão no banco é consultada no máximo a cada `ttl` segundos; a sync do
+    próprio processo chama invalidar() e a próxima leitura já confere a versão.
+    """
+
+    def __init__(self, conexao, ttl: float = CATALOGO_CACHE_TTL, max_age: float = CATALOGO_CACHE_MAX_AGE):
+        self.conexao = conexao
+        self.ttl = ttl
+        self.max_age = max_age
+        self._snapshot = None
+        self._conferido_em = float("-inf")
+        self._carregado_em = float("-inf")
+        self._lock = threading.Lock()
+        self.recargas = 0
+
+    def snapshot(self) -> Snapshot:
+        snap = self._snapshot
+        if snap is not None and time.monotonic() - self._conferido_em < self.ttl:
+            return snap
+        with self._lock:
+            agora = time.monotonic()
+            snap = self._snapshot
+            if snap is not None and agora - self._conferido_em < self.ttl:
+                return snap
+            conn = self.conexao()
+            versao, _ = ler_versao(conn)
+            if snap is None or snap.versao != versao or agora - self._carregado_em >= self.max_age:
+                self._snapshot = carregar_snapshot(conn)
+                self._carregado_em = agora
+                self.recargas += 1
+            self._conferido_em = agora
+            return self._snapshot
+
+    def servico(self, service_id: int):
+        return self.snapshot().por_id.get(service_id)
+
+    def invalidar(self):
+        """Força a conferência da versão na próxima leitura."""
+        self._conferido_em = float("-inf")
@@ -0,0 +1,52 @@
+# conftest.py — app.py carregado uma vez para os testes de rotas e handlers
+#
+# O app abre o banco e sobe threads no import: o fixture aponta DB_FILE para
+# um arquivo temporário, desliga os workers de background e cria o schema
+# (migrate_all.sql + migrações) antes do primeiro `import app`.
+import itertools
+
+import pytest
+
+import db_pool
+import migrate_db
+
+_SEM_BACKGROUND = ("UNLOCK_POLL_ENABLED", "UNLOCK_QUEUE_ENABLED", "STRIPE_LEDGER_ENABLED",
+                   "CATALOGO_SYNC_ENABLED", "EMAIL_QUEUE_ENABLED", "CAMBIO_REFRESH_ENABLED",
+                   "EVENT_LOG_ASYNC")
+
+
+@pytest.fixture(scope="session")
+def app_tlux(tmp_path_factory):
+    """Módulo app (não o objeto Flask) sobre um banco temporário."""
+    db_file = str(tmp_path_factory.mktemp("app") / "t-lux.db")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("DB_FILE", db_file)
+        mp.setenv("PRICEBOOK_FILE", str(tmp_path_factory.getbasetemp() / "sem-precos.json"))
+        for chave in _SEM_BACKGROUND:
+            mp.setenv(chave, "0")
+        mp.setattr(db_pool, "DB_FILE", db_file)
+        mp.setattr(migrate_db, "DB_PATH", db_file)  # resolvido no import do módulo
+
+        import app
+
+        app.migrate_database()
+        app.garantir_coluna_status_message()
+        app.app.config.update(TESTING=True)
+        yield app
+
+
+_seq = itertools.count(1)
+
+
+@pytest.fixture
+def novo_usuario(app_tlux):
+    """Cria um usuário (e-mail único por chamada) e retorna o id."""
+    def criar(is_admin: int = 0, role: str = None, blocked: int = 0) -> int:
+        conn = db_pool.get_connection()
+        cur = conn.execute(
+            "INSERT INTO users (email, password_hash, is_admin, role, blocked, approved, email_verified) "
+            "VALUES (?, 'x', ?, ?, ?, 1, 1)",
+            (f"teste{next(_seq)}@t-lux.test", is_admin, role, blocked))
+        conn.commit()
+        return cur.lastrowid
+    return criar
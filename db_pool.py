@@ -0,0 +1,185 @@
+# db_pool.py — Ponto único de acesso ao SQLite do T-Lux
+#
+# - Uma conexão de longa duração por thread (e por arquivo de banco)
+# - PRAGMAs aplicados uma única vez, na abertura da conexão
+# - Cache de statements preparados maior (cached_statements)
+# - close() não fecha: devolve a conexão ao pool (faz rollback do que ficou pendente)
+# - estatisticas() para o painel admin
+# - cada execute() soma tempo e contagem no request atual (metricas) e passa
+#   pelo profiler (perfil_sql: slow-query log, rastreio por request)
+import os
+import sqlite3
+import threading
+import time
+import weakref
+
+import metricas
+import perfil_sql
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# DB_FILE pode vir do .env — resolvido no import
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+# DB_FILE tem prioridade; DB_PATH é aceito pelos scripts antigos
+DB_FILE = os.getenv("DB_FILE") or os.getenv("DB_PATH") or os.path.join(BASE_DIR, "t-lux.db")
+
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "30000"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))        # 16 MB por conexão
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))  # 128 MB
+DB_CACHED_STATEMENTS = int(os.getenv("DB_CACHED_STATEMENTS", "256"))
+
+
+class CursorMedido(sqlite3.Cursor):
+    """
+    Cursor que cronometra execute/executemany e os fetch*: soma nas métricas do
+    request e entrega a execução ao perfil_sql (slow-query log, rastreio).
+    """
+
+    _execucao = None
+
+    def execute(self, sql, parametros=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            self._registrar(sql, time.perf_counter() - inicio)
+
+    def executemany(self, sql, parametros):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, parametros)
+        finally:
+            self._registrar(sql, time.perf_counter() - inicio)
+
+    def _registrar(self, sql, segundos):
+        metricas.somar_sql(segundos)
+        self._execucao = perfil_sql.registrar(sql, segundos, self.rowcount)
+
+    def _somar_fetch(self, segundos, linhas):
+        # fetch conta tempo (e linhas), não conta query nova
+        coleta = metricas.coleta_atual()
+        if coleta is not None:
+            coleta.sql_us += int(segundos * 1_000_000)
+        if self._execucao is not None:
+            self._execucao.somar(segundos, linhas)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        linha = super().fetchone()
+        self._somar_fetch(time.perf_counter() - inicio, linha is not None)
+        return linha
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        linhas = super().fetchall()
+        self._somar_fetch(time.perf_counter() - inicio, len(linhas))
+        return linhas
+
+    def fetchmany(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        linhas = super().fetchmany(*args, **kwargs)
+        self._somar_fetch(time.perf_counter() - inicio, len(linhas))
+        return linhas
+
+
+class CursorRastreado(CursorMedido):
+    """Com rastreio ligado (debug / SQL_PROFILE) conta também as linhas lidas em `for row in cur`."""
+
+    def __next__(self):
+        inicio = time.perf_counter()
+        linha = super().__next__()
+        self._somar_fetch(time.perf_counter() - inicio, 1)
+        return linha
+
+
+class PooledConnection(sqlite3.Connection):
+    """Conexão do pool: close() devolve ao pool em vez de fechar."""
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = CursorRastreado if perfil_sql.rastreando() else CursorMedido
+        return super().cursor(factory)
+
+    # Connection.execute() do C não passa pelo cursor(): cronometra aqui
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def fechar_de_vez(self):
+        super().close()
+
+
+_local = threading.local()
+_conexoes = weakref.WeakSet()
+_lock = threading.Lock()
+_stats = {"abertas": 0, "reutilizadas": 0}
+
+
+def _resolver(path) -> str:
+    return os.path.abspath(path or DB_FILE)
+
+
+def _abrir(path: str) -> PooledConnection:
+    conn = sqlite3.connect(
+        path,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        factory=PooledConnection,
+        cached_statements=DB_CACHED_STATEMENTS,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    with _lock:
+        _stats["abertas"] += 1
+        _conexoes.add(conn)
+    return conn
+
+
+def get_connection(path: str = None) -> PooledConnection:
+    """Retorna a conexão desta thread para `path` (padrão: DB_FILE), abrindo se preciso."""
+    path = _resolver(path)
+    por_arquivo = getattr(_local, "conexoes", None)
+    if por_arquivo is None:
+        por_arquivo = _local.conexoes = {}
+
+    conn = por_arquivo.get(path)
+    if conn is not None:
+        with _lock:
+            _stats["reutilizadas"] += 1
+        return conn
+
+    conn = por_arquivo[path] = _abrir(path)
+    return conn
+
+
+def fechar_conexao_thread(path: str = None):
+    """Fecha de verdade a conexão desta thread (fim de worker / scripts)."""
+    por_arquivo = getattr(_local, "conexoes", {})
+    conn = por_arquivo.pop(_resolver(path), None)
+    if conn is not None:
+        conn.fechar_de_vez()
+
+
+def estatisticas() -> dict:
+    """Números do pool: conexões abertas no total, vivas agora, reutilizações."""
+    with _lock:
+        dados = dict(_stats)
+        dados["vivas"] = len(_conexoes)
+    dados["db_file"] = DB_FILE
+    dados["cached_statements"] = DB_CACHED_STATEMENTS
+    return dados
@@ -1,6 +1,7 @@
 # dhru_client.py
 import os
 import requests
+import http_client
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -29,10 +30,10 @@ def build_xml(action: str, imei: str = None, extra_fields: dict = None) -> str:
     )
     return xml
 
-def dhru_post(xml: str, timeout: int = 15) -> dict:
+def dhru_post(xml: str, timeout: int = None, action: str = None) -> dict:
     try:
         payload = {"xml": xml}
-        resp = requests.post(DHRU_ENDPOINT, headers=HEADERS, data=payload, timeout=timeout)
+        resp = http_client.post(DHRU_ENDPOINT, headers=HEADERS, data=payload, timeout=timeout, action=action)
         resp.raise_for_status()
         try:
             return resp.json()
@@ -43,11 +44,11 @@ def dhru_post(xml: str, timeout: int = 15) -> dict:
 
 def test_getimei(imei: str):
     xml = build_xml(action="getimei", imei=imei)
-    return dhru_post(xml)
+    return dhru_post(xml, action="getimei")
 
 def list_services():
     xml = build_xml(action="services")
-    return dhru_post(xml)
+    return dhru_post(xml, action="services")
 
 def submit_order(imei: str, service: str, country: str = None, **kwargs):
     extra = {"service": service}
@@ -55,7 +56,7 @@ def submit_order(imei: str, service: str, country: str = None, **kwargs):
         extra["country"] = country
     extra.update(kwargs)
     xml = build_xml(action="submit", imei=imei, extra_fields=extra)
-    return dhru_post(xml)
+    return dhru_post(xml, action="submit")
 
 if __name__ == "__main__":
     print("DHRU_ENDPOINT:", DHRU_ENDPOINT)
@@ -1,6 +1,7 @@
 # dhruapi.py — Cliente Dhru API adaptado para Python (compatível com Dhru Fusion)
-import requests
+import http_client
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 
 
 class Dhru:
@@ -40,7 +41,7 @@ class Dhru:
                 "Content-Type": "application/x-www-form-urlencoded"
             }
 
-            resp = requests.post(url, data=data, headers=headers, timeout=25, verify=False)
+            resp = http_client.post(url, data=data, headers=headers, action=action, verify=False)
             resp.raise_for_status()
             try:
                 return resp.json()
@@ -68,6 +69,27 @@ class Dhru:
         """Cria uma ordem de desbloqueio IMEI"""
         return self._make_request("placeimeiorder", {"imei": imei, "serviceid": service_id})
 
+    def get_imei_order(self, order_id):
+        """Consulta o status de uma ordem IMEI"""
+        return self._make_request("getimeiorder", {"id": order_id})
+
+    def get_imei_orders(self, order_ids, max_workers=4):
+        """Consulta várias ordens de uma vez (ver consultar_ordens). Retorna dict {order_id: resposta}."""
+        return consultar_ordens(self.get_imei_order, order_ids, max_workers)
+
+
+def consultar_ordens(consultar, order_ids, max_workers=4):
+    """
+    Aplica `consultar(order_id)` a cada ID num pool fixo de `max_workers` threads:
+    o getimeiorder do Dhru aceita um único ID por chamada.
+    Retorna dict {order_id (str): resposta}, sem IDs repetidos.
+    """
+    ids = list(dict.fromkeys(str(o) for o in order_ids if o))
+    if not ids:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(ids))) as pool:
+        return dict(zip(ids, pool.map(consultar, ids)))
+
 
 # ========================
 #  Teste rápido opcional
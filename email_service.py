@@ -0,0 +1,199 @@
+# email_service.py — Envio de e-mail assíncrono (fila SQLite + sessões SMTP persistentes)
+#
+# - send_email() só grava o job na fila (job_queue) e retorna na hora
+# - cada worker mantém UMA sessão SMTP autenticada (STARTTLS + login uma vez)
+#   e reaproveita para todos os e-mails que processar
+# - os workers reservam até EMAIL_BATCH_SIZE e-mails por rodada (mesma sessão)
+#   (a fila renova o lease dos e-mails restantes a cada envio, então um lote
+#   lento não é recuperado por outro worker e enviado duas vezes)
+# - falhas temporárias (conexão, 4xx) voltam para a fila com backoff;
+#   recusa definitiva do servidor (5xx) encerra o job
+import logging
+import os
+import smtplib
+import ssl
+import threading
+import time
+from email.message import EmailMessage
+
+from job_queue import JobFatal, JobQueue, iniciar_workers
+
+logger = logging.getLogger(__name__)
+
+SMTP_HOST = os.getenv("ZOHO_SMTP_HOST", "smtp.zoho.com")
+SMTP_PORT = int(os.getenv("ZOHO_SMTP_PORT", 587))
+SMTP_USER = os.getenv("ZOHO_SMTP_USER")
+SMTP_PASS = os.getenv("ZOHO_SMTP_PASS")
+SMTP_TIMEOUT = float(os.getenv("EMAIL_SMTP_TIMEOUT", "20"))
+# Sessão parada há mais que isso recebe um NOOP antes de ser usada
+SMTP_IDLE_CHECK_SECONDS = float(os.getenv("EMAIL_SMTP_IDLE_CHECK", "30"))
+
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "1"))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+
+JOB_EMAIL = "email"
+
+
+def montar_mensagem(payload: dict, remetente: str) -> EmailMessage:
+    """payload da fila → EmailMessage (texto e/ou HTML, BCC opcional)."""
+    msg = EmailMessage()
+    msg["From"] = f"T-Lux Systems <{remetente}>"
+    msg["To"] = payload["to"]
+    msg["Subject"] = payload["subject"]
+    if payload.get("bcc"):
+        msg["Bcc"] = ", ".join(payload["bcc"])
+
+    body_text, body_html = payload.get("body_text"), payload.get("body_html")
+    if body_text:
+        msg.set_content(body_text)
+        if body_html:
+            msg.add_alternative(body_html, subtype="html")
+    elif body_html:
+        msg.set_content(body_html, subtype="html")
+    else:
+        msg.set_content("")
+    return msg
+
+
+class SessaoSMTP:
+    """
+    Uma conexão SMTP autenticada, reaberta só quando cai.
+    Não é thread-safe: cada worker tem a sua.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, user=SMTP_USER, password=SMTP_PASS,
+                 timeout=SMTP_TIMEOUT, smtp_factory=smtplib.SMTP):
+        self.host, self.port = host, port
+        self.user, self.password = user, password
+        self.timeout = timeout
+        self.smtp_factory = smtp_factory
+        self._smtp = None
+        self._usada_em = 0.0
+        self.conexoes = 0
+        self.enviados = 0
+
+    def _conectar(self):
+        smtp = self.smtp_factory(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.starttls(context=ssl.create_default_context())
+            if self.user:
+                smtp.login(self.user, self.password)
+        except Exception:
+            self._descartar(smtp)
+            raise
+        self._smtp = smtp
+        self.conexoes += 1
+
+    @staticmethod
+    def _descartar(smtp):
+        try:
+            smtp.close()
+        except Exception:
+            pass
+
+    def _viva(self) -> bool:
+        if self._smtp is None:
+            return False
+        if time.monotonic() - self._usada_em < SMTP_IDLE_CHECK_SECONDS:
+            return True
+        try:
+            return self._smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def enviar(self, msg: EmailMessage):
+        """Envia reaproveitando a sessão; se a conexão caiu, reconecta uma vez."""
+        if not self._viva():
+            self.fechar()
+            self._conectar()
+        try:
+            self._smtp.send_message(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # Servidor derrubou a sessão ociosa: uma nova conexão e mais uma tentativa
+            self.fechar()
+            self._conectar()
+            self._smtp.send_message(msg)
+        self._usada_em = time.monotonic()
+        self.enviados += 1
+
+    def fechar(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except Exception:
+            self._descartar(smtp)
+
+
+def _erro_definitivo(e: Exception) -> bool:
+    """Recusas 5xx do servidor não adiantam repetir (destinatário inválido, etc.)."""
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in e.recipients.values())
+    codigo = getattr(e, "smtp_code", None)
+    return isinstance(e, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)) and bool(codigo) and codigo >= 500
+
+
+class ServicoEmail:
+    """Fila de e-mails + workers com sessão SMTP própria por thread."""
+
+    def __init__(self, fila: JobQueue, remetente: str = SMTP_USER, sessao_factory=SessaoSMTP):
+        self.fila = fila
+        # Corpo com OTP / link de reset: não fica no banco depois do envio
+        self.fila.payload_sensivel.add(JOB_EMAIL)
+        self.remetente = remetente
+        self.sessao_factory = sessao_factory
+        self._local = threading.local()
+
+    # ===============================
+    #  Produtor
+    # ===============================
+    def enfileirar(self, to_email, subject, body_text=None, body_html=None, bcc=None,
+                   idempotency_key: str = None) -> bool:
+        payload = {
+            "to": to_email,
+            "subject": subject,
+            "body_text": body_text,
+            "body_html": body_html,
+            "bcc": list(bcc or []),
+        }
+        return self.fila.enfileirar(JOB_EMAIL, payload, idempotency_key=idempotency_key,
+                                    max_attempts=EMAIL_MAX_ATTEMPTS)
+
+    # ===============================
+    #  Consumidor
+    # ===============================
+    def sessao(self) -> SessaoSMTP:
+        sessao = getattr(self._local, "sessao", None)
+        if sessao is None:
+            sessao = self._local.sessao = self.sessao_factory()
+        return sessao
+
+    def enviar_agora(self, payload: dict):
+        """Handler do job: envia pela sessão da thread atual."""
+        msg = montar_mensagem(payload, self.remetente)
+        try:
+            self.sessao().enviar(msg)
+        except Exception as e:
+            if _erro_definitivo(e):
+                raise JobFatal(f"{type(e).__name__}: {e}") from e
+            self.sessao().fechar()
+            raise
+        logger.info(f"✅ [E-MAIL] Enviado com sucesso para {payload['to']}")
+
+    def _falhou(self, payload, erro):
+        logger.error(f"❌ [E-MAIL] Desistindo de enviar para {payload.get('to')}: {erro}")
+
+    def processar(self, worker: str = "manual", limite: int = EMAIL_BATCH_SIZE) -> int:
+        """Processa um lote na thread atual (scripts / testes)."""
+        return self.fila.processar(JOB_EMAIL, self.enviar_agora, worker, limite=limite,
+                                   on_failure=self._falhou)
+
+    def iniciar(self, quantidade: int = EMAIL_WORKERS, intervalo: float = 1.0) -> list:
+        self.fila.limpar_payloads(JOB_EMAIL)
+        return iniciar_workers(
+            self.fila, JOB_EMAIL, self.enviar_agora,
+            quantidade=quantidade, intervalo=intervalo,
+            on_failure=self._falhou, limite=EMAIL_BATCH_SIZE,
+        )
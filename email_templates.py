@@ -0,0 +1,167 @@
+# email_templates.py — Renderização dos e-mails transacionais (OTP, verificação, licença)
+#
+# Cada template é compilado pelo Jinja UMA vez por arquivo (email_x.pt.html
+# se existir para o idioma, senão email_x.html — compartilhado pelos idiomas):
+# renderizamos com marcadores no lugar das variáveis e guardamos só os
+# pedaços estáticos. Depois disso, renderizar = juntar pedaços + valores
+# escapados — sem Jinja, sem reparse do HTML. A versão texto (fallback
+# multipart) é gerada do mesmo HTML, também uma única vez.
+#
+# Limitação: variáveis devem ser só interpoladas ({{ nome }}), sem filtros
+# nem {% if %} sobre elas — é o caso dos e-mails transacionais do T-Lux.
+import html
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from html.parser import HTMLParser
+
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound, meta, select_autoescape
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+IDIOMA_PADRAO = "en"
+
+# Templates pré-compilados no arranque
+TEMPLATES_EMAIL = (
+    "email_codigo_otp.html",
+    "email_verificacao_message.html",
+    "email_nova_licenca.html",
+)
+
+_MARCADOR = "\x00{}\x00"
+_RE_MARCADOR = re.compile("\x00([A-Za-z_][A-Za-z0-9_]*)\x00")
+
+_env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+)
+_env.globals["now"] = datetime.now
+
+_cache = {}
+_arquivos = {}  # (template, idioma) → arquivo resolvido
+_lock = threading.Lock()
+
+
+class _HtmlParaTexto(HTMLParser):
+    """HTML → texto simples: quebra linha nos blocos, ignora <style>/<head>, mostra URLs dos links."""
+    BLOCOS = {"p", "div", "br", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "li", "hr", "table"}
+    IGNORAR = {"style", "script", "head", "title"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.partes = []
+        self._ignorando = 0
+        self._href = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.IGNORAR:
+            self._ignorando += 1
+        elif tag in self.BLOCOS:
+            self.partes.append("\n")
+        elif tag == "a":
+            self._href.append(dict(attrs).get("href"))
+
+    def handle_endtag(self, tag):
+        if tag in self.IGNORAR:
+            self._ignorando = max(0, self._ignorando - 1)
+        elif tag in self.BLOCOS:
+            self.partes.append("\n")
+        elif tag == "a" and self._href:
+            href = self._href.pop()
+            if href and href not in (self.partes[-1] if self.partes else ""):
+                self.partes.append(f" ({href})")
+
+    def handle_data(self, data):
+        if not self._ignorando:
+            self.partes.append(re.sub(r"\s+", " ", data))
+
+    def texto(self) -> str:
+        linhas = [" ".join(l.split()) for l in "".join(self.partes).splitlines()]
+        texto = "\n".join(linhas)
+        return re.sub(r"\n{3,}", "\n\n", texto).strip() + "\n"
+
+
+def html_para_texto(conteudo: str) -> str:
+    parser = _HtmlParaTexto()
+    parser.feed(conteudo)
+    parser.close()
+    return parser.texto()
+
+
+def _partes(saida: str) -> list:
+    """'a\\x00x\\x00b' → ['a', 'x', 'b']: índices pares são texto fixo, ímpares são variáveis."""
+    return _RE_MARCADOR.split(saida)
+
+
+def _nome_por_idioma(nome: str, idioma: str) -> str:
+    """email_x.html + 'pt' → email_x.pt.html, se existir; senão o template padrão."""
+    arquivo = _arquivos.get((nome, idioma))
+    if arquivo is None:
+        base, ext = os.path.splitext(nome)
+        candidato = f"{base}.{idioma}{ext}"
+        arquivo = candidato if os.path.exists(os.path.join(TEMPLATES_DIR, candidato)) else nome
+        _arquivos[(nome, idioma)] = arquivo
+    return arquivo
+
+
+def _compilar(arquivo: str):
+    fonte = _env.loader.get_source(_env, arquivo)[0]
+    variaveis = meta.find_undeclared_variables(_env.parse(fonte)) - set(_env.globals)
+    template = _env.get_template(arquivo)
+    saida = template.render({v: _MARCADOR.format(v) for v in variaveis})
+    return _partes(saida), _partes(html_para_texto(saida))
+
+
+def _compilado(nome: str, idioma: str):
+    # Chave = arquivo resolvido: idiomas sem variante própria dividem a mesma
+    # entrada. O ano entra na chave: o rodapé usa now().year
+    arquivo = _nome_por_idioma(nome, idioma)
+    chave = (arquivo, datetime.now().year)
+    compilado = _cache.get(chave)
+    if compilado is None:
+        with _lock:
+            compilado = _cache.get(chave)
+            if compilado is None:
+                compilado = _cache[chave] = _compilar(arquivo)
+    return compilado
+
+
+def _juntar(partes: list, contexto: dict, escapar) -> str:
+    saida = []
+    for i, parte in enumerate(partes):
+        if i % 2:
+            valor = contexto.get(parte)
+            saida.append(escapar("" if valor is None else str(valor)))
+        else:
+            saida.append(parte)
+    return "".join(saida)
+
+
+def renderizar_email(nome: str, idioma: str = IDIOMA_PADRAO, **contexto):
+    """
+    Retorna (body_html, body_text) do template `nome` no `idioma`.
+    Variáveis ausentes viram string vazia. Levanta TemplateNotFound.
+    """
+    partes_html, partes_texto = _compilado(nome, (idioma or IDIOMA_PADRAO).split("_")[0].lower())
+    return _juntar(partes_html, contexto, html.escape), _juntar(partes_texto, contexto, str)
+
+
+def precompilar(idiomas=(IDIOMA_PADRAO,), nomes=TEMPLATES_EMAIL) -> int:
+    """Compila os templates para os idiomas dados (chamado no arranque). Retorna quantos ficaram em cache."""
+    for idioma in idiomas:
+        for nome in nomes:
+            try:
+                _compilado(nome, idioma)
+            except TemplateNotFound:
+                logger.warning(f"⚠️ [EMAIL] Template não encontrado: {nome}")
+    return len(_cache)
+
+
+def limpar_cache():
+    with _lock:
+        _cache.clear()
+        _arquivos.clear()
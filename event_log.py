@@ -0,0 +1,185 @@
+# event_log.py — Gravação em lote dos eventos (tabela `eventos`)
+#
+# registrar_evento() só coloca o evento num buffer em memória; uma thread
+# grava tudo numa única transação a cada EVENT_FLUSH_MS ou EVENT_FLUSH_ROWS
+# eventos, o que vier primeiro. O buffer é limitado (EVENT_BUFFER_MAX):
+# cheio, o evento é descartado e contado em `descartados`. Na saída do
+# processo (atexit) o que sobrou é gravado.
+#
+# Opcional: EVENT_ARCHIVE_DAYS > 0 move eventos mais antigos que isso para
+# arquivos .jsonl.gz em EVENT_ARCHIVE_DIR (uma vez por EVENT_ARCHIVE_EVERY_H).
+import atexit
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import db_pool
+
+logger = logging.getLogger(__name__)
+
+EVENT_FLUSH_MS = int(os.getenv("EVENT_FLUSH_MS", "500"))
+EVENT_FLUSH_ROWS = int(os.getenv("EVENT_FLUSH_ROWS", "200"))
+EVENT_BUFFER_MAX = int(os.getenv("EVENT_BUFFER_MAX", "10000"))
+EVENT_ARCHIVE_DAYS = int(os.getenv("EVENT_ARCHIVE_DAYS", "0"))
+EVENT_ARCHIVE_DIR = os.getenv("EVENT_ARCHIVE_DIR", os.path.join(db_pool.BASE_DIR, "arquivo_eventos"))
+EVENT_ARCHIVE_EVERY_H = float(os.getenv("EVENT_ARCHIVE_EVERY_H", "24"))
+
+
+class EventLog:
+    def __init__(self, db_path: str = None, table: str = "eventos", flush_ms: int = EVENT_FLUSH_MS,
+                 flush_rows: int = EVENT_FLUSH_ROWS, buffer_max: int = EVENT_BUFFER_MAX):
+        self.db_path = db_path
+        self.table = table
+        self.flush_ms = flush_ms
+        self.flush_rows = flush_rows
+        self._buffer = deque()
+        self.buffer_max = buffer_max
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+        self._schema_ok = False
+        self._ultimo_arquivo = 0.0
+        self._stats = {"gravados": 0, "descartados": 0, "lotes": 0, "erros": 0, "arquivados": 0}
+
+    # ===============================
+    #  Produtor
+    # ===============================
+    def registrar(self, user_id, descricao: str) -> bool:
+        """Enfileira o evento. Retorna False se o buffer estava cheio (evento descartado)."""
+        linha = (user_id, descricao, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        with self._lock:
+            if len(self._buffer) >= self.buffer_max:
+                self._stats["descartados"] += 1
+                return False
+            self._buffer.append(linha)
+            cheio = len(self._buffer) >= self.flush_rows
+        if self._thread is None:
+            # Sem thread (scripts, testes): grava na hora
+            self.flush()
+        elif cheio:
+            self._acordar.set()
+        return True
+
+    # ===============================
+    #  Gravação
+    # ===============================
+    def _garantir_tabela(self, conn):
+        if self._schema_ok:
+            return
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                descricao TEXT,
+                data TEXT DEFAULT (datetime('now', 'localtime'))
+            )
+        """)
+        conn.commit()
+        self._schema_ok = True
+
+    def flush(self) -> int:
+        """Grava o buffer numa única transação. Retorna quantos eventos foram gravados."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer:
+                    return 0
+                lote = list(self._buffer)
+                self._buffer.clear()
+            conn = db_pool.get_connection(self.db_path)
+            try:
+                self._garantir_tabela(conn)
+                conn.executemany(
+                    f"INSERT INTO {self.table} (user_id, descricao, data) VALUES (?, ?, ?)", lote
+                )
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                with self._lock:
+                    # Devolve o lote para a frente do buffer (respeitando o limite)
+                    vagas = max(0, self.buffer_max - len(self._buffer))
+                    self._buffer.extendleft(reversed(lote[:vagas]))
+                    self._stats["descartados"] += len(lote) - min(len(lote), vagas)
+                    self._stats["erros"] += 1
+                logger.error(f"[ERRO] Falha ao gravar {len(lote)} eventos: {e}")
+                return 0
+            with self._lock:
+                self._stats["gravados"] += len(lote)
+                self._stats["lotes"] += 1
+            return len(lote)
+
+    def arquivar(self, dias: int = EVENT_ARCHIVE_DAYS, pasta: str = EVENT_ARCHIVE_DIR):
+        """Move eventos com mais de `dias` para pasta/eventos-AAAAMMDD-HHMMSS.jsonl.gz. Retorna o arquivo ou None."""
+        if dias <= 0:
+            return None
+        limite = (datetime.now() - timedelta(days=dias)).strftime("%Y-%m-%d %H:%M:%S")
+        conn = db_pool.get_connection(self.db_path)
+        self._garantir_tabela(conn)
+        cur = conn.execute(
+            f"SELECT id, user_id, descricao, data FROM {self.table} WHERE data < ? ORDER BY id", (limite,)
+        )
+        os.makedirs(pasta, exist_ok=True)
+        caminho = os.path.join(pasta, f"{self.table}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+        ultimo_id, total = None, 0
+        with gzip.open(caminho + ".tmp", "wt", encoding="utf-8") as f:
+            for row in cur:
+                f.write(json.dumps({"id": row[0], "user_id": row[1], "descricao": row[2], "data": row[3]},
+                                   ensure_ascii=False) + "\n")
+                ultimo_id, total = row[0], total + 1
+        if not total:
+            os.remove(caminho + ".tmp")
+            return None
+        os.replace(caminho + ".tmp", caminho)
+        # Só apaga o que foi escrito no arquivo (id <= último arquivado)
+        conn.execute(f"DELETE FROM {self.table} WHERE data < ? AND id <= ?", (limite, ultimo_id))
+        conn.commit()
+        with self._lock:
+            self._stats["arquivados"] += total
+        logger.info(f"🗄️ [EVENTOS] {total} eventos arquivados em {caminho}")
+        return caminho
+
+    # ===============================
+    #  Thread de gravação
+    # ===============================
+    def _loop(self):
+        while not self._parar.is_set():
+            self._acordar.wait(self.flush_ms / 1000)
+            self._acordar.clear()
+            try:
+                self.flush()
+                if EVENT_ARCHIVE_DAYS > 0 and time.time() - self._ultimo_arquivo > EVENT_ARCHIVE_EVERY_H * 3600:
+                    self._ultimo_arquivo = time.time()
+                    self.arquivar()
+            except Exception as e:
+                logger.exception(f"[ERRO] Thread de eventos: {e}")
+
+    def iniciar(self):
+        if self._thread is not None:
+            return self._thread
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop, name="tlux-eventos", daemon=True)
+        self._thread.start()
+        atexit.register(self.parar)
+        return self._thread
+
+    def parar(self, timeout: float = 5.0):
+        """Para a thread e grava o que ficou no buffer."""
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            dados = dict(self._stats)
+            dados["no_buffer"] = len(self._buffer)
+        dados["buffer_max"] = self.buffer_max
+        return dados
@@ -0,0 +1,171 @@
+# exportacao.py — Exportação em streaming (CSV / NDJSON) das tabelas do admin
+#
+# As linhas saem direto do cursor SQLite (fetchmany) para o gerador da
+# resposta: a memória usada não depende de quantas linhas são exportadas.
+# Filtros aceitos na URL: ?desde=AAAA-MM-DD&ate=AAAA-MM-DD&status=a,b
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+
+EXPORT_FETCH_SIZE = 500   # linhas por fetchmany / por bloco enviado ao cliente
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# entidade → SELECT (sem WHERE/ORDER BY), coluna de data, coluna de status, filtro fixo
+EXPORTACOES = {
+    "transactions": {
+        "sql": """
+            SELECT t.id, u.email, t.purpose, t.pacote, t.modelo, t.imei,
+                   t.amount, t.preco_fornecedor, t.lucro, t.status,
+                   t.order_id, t.tx_ref, t.created_at, t.updated_at
+            FROM transactions t
+            LEFT JOIN users u ON u.id = t.user_id
+        """,
+        "data": "t.created_at",
+        "status": "t.status",
+        "id": "t.id",
+    },
+    "unlocks": {
+        "sql": """
+            SELECT t.id, u.email, t.modelo, t.imei,
+                   t.amount AS preco_cliente, t.preco_fornecedor, t.lucro,
+                   t.status, t.order_id, t.created_at, t.updated_at
+            FROM transactions t
+            LEFT JOIN users u ON u.id = t.user_id
+        """,
+        "data": "t.created_at",
+        "status": "t.status",
+        "id": "t.id",
+        "where": "t.purpose = 'unlock'",
+    },
+    "orders": {
+        "sql": """
+            SELECT id, user_email, service_id, service_name, order_ref, imei, status, created_at
+            FROM orders
+        """,
+        "data": "created_at",
+        "status": "status",
+        "id": "id",
+    },
+    "licenses": {
+        "sql": """
+            SELECT l.id, u.email, l.license_key, l.pacote, l.modelo,
+                   l.issued_at, l.expires_at, l.status, l.tx_id
+            FROM licenses l
+            LEFT JOIN users u ON u.id = l.user_id
+        """,
+        "data": "l.issued_at",
+        "status": "l.status",
+        "id": "l.id",
+    },
+    "balance_ledger": {
+        "sql": """
+            SELECT b.id, u.email, b.amount, b.reason, b.created_at
+            FROM balance_ledger b
+            LEFT JOIN users u ON u.id = b.user_id
+        """,
+        "data": "b.created_at",
+        "status": None,
+        "id": "b.id",
+    },
+}
+
+
+def _data(valor):
+    """'AAAA-MM-DD' (ou ISO completo) → date; inválido → None."""
+    if not valor:
+        return None
+    try:
+        return datetime.fromisoformat(valor.strip()).date()
+    except ValueError:
+        return None
+
+
+def montar_consulta(entidade: str, desde=None, ate=None, status=None):
+    """
+    Monta (sql, params) da exportação de `entidade`.
+    `desde`/`ate` são inclusivos (datas); `status` é lista ou 'a,b,c'.
+    Levanta KeyError se a entidade não existe.
+    """
+    cfg = EXPORTACOES[entidade]
+    condicoes, params = [], []
+    if cfg.get("where"):
+        condicoes.append(f"({cfg['where']})")
+
+    inicio, fim = _data(desde), _data(ate)
+    if inicio:
+        condicoes.append(f"{cfg['data']} >= ?")
+        params.append(inicio.isoformat())
+    if fim:
+        # `ate` inclui o dia inteiro: < dia seguinte
+        condicoes.append(f"{cfg['data']} < ?")
+        params.append((fim + timedelta(days=1)).isoformat())
+
+    if isinstance(status, str):
+        status = [s.strip() for s in status.split(",")]
+    status = [s for s in (status or []) if s]
+    if status and cfg["status"]:
+        condicoes.append(f"{cfg['status']} IN ({','.join('?' * len(status))})")
+        params.extend(status)
+
+    sql = cfg["sql"].strip()
+    if condicoes:
+        sql += " WHERE " + " AND ".join(condicoes)
+    sql += f" ORDER BY {cfg['data']}, {cfg['id']}"
+    return sql, params
+
+
+def _linhas(cursor):
+    while True:
+        bloco = cursor.fetchmany(EXPORT_FETCH_SIZE)
+        if not bloco:
+            return
+        yield bloco
+
+
+def _json_default(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, bytes):
+        return valor.decode("utf-8", "replace")
+    return str(valor)
+
+
+def gerar_csv(cursor):
+    """Gera o CSV em blocos de texto: cabeçalho + EXPORT_FETCH_SIZE linhas por bloco."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([d[0] for d in cursor.description])
+    for bloco in _linhas(cursor):
+        writer.writerows(tuple(linha) for linha in bloco)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gerar_ndjson(cursor):
+    """Gera um objeto JSON por linha (NDJSON), em blocos de EXPORT_FETCH_SIZE linhas."""
+    colunas = [d[0] for d in cursor.description]
+    for bloco in _linhas(cursor):
+        yield "".join(
+            json.dumps(dict(zip(colunas, linha)), ensure_ascii=False, default=_json_default) + "\n"
+            for linha in bloco
+        )
+
+
+def exportar(conn, entidade: str, formato: str = "csv", desde=None, ate=None, status=None):
+    """
+    Executa a consulta e devolve o gerador do formato pedido.
+    Levanta KeyError para entidade/formato desconhecidos.
+    """
+    if formato not in FORMATOS:
+        raise KeyError(formato)
+    sql, params = montar_consulta(entidade, desde, ate, status)
+    cursor = conn.execute(sql, params)
+    return gerar_csv(cursor) if formato == "csv" else gerar_ndjson(cursor)
@@ -0,0 +1,192 @@
+# fornecedor_simulado.py — Servidor local que imita os fornecedores (para benchmark e testes)
+#
+# Um único ThreadingHTTPServer responde:
+#   POST /api/index.php       Dhru/iRemoval: placeimeiorder, getimeiorder, imeiservicelist,
+#                             services, order_status, accountinfo (form ou <xml>)
+#   GET  /check/apple-basic/  IMEI.info
+#   POST /v1/checkout/sessions  Stripe (cria a sessão e guarda para o webhook)
+#
+# Latência configurável por ação (segundos): FornecedorSimulado(latencias={"placeimeiorder": 0.3}).
+# Nada sai da máquina: aponte IREMOVAL_ENDPOINT/DHRU_API_URL/IMEI_BASE_URL para
+# `fornecedor.url_dhru` / `fornecedor.url` e stripe.api_base para `fornecedor.url`.
+import hashlib
+import hmac
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+LATENCIA_PADRAO = 0.05
+
+SERVICOS = {
+    "6": {"SERVICEID": 6, "SERVICENAME": "iPhone X - Hello Bypass", "CREDIT": "8.00"},
+    "75": {"SERVICEID": 75, "SERVICENAME": "iPhone 11 - Hello Bypass", "CREDIT": "14.00"},
+    "105": {"SERVICEID": 105, "SERVICENAME": "iPhone 15 - Hello Bypass", "CREDIT": "40.00"},
+}
+
+
+class FornecedorSimulado:
+    def __init__(self, latencias: dict = None, latencia_padrao: float = LATENCIA_PADRAO,
+                 host: str = "127.0.0.1", porta: int = 0):
+        self.latencias = dict(latencias or {})
+        self.latencia_padrao = latencia_padrao
+        self.sessoes = {}            # id da sessão Stripe → {tx_ref, metadata, ...}
+        self.ordens = {}             # order id → imei
+        self.chamadas = {}           # ação → quantidade
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._servidor = ThreadingHTTPServer((host, porta), self._handler())
+        self._servidor.daemon_threads = True
+        self._thread = None
+
+    # ===============================
+    #  Ciclo de vida
+    # ===============================
+    @property
+    def url(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    @property
+    def url_dhru(self) -> str:
+        return f"{self.url}/api/index.php"
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._servidor.serve_forever, name="fornecedor-simulado", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+    # ===============================
+    #  Respostas
+    # ===============================
+    def _esperar(self, acao: str):
+        with self._lock:
+            self.chamadas[acao] = self.chamadas.get(acao, 0) + 1
+        atraso = self.latencias.get(acao, self.latencia_padrao)
+        if atraso:
+            time.sleep(atraso)
+
+    def _dhru(self, campos: dict):
+        xml = campos.get("xml", "")
+        if xml:
+            # DhruClient (t_lux_unlock_api) manda <request><action>..</action>...</request>
+            campos = dict(re.findall(r"<(\w+)>([^<]*)</\1>", xml), **campos)
+        acao = (campos.get("action") or "").lower()
+        self._esperar(acao)
+        if acao in ("placeimeiorder", "place_order"):
+            imei = campos.get("imei", "")
+            if not imei:
+                return 200, {"ERROR": [{"MESSAGE": "IMEI required"}]}
+            with self._lock:
+                order_id = 100000 + next(self._ids)
+                self.ordens[str(order_id)] = imei
+            return 200, {"SUCCESS": [{"MESSAGE": "Order received", "ORDERID": order_id, "REFERENCEID": order_id}]}
+        if acao in ("getimeiorder", "order_status", "order"):
+            order_id = str(campos.get("id") or campos.get("orderid") or campos.get("order_id") or "")
+            if order_id not in self.ordens:
+                return 200, {"ERROR": [{"MESSAGE": "Invalid order"}]}
+            return 200, {"SUCCESS": [{"STATUS": 4, "CODE": "Done", "IMEI": self.ordens[order_id]}], "status": "success"}
+        if acao in ("imeiservicelist", "services"):
+            grupos = {"iPhone": {"GROUPNAME": "iPhone", "SERVICES": SERVICOS}}
+            return 200, {"SUCCESS": [{"MESSAGE": "IMEI Service List", "LIST": grupos}]}
+        if acao == "accountinfo":
+            return 200, {"SUCCESS": [{"AccoutInfo": {"credit": "1000.00", "currency": "USD"}}]}
+        return 200, {"ERROR": [{"MESSAGE": f"Invalid action {acao}"}]}
+
+    def _imei_info(self, params: dict):
+        self._esperar("imei_info")
+        imei = (params.get("imei") or [""])[0]
+        return 200, {"data": {"imei": imei, "model": "iPhone X", "deviceName": "iPhone X"}}
+
+    def _stripe_checkout(self, campos: dict):
+        self._esperar("stripe_checkout")
+        with self._lock:
+            sessao_id = f"cs_test_{next(self._ids):08d}"
+        metadata = {k[len("metadata["):-1]: v for k, v in campos.items() if k.startswith("metadata[")}
+        sessao = {
+            "id": sessao_id,
+            "object": "checkout.session",
+            "url": f"{self.url}/checkout/{sessao_id}",
+            "client_reference_id": campos.get("client_reference_id"),
+            "metadata": metadata,
+            "amount_total": int(campos.get("line_items[0][price_data][unit_amount]") or 0),
+            "payment_status": "unpaid",
+            "status": "open",
+        }
+        with self._lock:
+            self.sessoes[sessao_id] = sessao
+        return 200, sessao
+
+    # ===============================
+    #  Webhook (o "Stripe" avisando o app)
+    # ===============================
+    def evento_checkout_concluido(self, sessao_id: str) -> dict:
+        sessao = dict(self.sessoes[sessao_id], payment_status="paid", status="complete")
+        return {
+            "id": f"evt_{sessao_id}",
+            "object": "event",
+            "type": "checkout.session.completed",
+            "created": int(time.time()),
+            "data": {"object": sessao},
+        }
+
+    def _handler(self):
+        fornecedor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _responder(self, status: int, corpo: dict):
+                dados = json.dumps(corpo).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def _campos(self) -> dict:
+                tamanho = int(self.headers.get("Content-Length") or 0)
+                corpo = self.rfile.read(tamanho).decode("utf-8") if tamanho else ""
+                return {k: v[0] for k, v in parse_qs(corpo, keep_blank_values=True).items()}
+
+            def do_POST(self):
+                caminho = urlparse(self.path).path
+                campos = self._campos()
+                if caminho.endswith("index.php"):
+                    self._responder(*fornecedor._dhru(campos))
+                elif caminho == "/v1/checkout/sessions":
+                    self._responder(*fornecedor._stripe_checkout(campos))
+                else:
+                    self._responder(404, {"error": {"message": f"Unknown path {caminho}"}})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path.rstrip("/").endswith("/check/apple-basic"):
+                    self._responder(*fornecedor._imei_info(parse_qs(url.query)))
+                else:
+                    self._responder(404, {"error": {"message": f"Unknown path {url.path}"}})
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def assinatura_stripe(payload: str, segredo: str, timestamp: int = None) -> str:
+    """Cabeçalho Stripe-Signature (t=...,v1=HMAC-SHA256) aceito por stripe.Webhook.construct_event."""
+    timestamp = int(timestamp or time.time())
+    v1 = hmac.new(segredo.encode("utf-8"), f"{timestamp}.{payload}".encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={v1}"
@@ -0,0 +1,257 @@
+# http_client.py — Cliente HTTP compartilhado para os fornecedores (iRemoval/Dhru, IMEI.info)
+#
+# Todas as chamadas externas passam por aqui:
+#   - uma única requests.Session com pool de conexões keep-alive (reaproveita TCP+TLS)
+#   - timeout por ação (connect, read)
+#   - retry com backoff exponencial + jitter
+#   - circuit breaker por fornecedor (host)
+#   - X-Request-ID do request atual repassado ao fornecedor
+#   - latência, falhas e bytes por fornecedor/ação (metricas_upstream)
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+import metricas
+import metricas_upstream
+from log_config import obter_request_id
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+#  Configurações de ambiente
+# ===============================
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "8"))
+HTTP_CIRCUIT_FAILS = int(os.getenv("HTTP_CIRCUIT_FAILS", "5"))
+HTTP_CIRCUIT_RESET = float(os.getenv("HTTP_CIRCUIT_RESET", "30"))
+
+# (connect, read) em segundos
+DEFAULT_TIMEOUT = (5, 20)
+TIMEOUTS = {
+    "placeimeiorder": (5, 45),
+    "place_order": (5, 45),
+    "submit": (5, 45),
+    "services": (5, 60),
+    "imeiservicelist": (5, 60),
+    "getimeiorder": (5, 15),
+    "order_status": (5, 15),
+    "order": (5, 15),
+    "getimei": (5, 20),
+    "accountinfo": (5, 10),
+    "imei_info": (5, 10),
+}
+
+# Ações que criam pedidos: só repetimos se a conexão nem chegou a ser aberta,
+# senão corremos o risco de criar (e cobrar) a mesma ordem duas vezes.
+NAO_IDEMPOTENTES = {"placeimeiorder", "place_order", "submit"}
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Fornecedor com falhas seguidas: chamada recusada sem tocar na rede."""
+
+
+# ===============================
+#  Circuit breaker
+# ===============================
+class _Circuito:
+    def __init__(self):
+        self.falhas = 0
+        self.aberto_ate = 0.0
+        self.lock = threading.Lock()
+
+    def permite(self) -> bool:
+        with self.lock:
+            if self.falhas < HTTP_CIRCUIT_FAILS:
+                return True
+            agora = time.monotonic()
+            if agora >= self.aberto_ate:
+                # meio-aberto: deixa passar uma tentativa e reabre se falhar
+                self.aberto_ate = agora + HTTP_CIRCUIT_RESET
+                return True
+            return False
+
+    def sucesso(self):
+        with self.lock:
+            self.falhas = 0
+            self.aberto_ate = 0.0
+
+    def falha(self):
+        with self.lock:
+            self.falhas += 1
+            if self.falhas >= HTTP_CIRCUIT_FAILS:
+                self.aberto_ate = time.monotonic() + HTTP_CIRCUIT_RESET
+
+
+_circuitos = {}
+_circuitos_lock = threading.Lock()
+
+
+def _circuito(provider: str) -> _Circuito:
+    with _circuitos_lock:
+        if provider not in _circuitos:
+            _circuitos[provider] = _Circuito()
+        return _circuitos[provider]
+
+
+def circuito_aberto(provider: str) -> bool:
+    """True se o fornecedor está com o circuito aberto (chamadas bloqueadas)."""
+    c = _circuito(provider)
+    with c.lock:
+        return c.falhas >= HTTP_CIRCUIT_FAILS and time.monotonic() < c.aberto_ate
+
+
+# ===============================
+#  Sessão compartilhada
+# ===============================
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Sessão única do processo; o pool do urllib3 é thread-safe."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                # Retry é feito em request() — o adapter não repete nada sozinho
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _session = s
+    return _session
+
+
+def _espera(tentativa: int, resp=None) -> float:
+    """Backoff exponencial com jitter total; respeita Retry-After quando vier."""
+    if resp is not None:
+        retry_after = resp.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), HTTP_BACKOFF_MAX)
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** tentativa)))
+
+
+# ===============================
+#  API pública
+# ===============================
+def request(method: str, url: str, *, provider: str = None, action: str = None,
+            timeout=None, retries: int = None, **kwargs) -> requests.Response:
+    """
+    Igual a requests.request(), mas com pool, timeouts por ação, retry e circuit breaker.
+    - provider: chave do circuit breaker (padrão: host da URL)
+    - action: ação Dhru (placeimeiorder, services, ...) — define timeout e se pode repetir
+    Levanta as mesmas exceções do requests (CircuitOpenError é uma RequestException).
+    """
+    provider = provider or urlparse(url).netloc
+    circuito = _circuito(provider)
+    if not circuito.permite():
+        metricas_upstream.registro.registrar(provider, action, falha="circuito")
+        raise CircuitOpenError(f"Circuito aberto para {provider}")
+
+    timeout = timeout or TIMEOUTS.get(action, DEFAULT_TIMEOUT)
+    retries = HTTP_MAX_RETRIES if retries is None else retries
+    idempotente = method.upper() == "GET" or action not in NAO_IDEMPOTENTES
+    session = get_session()
+
+    request_id = obter_request_id()
+    if request_id:
+        kwargs["headers"] = {**(kwargs.get("headers") or {}), "X-Request-ID": request_id}
+    campos = {"provider": provider, "action": action}
+
+    tentativa = 0
+    while True:
+        inicio = time.monotonic()
+        try:
+            resp = session.request(method, url, timeout=timeout, **kwargs)
+        except requests.ConnectTimeout as e:
+            _registrar_tentativa(provider, action, inicio, tentativa, e, falha="timeout")
+            logger.warning("Timeout de conexão (tentativa %d): %s", tentativa + 1, e, extra=campos)
+            if tentativa >= retries:
+                circuito.falha()
+                raise
+        except (requests.ConnectionError, requests.Timeout) as e:
+            _registrar_tentativa(provider, action, inicio, tentativa, e,
+                                 falha="timeout" if isinstance(e, requests.Timeout) else "rede")
+            logger.warning("Falha de rede (tentativa %d): %s", tentativa + 1, e, extra=campos)
+            if not idempotente or tentativa >= retries:
+                circuito.falha()
+                raise
+        else:
+            segundos = _registrar_tentativa(provider, action, inicio, tentativa, resp,
+                                            stream=kwargs.get("stream", False))
+            logger.debug("%s %s → %s", method.upper(), action or url, resp.status_code,
+                         extra={**campos, "status": resp.status_code, "ms": round(segundos * 1000, 1)})
+            if resp.status_code in RETRY_STATUS and idempotente and tentativa < retries:
+                time.sleep(_espera(tentativa, resp))
+                tentativa += 1
+                continue
+            if resp.status_code >= 500:
+                circuito.falha()
+            else:
+                circuito.sucesso()
+            return resp
+
+        time.sleep(_espera(tentativa))
+        tentativa += 1
+
+
+def _tamanho_corpo(corpo) -> int:
+    if corpo is None:
+        return 0
+    if isinstance(corpo, (bytes, str)):
+        return len(corpo)
+    return 0  # gerador/arquivo: não dá para medir sem consumir
+
+
+def _registrar_tentativa(provider, action, inicio, tentativa, resultado, falha=None, stream=False) -> float:
+    """Soma a tentativa nas métricas do request e do fornecedor. Retorna a duração em segundos."""
+    segundos = time.monotonic() - inicio
+    metricas.somar_http(segundos)
+    requisicao = getattr(resultado, "request", None)
+    if isinstance(resultado, requests.Response):
+        status = resultado.status_code
+        if stream:
+            recebidos = int(resultado.headers.get("Content-Length") or 0)
+        else:
+            recebidos = len(resultado.content or b"")
+    else:
+        status, recebidos = None, 0
+    metricas_upstream.registro.registrar(
+        provider, action, segundos, status=status, falha=falha,
+        enviados=_tamanho_corpo(getattr(requisicao, "body", None)),
+        recebidos=recebidos, retry=tentativa > 0,
+    )
+    return segundos
+
+
+def nao_enviado(erro: Exception) -> bool:
+    """
+    True quando a requisição certamente não chegou ao fornecedor (circuito aberto,
+    timeout de conexão, DNS/conexão recusada) — só aí é seguro repetir uma ação
+    de NAO_IDEMPOTENTES. Read timeout e conexão caída no meio são ambíguos.
+    """
+    if isinstance(erro, (CircuitOpenError, requests.ConnectTimeout)):
+        return True
+    if isinstance(erro, requests.ConnectionError) and not isinstance(erro, requests.Timeout):
+        causa = erro.args[0] if erro.args else None
+        return isinstance(getattr(causa, "reason", causa), NewConnectionError)
+    return False
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
@@ -0,0 +1,289 @@
+# job_queue.py — Fila de jobs persistente (SQLite) com workers em thread
+#
+# Uso típico:
+#   fila = JobQueue(DB_FILE)
+#   fila.enfileirar("unlock_order", {"tx_id": 42}, idempotency_key="42")
+#   iniciar_workers(fila, "unlock_order", handler, quantidade=2)
+#
+# - idempotency_key: UNIQUE(kind, idempotency_key) → enfileirar duas vezes não duplica o job
+# - retry com backoff exponencial + jitter até max_attempts
+# - jobs "running" de um worker que morreu voltam para a fila após o lease
+# - kinds em `payload_sensivel` (ex.: e-mails com OTP / link de reset) têm o
+#   payload apagado quando o job termina (done ou failed de vez)
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+
+import db_pool
+from log_config import novo_request_id, obter_request_id, request_id_var
+
+logger = logging.getLogger(__name__)
+
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", "5"))
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", "600"))
+
+
+class JobFatal(Exception):
+    """Erro definitivo: o job vai direto para 'failed', sem novas tentativas."""
+
+
+class JobQueue:
+    def __init__(self, db_path: str, table: str = "jobs", payload_sensivel=()):
+        self.db_path = db_path
+        self.table = table
+        self.payload_sensivel = set(payload_sensivel)
+        self._schema_ok = False
+
+    # ===============================
+    #  Conexão / schema
+    # ===============================
+    def _connect(self):
+        # Conexão da thread (db_pool), compartilhada com o resto do código da thread:
+        # cada operação faz commit próprio e nunca fecha a conexão.
+        return db_pool.get_connection(self.db_path)
+
+    def garantir_tabela(self):
+        if self._schema_ok:
+            return
+        conn = self._connect()
+        do_chamador = conn.in_transaction
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                idempotency_key TEXT,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 5,
+                run_at REAL NOT NULL,
+                locked_at REAL,
+                locked_by TEXT,
+                last_error TEXT,
+                created_at TEXT DEFAULT (datetime('now')),
+                updated_at TEXT,
+                UNIQUE(kind, idempotency_key)
+            )
+        """)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_claim ON {self.table}(status, kind, run_at)")
+        if not do_chamador:  # dentro da transação do chamador, o schema vale no commit dele
+            conn.commit()
+            self._schema_ok = True
+
+    # ===============================
+    #  Produtor
+    # ===============================
+    def enfileirar(self, kind: str, payload: dict, idempotency_key: str = None,
+                   max_attempts: int = 5, delay: float = 0) -> bool:
+        """
+        Grava o job e retorna imediatamente.
+        Retorna False se já existia um job com a mesma (kind, idempotency_key).
+        O request_id atual vai junto no payload (`_request_id`) para os logs do worker.
+        Se o chamador tem uma transação aberta na conexão da thread, o job entra
+        nela (vale no commit do chamador, some no rollback) — nunca confirmamos
+        trabalho alheio pela metade.
+        """
+        request_id = obter_request_id()
+        if request_id and "_request_id" not in payload:
+            payload = {**payload, "_request_id": request_id}
+        self.garantir_tabela()
+        conn = self._connect()
+        do_chamador = conn.in_transaction
+        cur = conn.execute(f"""
+            INSERT OR IGNORE INTO {self.table} (kind, idempotency_key, payload, max_attempts, run_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (kind, idempotency_key, json.dumps(payload), max_attempts, time.time() + delay))
+        if not do_chamador:
+            conn.commit()
+        return cur.rowcount == 1
+
+    # ===============================
+    #  Consumidor
+    # ===============================
+    def reservar(self, kind: str, worker: str, limite: int = 1) -> list:
+        """Reserva até `limite` jobs prontos (BEGIN IMMEDIATE evita dois workers no mesmo job)."""
+        self.garantir_tabela()
+        agora = time.time()
+        conn = self._connect()
+        if conn.in_transaction:
+            conn.commit()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Recupera jobs presos em 'running' por um worker que morreu
+            conn.execute(f"""
+                UPDATE {self.table} SET status='queued', locked_at=NULL, locked_by=NULL
+                WHERE status='running' AND locked_at < ?
+            """, (agora - JOB_LEASE_SECONDS,))
+            rows = conn.execute(f"""
+                SELECT id, kind, idempotency_key, payload, attempts, max_attempts
+                FROM {self.table}
+                WHERE status='queued' AND kind=? AND run_at <= ?
+                ORDER BY run_at, id
+                LIMIT ?
+            """, (kind, agora, limite)).fetchall()
+            for r in rows:
+                conn.execute(f"""
+                    UPDATE {self.table}
+                    SET status='running', attempts=attempts+1, locked_at=?, locked_by=?, updated_at=datetime('now')
+                    WHERE id=?
+                """, (agora, worker, r["id"]))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        jobs = []
+        for r in rows:
+            job = dict(r)
+            job["payload"] = json.loads(job["payload"])
+            job["attempts"] += 1
+            jobs.append(job)
+        return jobs
+
+    def renovar(self, job_ids: list, worker: str) -> set:
+        """
+        Estende o lease dos jobs que `worker` ainda tem reservados (lotes longos:
+        o lease vale por job, não pelo lote). Retorna os ids que continuam dele.
+        """
+        if not job_ids:
+            return set()
+        marcas = ",".join("?" * len(job_ids))
+        conn = self._connect()
+        conn.execute(f"""
+            UPDATE {self.table} SET locked_at=?
+            WHERE id IN ({marcas}) AND status='running' AND locked_by=?
+        """, (time.time(), *job_ids, worker))
+        conn.commit()
+        rows = conn.execute(f"""
+            SELECT id FROM {self.table} WHERE id IN ({marcas}) AND status='running' AND locked_by=?
+        """, (*job_ids, worker)).fetchall()
+        return {r[0] for r in rows}
+
+    def _payload_final(self):
+        """Trecho SET que troca o payload por '{}' nos kinds sensíveis (job encerrado)."""
+        if not self.payload_sensivel:
+            return "payload", ()
+        marcas = ",".join("?" * len(self.payload_sensivel))
+        return f"CASE WHEN kind IN ({marcas}) THEN '{{}}' ELSE payload END", tuple(sorted(self.payload_sensivel))
+
+    def concluir(self, job_id: int):
+        payload_sql, kinds = self._payload_final()
+        conn = self._connect()
+        conn.execute(f"""
+            UPDATE {self.table}
+            SET status='done', payload={payload_sql}, locked_at=NULL, locked_by=NULL, last_error=NULL,
+                updated_at=datetime('now')
+            WHERE id=?
+        """, (*kinds, job_id))
+        conn.commit()
+
+    def falhar(self, job: dict, erro: str, definitivo: bool = False) -> bool:
+        """
+        Registra a falha. Reagenda com backoff enquanto houver tentativas.
+        Retorna True se o job falhou de vez (status 'failed').
+        """
+        final = definitivo or job["attempts"] >= job["max_attempts"]
+        espera = random.uniform(0.5, 1.0) * min(JOB_BACKOFF_MAX, JOB_BACKOFF_BASE * (2 ** (job["attempts"] - 1)))
+        conn = self._connect()
+        # O handler usa a mesma conexão: o que ele deixou sem commit é descartado,
+        # senão o commit abaixo gravaria um trabalho pela metade
+        conn.rollback()
+        payload_sql, kinds = self._payload_final() if final else ("payload", ())
+        conn.execute(f"""
+            UPDATE {self.table}
+            SET status=?, payload={payload_sql}, run_at=?, locked_at=NULL, locked_by=NULL, last_error=?,
+                updated_at=datetime('now')
+            WHERE id=?
+        """, ("failed" if final else "queued", *kinds, time.time() + espera, str(erro)[:1000], job["id"]))
+        conn.commit()
+        return final
+
+    def limpar_payloads(self, kind: str) -> int:
+        """Apaga o payload dos jobs de `kind` já encerrados (linhas antigas). Retorna quantos."""
+        self.garantir_tabela()
+        conn = self._connect()
+        cur = conn.execute(f"""
+            UPDATE {self.table} SET payload='{{}}'
+            WHERE kind=? AND status IN ('done', 'failed') AND payload <> '{{}}'
+        """, (kind,))
+        conn.commit()
+        return cur.rowcount
+
+    def contagem(self, kind: str = None) -> dict:
+        """Quantidade de jobs por status (para o painel admin)."""
+        self.garantir_tabela()
+        conn = self._connect()
+        if kind:
+            rows = conn.execute(f"SELECT status, COUNT(*) FROM {self.table} WHERE kind=? GROUP BY status", (kind,))
+        else:
+            rows = conn.execute(f"SELECT status, COUNT(*) FROM {self.table} GROUP BY status")
+        return {status: n for status, n in rows.fetchall()}
+
+    # ===============================
+    #  Execução
+    # ===============================
+    def processar(self, kind: str, handler, worker: str, limite: int = 1, on_failure=None) -> int:
+        """
+        Reserva e executa jobs de `kind`. `handler(payload)` levanta exceção para
+        repetir (ou JobFatal para desistir). `on_failure(payload, erro)` roda quando
+        o job falha de vez. Retorna quantos jobs foram executados.
+        """
+        jobs = self.reservar(kind, worker, limite)
+        for i, job in enumerate(jobs):
+            # O lote inteiro foi reservado de uma vez: antes de cada job, renova o
+            # lease dos que faltam para que outro worker não os recupere no meio
+            if i and job["id"] not in self.renovar([j["id"] for j in jobs[i:]], worker):
+                continue
+            token = request_id_var.set(job["payload"].get("_request_id") or novo_request_id())
+            try:
+                handler(job["payload"])
+            except Exception as e:
+                final = self.falhar(job, e, definitivo=isinstance(e, JobFatal))
+                logger.warning("Job %s #%s falhou (tentativa %s/%s): %s", kind, job["id"],
+                               job["attempts"], job["max_attempts"], e,
+                               extra={"kind": kind, "job_id": job["id"], "final": final})
+                if final and on_failure:
+                    on_failure(job["payload"], e)
+            else:
+                self.concluir(job["id"])
+            finally:
+                request_id_var.reset(token)
+        return len(jobs)
+
+
+def iniciar_workers(fila: JobQueue, kind: str, handler, quantidade: int = 2, intervalo: float = 1.0,
+                    on_failure=None, contexto=None, stop_event: threading.Event = None,
+                    limite: int = 1) -> list:
+    """
+    Sobe `quantidade` threads daemon consumindo `kind`.
+    `contexto` é uma fábrica de context manager aplicada em cada rodada
+    (ex.: app.app_context no Flask). `limite` = jobs reservados por rodada.
+    """
+    stop_event = stop_event or threading.Event()
+    threads = []
+
+    def loop(nome):
+        while not stop_event.is_set():
+            try:
+                if contexto:
+                    with contexto():
+                        feitos = fila.processar(kind, handler, nome, limite=limite, on_failure=on_failure)
+                else:
+                    feitos = fila.processar(kind, handler, nome, limite=limite, on_failure=on_failure)
+            except Exception as e:
+                logger.exception("Erro no worker %s", nome, extra={"kind": kind})
+                feitos = 0
+            if not feitos:
+                stop_event.wait(intervalo)
+
+    for i in range(quantidade):
+        nome = f"{socket.gethostname()}:{os.getpid()}:{kind}:{i}"
+        t = threading.Thread(target=loop, args=(nome,), name=f"tlux-jobs-{kind}-{i}", daemon=True)
+        t.start()
+        threads.append(t)
+    return threads
@@ -1,4 +1,4 @@
-import requests
+import http_client
 import json
 import os
 
@@ -16,7 +16,7 @@ payload = {
 def get_structured_services():
     """Retorna lista estruturada dos grupos e serviços da DHRU API."""
     print("📤 Pedindo lista de serviços...")
-    resp = requests.post(API_URL, data=payload, timeout=30)
+    resp = http_client.post(API_URL, data=payload, action="imeiservicelist")
     resp.raise_for_status()
     try:
         data = resp.json()
@@ -50,7 +50,7 @@ def get_structured_services():
 if __name__ == "__main__":
     # versão de exibição (igual à tua)
     print("📤 Pedindo lista de serviços...")
-    resp = requests.post(API_URL, data=payload, timeout=30)
+    resp = http_client.post(API_URL, data=payload, action="imeiservicelist")
     resp.raise_for_status()
 
     try:
@@ -0,0 +1,149 @@
+# log_config.py — Logging estruturado do T-Lux
+#
+# - registros em JSON (uma linha por evento) ou texto, via LOG_FORMAT
+# - QueueHandler no root: quem loga só coloca o registro numa fila; uma
+#   thread (QueueListener) formata e escreve no stderr
+# - nível geral em LOG_LEVEL e por módulo em LOG_LEVELS ("http_client=DEBUG,job_queue=WARNING")
+# - request_id (contextvar) em todos os registros; definido por request no
+#   Flask, repassado aos fornecedores (X-Request-ID) e aos jobs da fila
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()   # json | text
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+request_id_var: ContextVar = ContextVar("request_id", default=None)
+
+# Atributos padrão do LogRecord — o que sobrar veio de extra={...}
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_listener = None
+
+
+def novo_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def definir_request_id(request_id: str = None) -> str:
+    """Define o request_id do contexto atual (gera um se vier vazio)."""
+    request_id = (request_id or "").strip()[:64] or novo_request_id()
+    request_id_var.set(request_id)
+    return request_id
+
+
+def obter_request_id():
+    return request_id_var.get()
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        dados = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            dados["request_id"] = record.request_id
+        for chave, valor in record.__dict__.items():
+            if chave not in _ATRIBUTOS_PADRAO and not chave.startswith("_"):
+                dados[chave] = valor
+        if record.exc_info:
+            dados["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            dados["exc"] = record.exc_text
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class _QueueHandlerSemBloqueio(logging.handlers.QueueHandler):
+    """Fila cheia → descarta o registro em vez de travar o request."""
+
+    descartados = 0
+
+    def prepare(self, record):
+        # Formata a mensagem aqui (args podem não ser serializáveis/thread-safe),
+        # mas guarda o traceback à parte para o formatter da thread de escrita
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            type(self).descartados += 1
+
+
+def _niveis_por_modulo(texto: str) -> dict:
+    niveis = {}
+    for par in (texto or "").split(","):
+        if "=" in par:
+            nome, nivel = par.split("=", 1)
+            niveis[nome.strip()] = nivel.strip().upper()
+    return niveis
+
+
+def configurar_logging(nivel: str = LOG_LEVEL, niveis_modulo: str = LOG_LEVELS,
+                       formato: str = LOG_FORMAT, stream=None):
+    """Instala o pipeline (idempotente). Retorna o QueueListener."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    saida = logging.StreamHandler(stream or sys.stderr)
+    if formato == "json":
+        saida.setFormatter(JsonFormatter())
+    else:
+        saida.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    fila = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = _QueueHandlerSemBloqueio(fila)
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(handler)
+    root.setLevel(nivel)
+    for nome, nivel_modulo in _niveis_por_modulo(niveis_modulo).items():
+        logging.getLogger(nome).setLevel(nivel_modulo)
+
+    _listener = logging.handlers.QueueListener(fila, saida, respect_handler_level=True)
+    _listener.start()
+    atexit.register(parar_logging)
+    return _listener
+
+
+def parar_logging():
+    """Esvazia a fila e para a thread de escrita (atexit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log(nivel: str, mensagem: str, logger: str = "tlux", **campos):
+    """Atalho log("INFO", "...", campo=valor) — campos extras vão para o JSON."""
+    logging.getLogger(logger).log(logging.getLevelName(str(nivel).upper()), mensagem, extra=campos or None)
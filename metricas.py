@@ -0,0 +1,258 @@
+# metricas.py — Métricas em memória do processo (latência por endpoint)
+#
+# - Histograma no estilo HDR: buckets log-lineares (16 por potência de 2,
+#   erro relativo ≤ ~6%), esparsos, sem alocação por amostra
+# - por request: tempo total, tempo em SQL, tempo em HTTP de fornecedores
+#   e número de queries (pega N+1 tipo painel_unlocks)
+# - db_pool e http_client somam no request atual via contextvar; fora de
+#   request (workers, scripts) nada é acumulado
+# - requests que levantam exceção e não passam pelo after_request são
+#   fechados no teardown como 500 (finalizar_pendente)
+# - exposicao_prometheus() gera o texto do /metrics
+import contextvars
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+METRICS_SQL_N1_LIMITE = int(os.getenv("METRICS_SQL_N1_LIMITE", "50"))   # queries/request que geram aviso
+
+_SUB_BITS = 4
+_SUB = 1 << _SUB_BITS
+
+# Limites exportados no /metrics (o histograma interno é bem mais fino)
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LIMITES_QUERIES = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+# ===============================
+#  Histograma
+# ===============================
+def _indice(valor: int) -> int:
+    if valor < 2 * _SUB:
+        return valor
+    desloc = valor.bit_length() - (_SUB_BITS + 1)
+    return (desloc + 1) * _SUB + (valor >> desloc) - _SUB
+
+
+def _faixa(indice: int):
+    """(início, fim) dos valores que caem no bucket `indice`."""
+    if indice < 2 * _SUB:
+        return indice, indice + 1
+    desloc = indice // _SUB - 1
+    base = indice % _SUB + _SUB
+    return base << desloc, (base + 1) << desloc
+
+
+class Histograma:
+    """
+    Contagem de valores inteiros (µs, número de queries...) em buckets log-lineares.
+    `escala` converte o inteiro guardado para a unidade exportada (µs → s = 1e-6).
+    """
+
+    def __init__(self, escala: float = 1.0):
+        self.escala = escala
+        self.buckets = {}
+        self.total = 0
+        self.soma = 0
+        self.maximo = 0
+
+    def registrar(self, valor):
+        valor = max(0, int(valor))
+        i = _indice(valor)
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+        self.total += 1
+        self.soma += valor
+        if valor > self.maximo:
+            self.maximo = valor
+
+    def mesclar(self, outro: "Histograma"):
+        """Soma as amostras de outro histograma (mesma escala) neste."""
+        for i, n in outro.buckets.items():
+            self.buckets[i] = self.buckets.get(i, 0) + n
+        self.total += outro.total
+        self.soma += outro.soma
+        self.maximo = max(self.maximo, outro.maximo)
+
+    def percentil(self, p: float) -> float:
+        """Valor (na unidade exportada) abaixo do qual estão p% das amostras."""
+        if not self.total:
+            return 0.0
+        alvo = max(1, round(self.total * p / 100))
+        acumulado = 0
+        for i in sorted(self.buckets):
+            acumulado += self.buckets[i]
+            if acumulado >= alvo:
+                inicio, fim = _faixa(i)
+                return min(fim - 1, self.maximo) * self.escala
+        return self.maximo * self.escala
+
+    def acumulado_ate(self, limites):
+        """Contagens cumulativas (≤ limite) para os limites dados na unidade exportada."""
+        ordenados = sorted(self.buckets.items())
+        saida, acumulado, pos = [], 0, 0
+        for limite in limites:
+            bruto = limite / self.escala
+            while pos < len(ordenados) and _faixa(ordenados[pos][0])[0] <= bruto:
+                acumulado += ordenados[pos][1]
+                pos += 1
+            saida.append(acumulado)
+        return saida
+
+
+# ===============================
+#  Coleta por request
+# ===============================
+class ColetaRequest:
+    __slots__ = ("inicio", "sql_us", "sql_n", "http_us", "http_n")
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.sql_us = 0
+        self.sql_n = 0
+        self.http_us = 0
+        self.http_n = 0
+
+
+_coleta_var: contextvars.ContextVar = contextvars.ContextVar("metricas_coleta", default=None)
+
+
+def iniciar_request() -> ColetaRequest:
+    coleta = ColetaRequest()
+    _coleta_var.set(coleta)
+    return coleta
+
+
+def coleta_atual():
+    return _coleta_var.get()
+
+
+def somar_sql(segundos: float):
+    coleta = _coleta_var.get()
+    if coleta is not None:
+        coleta.sql_us += int(segundos * 1_000_000)
+        coleta.sql_n += 1
+
+
+def somar_http(segundos: float):
+    coleta = _coleta_var.get()
+    if coleta is not None:
+        coleta.http_us += int(segundos * 1_000_000)
+        coleta.http_n += 1
+
+
+# ===============================
+#  Registro por endpoint
+# ===============================
+class _MetricasEndpoint:
+    __slots__ = ("duracao", "sql", "http", "queries")
+
+    def __init__(self):
+        self.duracao = Histograma(1e-6)
+        self.sql = Histograma(1e-6)
+        self.http = Histograma(1e-6)
+        self.queries = Histograma()
+
+
+class Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._respostas = {}   # (endpoint, método, status) → contagem
+
+    def finalizar_request(self, endpoint: str, metodo: str, status: int, coleta: ColetaRequest = None):
+        """Fecha a coleta do request atual e soma no histograma do endpoint."""
+        coleta = coleta or _coleta_var.get()
+        if coleta is None:
+            return
+        _coleta_var.set(None)
+        duracao_us = int((time.perf_counter() - coleta.inicio) * 1_000_000)
+        with self._lock:
+            m = self._endpoints.get(endpoint)
+            if m is None:
+                m = self._endpoints[endpoint] = _MetricasEndpoint()
+            m.duracao.registrar(duracao_us)
+            m.sql.registrar(coleta.sql_us)
+            m.http.registrar(coleta.http_us)
+            m.queries.registrar(coleta.sql_n)
+            chave = (endpoint, metodo, status)
+            self._respostas[chave] = self._respostas.get(chave, 0) + 1
+        if coleta.sql_n > METRICS_SQL_N1_LIMITE:
+            logger.warning("%s fez %d queries num só request (N+1?)", endpoint, coleta.sql_n,
+                           extra={"endpoint": endpoint, "queries": coleta.sql_n})
+
+    def finalizar_pendente(self, endpoint: str, metodo: str, status: int = 500) -> bool:
+        """
+        Fecha uma coleta que o after_request não fechou (exceção no handler ou
+        no próprio after_request): o request conta como `status`. True se havia uma.
+        """
+        if _coleta_var.get() is None:
+            return False
+        self.finalizar_request(endpoint, metodo, status)
+        return True
+
+    def resumo(self) -> dict:
+        """{endpoint: {count, p50_ms, p95_ms, p99_ms, sql_p95_ms, http_p95_ms, queries_p95}} para o painel."""
+        with self._lock:
+            return {
+                nome: {
+                    "count": m.duracao.total,
+                    "p50_ms": round(m.duracao.percentil(50) * 1000, 1),
+                    "p95_ms": round(m.duracao.percentil(95) * 1000, 1),
+                    "p99_ms": round(m.duracao.percentil(99) * 1000, 1),
+                    "sql_p95_ms": round(m.sql.percentil(95) * 1000, 1),
+                    "http_p95_ms": round(m.http.percentil(95) * 1000, 1),
+                    "queries_p95": m.queries.percentil(95),
+                }
+                for nome, m in self._endpoints.items()
+            }
+
+    def limpar(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._respostas.clear()
+
+    def exposicao_prometheus(self) -> str:
+        """Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)."""
+        linhas = []
+        with self._lock:
+            series = (
+                ("tlux_request_duration_seconds", "Tempo total do request por endpoint", "duracao", LIMITES_SEGUNDOS),
+                ("tlux_request_sql_seconds", "Tempo gasto em SQL por request", "sql", LIMITES_SEGUNDOS),
+                ("tlux_request_upstream_seconds", "Tempo gasto em HTTP de fornecedores por request", "http", LIMITES_SEGUNDOS),
+                ("tlux_request_sql_queries", "Queries SQL por request", "queries", LIMITES_QUERIES),
+            )
+            for nome, ajuda, campo, limites in series:
+                linhas.append(f"# HELP {nome} {ajuda}")
+                linhas.append(f"# TYPE {nome} histogram")
+                for endpoint in sorted(self._endpoints):
+                    h = getattr(self._endpoints[endpoint], campo)
+                    rotulo = f'endpoint="{escapar_rotulo(endpoint)}"'
+                    for limite, qtd in zip(limites, h.acumulado_ate(limites)):
+                        linhas.append(f'{nome}_bucket{{{rotulo},le="{formatar_numero(limite)}"}} {qtd}')
+                    linhas.append(f'{nome}_bucket{{{rotulo},le="+Inf"}} {h.total}')
+                    soma = h.soma if h.escala == 1 else round(h.soma * h.escala, 6)
+                    linhas.append(f"{nome}_sum{{{rotulo}}} {formatar_numero(soma)}")
+                    linhas.append(f"{nome}_count{{{rotulo}}} {h.total}")
+
+            linhas.append("# HELP tlux_requests_total Requests por endpoint, método e status")
+            linhas.append("# TYPE tlux_requests_total counter")
+            for (endpoint, metodo, status), qtd in sorted(self._respostas.items()):
+                linhas.append(
+                    f'tlux_requests_total{{endpoint="{escapar_rotulo(endpoint)}",method="{metodo}",status="{status}"}} {qtd}'
+                )
+        return "\n".join(linhas) + "\n"
+
+
+def escapar_rotulo(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def formatar_numero(valor) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+# Registro único do processo
+registro = Registro()
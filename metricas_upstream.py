@@ -0,0 +1,171 @@
+# metricas_upstream.py — Latência e erros das chamadas aos fornecedores (iRemoval/Dhru, IMEI.info)
+#
+# http_client registra cada tentativa aqui: por (fornecedor, ação) guardamos
+# histograma de latência, timeouts, erros de rede, respostas 5xx/4xx,
+# recusas do circuit breaker, retries e bytes enviados/recebidos.
+#
+# SLO: numa janela móvel (UPSTREAM_SLO_JANELA_MIN minutos, em fatias de 1 min)
+# o p95 tem que ficar abaixo de UPSTREAM_SLO_P95_MS e a taxa de erro abaixo de
+# UPSTREAM_SLO_ERRO_PCT. O admin_overview mostra quem está fora.
+import os
+import threading
+import time
+from collections import deque
+
+from metricas import LIMITES_SEGUNDOS, Histograma, escapar_rotulo, formatar_numero
+
+UPSTREAM_SLO_P95_MS = float(os.getenv("UPSTREAM_SLO_P95_MS", "3000"))
+UPSTREAM_SLO_ERRO_PCT = float(os.getenv("UPSTREAM_SLO_ERRO_PCT", "2"))
+UPSTREAM_SLO_JANELA_MIN = int(os.getenv("UPSTREAM_SLO_JANELA_MIN", "15"))
+
+# Tipos de falha contados por tentativa
+FALHAS = ("timeout", "rede", "http_5xx", "http_4xx", "circuito")
+
+
+class _Fatia:
+    """Um minuto da janela do SLO."""
+
+    __slots__ = ("minuto", "latencia", "chamadas", "erros")
+
+    def __init__(self, minuto: int):
+        self.minuto = minuto
+        self.latencia = Histograma(1e-6)
+        self.chamadas = 0
+        self.erros = 0
+
+
+class _Chamadas:
+    __slots__ = ("latencia", "chamadas", "falhas", "retries", "bytes_enviados", "bytes_recebidos", "janela")
+
+    def __init__(self):
+        self.latencia = Histograma(1e-6)
+        self.chamadas = 0
+        self.falhas = dict.fromkeys(FALHAS, 0)
+        self.retries = 0
+        self.bytes_enviados = 0
+        self.bytes_recebidos = 0
+        self.janela = deque()
+
+    def fatia(self, agora: float) -> _Fatia:
+        minuto = int(agora // 60)
+        if not self.janela or self.janela[-1].minuto != minuto:
+            self.janela.append(_Fatia(minuto))
+        while self.janela and self.janela[0].minuto <= minuto - UPSTREAM_SLO_JANELA_MIN:
+            self.janela.popleft()
+        return self.janela[-1]
+
+
+class RegistroUpstream:
+    def __init__(self, relogio=time.time):
+        self._lock = threading.Lock()
+        self._chamadas = {}
+        self._relogio = relogio
+
+    def _item(self, provider: str, action: str) -> _Chamadas:
+        chave = (provider, action or "-")
+        item = self._chamadas.get(chave)
+        if item is None:
+            item = self._chamadas[chave] = _Chamadas()
+        return item
+
+    def registrar(self, provider: str, action: str, segundos: float = None, status: int = None,
+                  falha: str = None, enviados: int = 0, recebidos: int = 0, retry: bool = False):
+        """
+        Uma tentativa. `segundos` None = nem chegou à rede (circuito aberto).
+        `falha` (timeout/rede/circuito) vale para exceções; o status HTTP define 5xx/4xx.
+        """
+        if falha is None and status is not None:
+            falha = "http_5xx" if status >= 500 else "http_4xx" if status >= 400 else None
+        with self._lock:
+            item = self._item(provider, action)
+            fatia = item.fatia(self._relogio())
+            item.chamadas += 1
+            fatia.chamadas += 1
+            if segundos is not None:
+                us = int(segundos * 1_000_000)
+                item.latencia.registrar(us)
+                fatia.latencia.registrar(us)
+            if falha:
+                item.falhas[falha] += 1
+                if falha != "http_4xx":  # 4xx é erro nosso (parâmetro), não do fornecedor
+                    fatia.erros += 1
+            if retry:
+                item.retries += 1
+            item.bytes_enviados += enviados or 0
+            item.bytes_recebidos += recebidos or 0
+
+    def resumo(self) -> list:
+        """Uma linha por (fornecedor, ação), com percentis, falhas, bytes e situação do SLO."""
+        linhas = []
+        with self._lock:
+            agora = self._relogio()
+            for (provider, action), item in sorted(self._chamadas.items()):
+                item.fatia(agora)  # descarta minutos vencidos
+                janela = Histograma(1e-6)
+                chamadas_janela = erros_janela = 0
+                for fatia in item.janela:
+                    janela.mesclar(fatia.latencia)
+                    chamadas_janela += fatia.chamadas
+                    erros_janela += fatia.erros
+                p95_janela = round(janela.percentil(95) * 1000, 1)
+                erro_pct = round(100 * erros_janela / chamadas_janela, 2) if chamadas_janela else 0.0
+                linhas.append({
+                    "provider": provider,
+                    "action": action,
+                    "chamadas": item.chamadas,
+                    "p50_ms": round(item.latencia.percentil(50) * 1000, 1),
+                    "p95_ms": round(item.latencia.percentil(95) * 1000, 1),
+                    "p99_ms": round(item.latencia.percentil(99) * 1000, 1),
+                    "max_ms": round(item.latencia.maximo / 1000, 1),
+                    **item.falhas,
+                    "retries": item.retries,
+                    "bytes_enviados": item.bytes_enviados,
+                    "bytes_recebidos": item.bytes_recebidos,
+                    "janela_chamadas": chamadas_janela,
+                    "janela_p95_ms": p95_janela,
+                    "janela_erro_pct": erro_pct,
+                    "slo_ok": p95_janela <= UPSTREAM_SLO_P95_MS and erro_pct <= UPSTREAM_SLO_ERRO_PCT,
+                })
+        return linhas
+
+    def limpar(self):
+        with self._lock:
+            self._chamadas.clear()
+
+    def exposicao_prometheus(self) -> str:
+        linhas = [
+            "# HELP tlux_upstream_duration_seconds Latência de cada tentativa ao fornecedor",
+            "# TYPE tlux_upstream_duration_seconds histogram",
+        ]
+        contadores = []
+        with self._lock:
+            for (provider, action), item in sorted(self._chamadas.items()):
+                rotulo = f'provider="{escapar_rotulo(provider)}",action="{escapar_rotulo(action)}"'
+                h = item.latencia
+                for limite, qtd in zip(LIMITES_SEGUNDOS, h.acumulado_ate(LIMITES_SEGUNDOS)):
+                    linhas.append(f'tlux_upstream_duration_seconds_bucket{{{rotulo},le="{formatar_numero(limite)}"}} {qtd}')
+                linhas.append(f'tlux_upstream_duration_seconds_bucket{{{rotulo},le="+Inf"}} {h.total}')
+                linhas.append(f"tlux_upstream_duration_seconds_sum{{{rotulo}}} {formatar_numero(round(h.soma * h.escala, 6))}")
+                linhas.append(f"tlux_upstream_duration_seconds_count{{{rotulo}}} {h.total}")
+                contadores.append((rotulo, item))
+
+            linhas.append("# HELP tlux_upstream_requests_total Tentativas por fornecedor e ação")
+            linhas.append("# TYPE tlux_upstream_requests_total counter")
+            linhas += [f"tlux_upstream_requests_total{{{r}}} {i.chamadas}" for r, i in contadores]
+            linhas.append("# HELP tlux_upstream_failures_total Falhas por tipo (timeout, rede, http_5xx, http_4xx, circuito)")
+            linhas.append("# TYPE tlux_upstream_failures_total counter")
+            for r, i in contadores:
+                linhas += [f'tlux_upstream_failures_total{{{r},kind="{tipo}"}} {i.falhas[tipo]}' for tipo in FALHAS]
+            linhas.append("# HELP tlux_upstream_retries_total Tentativas repetidas")
+            linhas.append("# TYPE tlux_upstream_retries_total counter")
+            linhas += [f"tlux_upstream_retries_total{{{r}}} {i.retries}" for r, i in contadores]
+            linhas.append("# HELP tlux_upstream_bytes_total Bytes trocados com o fornecedor")
+            linhas.append("# TYPE tlux_upstream_bytes_total counter")
+            for r, i in contadores:
+                linhas.append(f'tlux_upstream_bytes_total{{{r},direction="sent"}} {i.bytes_enviados}')
+                linhas.append(f'tlux_upstream_bytes_total{{{r},direction="received"}} {i.bytes_recebidos}')
+        return "\n".join(linhas) + "\n"
+
+
+# Registro único do processo
+registro = RegistroUpstream()
@@ -16,6 +16,10 @@ CREATE TABLE IF NOT EXISTS users (
     is_admin INTEGER DEFAULT 0,
     region TEXT DEFAULT 'USD',
     email_verified INTEGER DEFAULT 1,
+    blocked INTEGER DEFAULT 0,
+    approved INTEGER DEFAULT 0,
+    role TEXT DEFAULT 'user',
+    balance REAL DEFAULT 0.0,
     created_at TEXT DEFAULT CURRENT_TIMESTAMP
 );
 
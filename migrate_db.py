@@ -5,11 +5,67 @@
 # Última atualização: 2025-10-24
 # =============================================
 
-import sqlite3
+import db_pool
+import logging
 import os
+import re
 
-DB_PATH = os.getenv("DB_FILE", os.path.join(os.path.dirname(__file__), "t-lux.db"))
+DB_PATH = db_pool.DB_FILE
 SQL_FILE = os.path.join(os.path.dirname(__file__), "migrate_all.sql")
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+
+logger = logging.getLogger(__name__)
+
+# -----------------------
+# Migrações versionadas (migrations/NNNN_nome.sql)
+# -----------------------
+# Cada arquivo roda uma única vez, numa transação, e fica registrado em
+# schema_migrations. Os scripts devem ser idempotentes (IF NOT EXISTS,
+# INSERT OR IGNORE): vários workers podem subir ao mesmo tempo.
+_RE_MIGRACAO = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+def listar_migracoes(pasta: str = MIGRATIONS_DIR) -> list:
+    """Retorna [(versao, nome, caminho)] em ordem de versão."""
+    if not os.path.isdir(pasta):
+        return []
+    migracoes = []
+    for arquivo in sorted(os.listdir(pasta)):
+        m = _RE_MIGRACAO.match(arquivo)
+        if m:
+            migracoes.append((m.group(1), m.group(2), os.path.join(pasta, arquivo)))
+    return migracoes
+
+def aplicar_migracoes(conn=None, pasta: str = MIGRATIONS_DIR) -> list:
+    """Aplica as migrações pendentes. Retorna as versões aplicadas agora."""
+    conn = conn or db_pool.get_connection(DB_PATH)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version TEXT PRIMARY KEY,
+            name TEXT,
+            applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+    aplicadas = {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+
+    novas = []
+    for versao, nome, caminho in listar_migracoes(pasta):
+        if versao in aplicadas:
+            continue
+        with open(caminho, "r", encoding="utf-8") as f:
+            sql = f.read()
+        try:
+            conn.executescript(
+                "BEGIN;\n" + sql +
+                f"\nINSERT OR IGNORE INTO schema_migrations (version, name) VALUES ('{versao}', '{nome}');\nCOMMIT;"
+            )
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        logger.info(f"✅ Migração {versao}_{nome} aplicada.")
+        novas.append(versao)
+    return novas
 
 def migrate_database():
     """Executa a migração completa do banco T-Lux."""
@@ -23,13 +79,14 @@ def migrate_database():
         sql_script = f.read()
 
     # Conecta ao banco SQLite
-    conn = sqlite3.connect(DB_PATH)
+    conn = db_pool.get_connection(DB_PATH)
     c = conn.cursor()
 
     try:
         # Executa todos os comandos SQL
         c.executescript(sql_script)
         conn.commit()
+        aplicar_migracoes(conn)
         print("✅ Migração concluída com sucesso!")
 
         # Mostra as tabelas existentes (debug)
@@ -0,0 +1,56 @@
+-- =======================
+-- 0001 — Índices compostos para as consultas quentes
+-- Idempotente (IF NOT EXISTS): pode rodar em bancos antigos e novos.
+-- =======================
+
+-- Tabelas usadas pelas consultas abaixo que nem todo banco antigo tem
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    from_user_id INTEGER,
+    to_user_id INTEGER,
+    body TEXT,
+    seen INTEGER DEFAULT 0,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS verification_codes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    email TEXT,
+    code TEXT,
+    code_hash TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP,
+    attempts INTEGER DEFAULT 0,
+    used INTEGER DEFAULT 0,
+    last_sent_at TIMESTAMP
+);
+
+-- transactions: painéis do usuário (user_id + purpose, ordenado por data)
+CREATE INDEX IF NOT EXISTS idx_transactions_user_purpose_created ON transactions(user_id, purpose, created_at);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_created ON transactions(user_id, created_at);
+-- transactions: webhook / recibos (bancos antigos não têm o UNIQUE em tx_ref)
+CREATE INDEX IF NOT EXISTS idx_transactions_tx_ref ON transactions(tx_ref);
+-- transactions: contadores do admin_overview e poller de desbloqueios
+CREATE INDEX IF NOT EXISTS idx_transactions_status_purpose ON transactions(status, purpose, amount);
+CREATE INDEX IF NOT EXISTS idx_transactions_created ON transactions(created_at);
+
+-- login_attempts: failed_attempts() filtra (email OR ip) + status + janela de tempo
+CREATE INDEX IF NOT EXISTS idx_login_attempts_email_status_created ON login_attempts(email, status, created_at);
+CREATE INDEX IF NOT EXISTS idx_login_attempts_ip_status_created ON login_attempts(ip_address, status, created_at);
+
+-- blocked_users: is_blocked() filtra (email OR ip) + blocked_until
+CREATE INDEX IF NOT EXISTS idx_blocked_users_email_until ON blocked_users(email, blocked_until);
+CREATE INDEX IF NOT EXISTS idx_blocked_users_ip_until ON blocked_users(ip_address, blocked_until);
+
+-- messages: não lidas por destinatário e conversas por usuário
+CREATE INDEX IF NOT EXISTS idx_messages_to_seen ON messages(to_user_id, seen);
+CREATE INDEX IF NOT EXISTS idx_messages_from ON messages(from_user_id);
+
+-- verification_codes: último código ativo por email
+CREATE INDEX IF NOT EXISTS idx_verification_codes_email_used ON verification_codes(email, used);
+
+-- licenses: listagens ordenadas por emissão, por usuário e por transação
+CREATE INDEX IF NOT EXISTS idx_licenses_issued ON licenses(issued_at);
+CREATE INDEX IF NOT EXISTS idx_licenses_user_issued ON licenses(user_id, issued_at);
+CREATE INDEX IF NOT EXISTS idx_licenses_tx ON licenses(tx_id);
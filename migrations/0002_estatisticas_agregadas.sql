@@ -0,0 +1,153 @@
+-- =======================
+-- 0002 — Estatísticas agregadas (rollup) para admin_overview / admin_dashboard
+-- Mantidas por triggers a cada INSERT/UPDATE/DELETE; o painel lê poucas linhas
+-- em vez de varrer transactions/licenses/users.
+-- =======================
+
+-- Transações por dia × purpose × status
+CREATE TABLE IF NOT EXISTS stats_transacoes (
+    dia TEXT NOT NULL,
+    purpose TEXT NOT NULL,
+    status TEXT NOT NULL,
+    qtd INTEGER NOT NULL DEFAULT 0,
+    valor REAL NOT NULL DEFAULT 0,
+    fornecedor REAL NOT NULL DEFAULT 0,
+    lucro REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, purpose, status)
+) WITHOUT ROWID;
+
+-- Licenças por dia de expiração ('' = sem expiração)
+CREATE TABLE IF NOT EXISTS stats_licencas (
+    dia_expira TEXT PRIMARY KEY,
+    qtd INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+-- Usuários por role
+CREATE TABLE IF NOT EXISTS stats_usuarios (
+    role TEXT PRIMARY KEY,
+    qtd INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+-- Contagem exata das licenças que expiram hoje (faixa do índice)
+CREATE INDEX IF NOT EXISTS idx_licenses_expires ON licenses(expires_at);
+
+-- -----------------------
+-- Backfill (recalcula do zero — idempotente)
+-- -----------------------
+DELETE FROM stats_transacoes;
+INSERT INTO stats_transacoes (dia, purpose, status, qtd, valor, fornecedor, lucro)
+SELECT COALESCE(strftime('%Y-%m-%d', created_at), ''), COALESCE(purpose, ''), COALESCE(status, ''),
+       COUNT(*), COALESCE(SUM(amount), 0), COALESCE(SUM(preco_fornecedor), 0), COALESCE(SUM(lucro), 0)
+FROM transactions
+GROUP BY 1, 2, 3;
+
+DELETE FROM stats_licencas;
+INSERT INTO stats_licencas (dia_expira, qtd)
+SELECT COALESCE(strftime('%Y-%m-%d', expires_at), ''), COUNT(*)
+FROM licenses
+GROUP BY 1;
+
+DELETE FROM stats_usuarios;
+INSERT INTO stats_usuarios (role, qtd)
+SELECT COALESCE(role, 'user'), COUNT(*)
+FROM users
+GROUP BY 1;
+
+-- -----------------------
+-- Triggers: transactions
+-- -----------------------
+CREATE TRIGGER IF NOT EXISTS trg_stats_tx_insert AFTER INSERT ON transactions
+BEGIN
+    INSERT INTO stats_transacoes (dia, purpose, status, qtd, valor, fornecedor, lucro)
+    VALUES (COALESCE(strftime('%Y-%m-%d', NEW.created_at), ''), COALESCE(NEW.purpose, ''), COALESCE(NEW.status, ''),
+            1, COALESCE(NEW.amount, 0), COALESCE(NEW.preco_fornecedor, 0), COALESCE(NEW.lucro, 0))
+    ON CONFLICT (dia, purpose, status) DO UPDATE SET
+        qtd = qtd + 1,
+        valor = valor + excluded.valor,
+        fornecedor = fornecedor + excluded.fornecedor,
+        lucro = lucro + excluded.lucro;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_tx_delete AFTER DELETE ON transactions
+BEGIN
+    UPDATE stats_transacoes SET
+        qtd = qtd - 1,
+        valor = valor - COALESCE(OLD.amount, 0),
+        fornecedor = fornecedor - COALESCE(OLD.preco_fornecedor, 0),
+        lucro = lucro - COALESCE(OLD.lucro, 0)
+    WHERE dia = COALESCE(strftime('%Y-%m-%d', OLD.created_at), '')
+      AND purpose = COALESCE(OLD.purpose, '')
+      AND status = COALESCE(OLD.status, '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_tx_update
+AFTER UPDATE OF status, purpose, amount, preco_fornecedor, lucro, created_at ON transactions
+BEGIN
+    UPDATE stats_transacoes SET
+        qtd = qtd - 1,
+        valor = valor - COALESCE(OLD.amount, 0),
+        fornecedor = fornecedor - COALESCE(OLD.preco_fornecedor, 0),
+        lucro = lucro - COALESCE(OLD.lucro, 0)
+    WHERE dia = COALESCE(strftime('%Y-%m-%d', OLD.created_at), '')
+      AND purpose = COALESCE(OLD.purpose, '')
+      AND status = COALESCE(OLD.status, '');
+
+    INSERT INTO stats_transacoes (dia, purpose, status, qtd, valor, fornecedor, lucro)
+    VALUES (COALESCE(strftime('%Y-%m-%d', NEW.created_at), ''), COALESCE(NEW.purpose, ''), COALESCE(NEW.status, ''),
+            1, COALESCE(NEW.amount, 0), COALESCE(NEW.preco_fornecedor, 0), COALESCE(NEW.lucro, 0))
+    ON CONFLICT (dia, purpose, status) DO UPDATE SET
+        qtd = qtd + 1,
+        valor = valor + excluded.valor,
+        fornecedor = fornecedor + excluded.fornecedor,
+        lucro = lucro + excluded.lucro;
+END;
+
+-- -----------------------
+-- Triggers: licenses
+-- -----------------------
+CREATE TRIGGER IF NOT EXISTS trg_stats_lic_insert AFTER INSERT ON licenses
+BEGIN
+    INSERT INTO stats_licencas (dia_expira, qtd)
+    VALUES (COALESCE(strftime('%Y-%m-%d', NEW.expires_at), ''), 1)
+    ON CONFLICT (dia_expira) DO UPDATE SET qtd = qtd + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_lic_delete AFTER DELETE ON licenses
+BEGIN
+    UPDATE stats_licencas SET qtd = qtd - 1
+    WHERE dia_expira = COALESCE(strftime('%Y-%m-%d', OLD.expires_at), '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_lic_update AFTER UPDATE OF expires_at ON licenses
+BEGIN
+    UPDATE stats_licencas SET qtd = qtd - 1
+    WHERE dia_expira = COALESCE(strftime('%Y-%m-%d', OLD.expires_at), '');
+
+    INSERT INTO stats_licencas (dia_expira, qtd)
+    VALUES (COALESCE(strftime('%Y-%m-%d', NEW.expires_at), ''), 1)
+    ON CONFLICT (dia_expira) DO UPDATE SET qtd = qtd + 1;
+END;
+
+-- -----------------------
+-- Triggers: users
+-- -----------------------
+CREATE TRIGGER IF NOT EXISTS trg_stats_users_insert AFTER INSERT ON users
+BEGIN
+    INSERT INTO stats_usuarios (role, qtd)
+    VALUES (COALESCE(NEW.role, 'user'), 1)
+    ON CONFLICT (role) DO UPDATE SET qtd = qtd + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_users_delete AFTER DELETE ON users
+BEGIN
+    UPDATE stats_usuarios SET qtd = qtd - 1 WHERE role = COALESCE(OLD.role, 'user');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stats_users_update AFTER UPDATE OF role ON users
+BEGIN
+    UPDATE stats_usuarios SET qtd = qtd - 1 WHERE role = COALESCE(OLD.role, 'user');
+
+    INSERT INTO stats_usuarios (role, qtd)
+    VALUES (COALESCE(NEW.role, 'user'), 1)
+    ON CONFLICT (role) DO UPDATE SET qtd = qtd + 1;
+END;
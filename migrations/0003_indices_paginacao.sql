@@ -0,0 +1,19 @@
+-- =======================
+-- 0003 — Índices para a paginação keyset das listagens do admin
+-- ORDER BY <coluna> DESC, id DESC: o índice em <coluna> já carrega o rowid (id).
+-- =======================
+
+CREATE TABLE IF NOT EXISTS balance_ledger (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    amount REAL,
+    reason TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_users_created ON users(created_at);
+CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(created_at);
+CREATE INDEX IF NOT EXISTS idx_balance_ledger_created ON balance_ledger(created_at);
+CREATE INDEX IF NOT EXISTS idx_tech_requests_criado ON tech_requests(criado_em);
+CREATE INDEX IF NOT EXISTS idx_users_balance ON users(balance);
+CREATE INDEX IF NOT EXISTS idx_transactions_purpose_created ON transactions(purpose, created_at);
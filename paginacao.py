@@ -0,0 +1,96 @@
+# paginacao.py — Paginação por cursor (keyset) para as listagens do admin
+#
+# Em vez de OFFSET (que relê todas as linhas anteriores), cada página começa
+# depois da última linha da anterior: WHERE (coluna, id) < (?, ?)
+# ORDER BY coluna DESC, id DESC LIMIT n. O custo de uma página não cresce
+# com o tamanho da tabela, desde que exista índice em (coluna, id).
+import base64
+import json
+import math
+
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 200
+
+
+def encode_cursor(valor, row_id) -> str:
+    """(valor da coluna de ordenação, id) → token opaco para a URL."""
+    bruto = json.dumps([valor, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(bruto).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """Token → (valor, id). Token ausente ou inválido → None (primeira página)."""
+    if not token:
+        return None
+    try:
+        bruto = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        valor, row_id = json.loads(bruto)
+        if valor is not None and not _parametro_sqlite(valor):
+            return None  # lista/objeto/inf/inteiro enorme: o SQLite não aceitaria
+        row_id = int(row_id)
+        if not _parametro_sqlite(row_id):
+            return None
+        return valor, row_id
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+def _parametro_sqlite(valor) -> bool:
+    """Escalar que o SQLite aceita como parâmetro (INTEGER de 64 bits, REAL finito, TEXT)."""
+    if isinstance(valor, str):
+        return True
+    if isinstance(valor, float):
+        return math.isfinite(valor)
+    if isinstance(valor, int):
+        return -2**63 <= valor < 2**63
+    return False
+
+
+def limite_pagina(valor, padrao: int = PAGE_SIZE_DEFAULT, maximo: int = PAGE_SIZE_MAX) -> int:
+    """Normaliza ?limit= para 1..maximo."""
+    try:
+        n = int(valor)
+    except (TypeError, ValueError):
+        return padrao
+    return max(1, min(n, maximo))
+
+
+def paginar(conn, select_sql: str, params=(), coluna: str = "created_at", id_col: str = "id",
+            where: str = None, cursor: str = None, limite: int = PAGE_SIZE_DEFAULT):
+    """
+    Executa `select_sql` (SELECT ... FROM ... [JOIN ...], sem WHERE/ORDER BY)
+    com paginação keyset em (coluna DESC, id_col DESC).
+    `where` é um filtro extra opcional (com `params`).
+    Retorna (linhas, proximo_cursor) — proximo_cursor é None na última página.
+
+    A coluna de ordenação precisa aparecer no SELECT como `_pg_valor` e o id
+    como `_pg_id` — o helper adiciona os dois automaticamente.
+    """
+    condicoes = [f"({where})"] if where else []
+    params = list(params)
+
+    posicao = decode_cursor(cursor)
+    if posicao is not None:
+        valor, row_id = posicao
+        if valor is None:
+            # Linhas com a coluna NULL vêm por último (DESC): segue só pelo id
+            condicoes.append(f"({coluna} IS NULL AND {id_col} < ?)")
+            params.append(row_id)
+        else:
+            condicoes.append(f"(({coluna}, {id_col}) < (?, ?) OR {coluna} IS NULL)")
+            params.extend([valor, row_id])
+
+    select_sql = select_sql.replace("SELECT", f"SELECT {coluna} AS _pg_valor, {id_col} AS _pg_id,", 1)
+    sql = select_sql
+    if condicoes:
+        sql += " WHERE " + " AND ".join(condicoes)
+    sql += f" ORDER BY {coluna} DESC, {id_col} DESC LIMIT ?"
+    params.append(limite + 1)
+
+    linhas = conn.execute(sql, params).fetchall()
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        ultima = linhas[-1]
+        proximo = encode_cursor(ultima["_pg_valor"], ultima["_pg_id"])
+    return linhas, proximo
@@ -0,0 +1,183 @@
+# perfil_sql.py — Profiler das queries SQL (slow-query log + orçamento por request)
+#
+# - toda execução é cronometrada pelo cursor do db_pool (execute + fetch*)
+# - acima de SQL_SLOW_MS a query vai para o logger "sql_lento" (texto
+#   normalizado, ms, linhas, request_id) — LOG_LEVELS="sql_lento=..." controla
+# - com rastreio ligado (app.debug ou SQL_PROFILE=1) cada request guarda a
+#   lista (sql normalizado, ms, linhas) e, no fim, compara o número de queries
+#   com o orçamento (SQL_QUERY_BUDGET, ou por endpoint em SQL_QUERY_BUDGETS
+#   "dashboard=6,painel_unlocks=10"); em debug estourar o orçamento vira warning
+import contextvars
+import logging
+import os
+import re
+import warnings
+from collections import Counter, deque
+from functools import lru_cache
+
+logger = logging.getLogger("sql_lento")
+
+SQL_SLOW_MS = float(os.getenv("SQL_SLOW_MS", "200"))           # 0 = sem slow-query log
+SQL_PROFILE = os.getenv("SQL_PROFILE", "0") == "1"              # rastreio também fora de debug
+SQL_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET", "15"))
+SQL_QUERY_BUDGETS = os.getenv("SQL_QUERY_BUDGETS", "")
+
+
+class OrcamentoQueriesExcedido(UserWarning):
+    """Request rodou mais queries do que o orçamento do endpoint (N+1?)."""
+
+
+# ===============================
+#  Normalização
+# ===============================
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_RE_LISTA_IN = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalizar(sql: str) -> str:
+    """Tira literais e espaços: queries iguais com valores diferentes viram o mesmo texto."""
+    sql = _RE_STRING.sub("?", sql)
+    sql = _RE_NUMERO.sub("?", sql)
+    sql = _RE_ESPACOS.sub(" ", sql).strip()
+    return _RE_LISTA_IN.sub("(?...)", sql)
+
+
+# ===============================
+#  Execuções
+# ===============================
+class Execucao:
+    """Uma execução: o cursor vai somando tempo e linhas à medida que faz fetch."""
+
+    __slots__ = ("sql", "segundos", "linhas", "_logada")
+
+    def __init__(self, sql: str, segundos: float, linhas: int):
+        self.sql = sql
+        self.segundos = segundos
+        self.linhas = max(0, linhas)
+        self._logada = False
+        self._verificar_lenta()
+
+    def somar(self, segundos: float, linhas: int = 0):
+        self.segundos += segundos
+        self.linhas += linhas
+        self._verificar_lenta()
+
+    @property
+    def normalizado(self) -> str:
+        return normalizar(self.sql)
+
+    @property
+    def ms(self) -> float:
+        return round(self.segundos * 1000, 2)
+
+    def _verificar_lenta(self):
+        if self._logada or not SQL_SLOW_MS or self.segundos * 1000 < SQL_SLOW_MS:
+            return
+        self._logada = True
+        item = {"sql": self.normalizado, "ms": self.ms, "rows": self.linhas}
+        _lentas.append(item)
+        logger.warning("🐢 Query lenta (%.1f ms, %d linhas): %s", item["ms"], self.linhas, item["sql"][:500],
+                       extra=item)
+
+
+_lentas = deque(maxlen=100)
+_rastreio_var: contextvars.ContextVar = contextvars.ContextVar("perfil_sql_rastreio", default=None)
+
+
+# Callbacks (sql, segundos) de todas as threads — usado pelo benchmark_funil para medir escritas
+_observadores = []
+
+
+def observar(callback):
+    _observadores.append(callback)
+
+
+def parar_de_observar(callback):
+    if callback in _observadores:
+        _observadores.remove(callback)
+
+
+def registrar(sql: str, segundos: float, linhas: int = 0) -> Execucao:
+    """Chamado pelo cursor depois de cada execute/executemany."""
+    execucao = Execucao(sql, segundos, linhas)
+    rastreio = _rastreio_var.get()
+    if rastreio is not None:
+        rastreio.append(execucao)
+    for callback in _observadores:
+        callback(sql, segundos)
+    return execucao
+
+
+def lentas_recentes() -> list:
+    """Últimas queries lentas (mais recente primeiro) — para o painel admin."""
+    return list(reversed(_lentas))
+
+
+# ===============================
+#  Rastreio por request
+# ===============================
+def iniciar_rastreio() -> list:
+    rastreio = []
+    _rastreio_var.set(rastreio)
+    return rastreio
+
+
+def rastreando() -> bool:
+    return _rastreio_var.get() is not None
+
+
+def finalizar_rastreio():
+    """Devolve a lista de execuções do request (ou None se não havia rastreio) e desliga."""
+    rastreio = _rastreio_var.get()
+    _rastreio_var.set(None)
+    return rastreio
+
+
+def _orcamentos(texto: str) -> dict:
+    orcamentos = {}
+    for par in (texto or "").split(","):
+        if "=" in par:
+            nome, valor = par.split("=", 1)
+            if valor.strip().isdigit():
+                orcamentos[nome.strip()] = int(valor)
+    return orcamentos
+
+
+_ORCAMENTOS = _orcamentos(SQL_QUERY_BUDGETS)
+
+
+def orcamento(endpoint: str) -> int:
+    return _ORCAMENTOS.get(endpoint, SQL_QUERY_BUDGET)
+
+
+def resumo(rastreio) -> dict:
+    """Totais do request + as queries mais repetidas (normalizadas)."""
+    repetidas = Counter(e.normalizado for e in rastreio)
+    return {
+        "queries": len(rastreio),
+        "ms": round(sum(e.segundos for e in rastreio) * 1000, 2),
+        "linhas": sum(e.linhas for e in rastreio),
+        "repetidas": [(sql, n) for sql, n in repetidas.most_common(3) if n > 1],
+    }
+
+
+def verificar_orcamento(endpoint: str, rastreio, avisar: bool = False) -> bool:
+    """
+    True se o request ficou dentro do orçamento. Estourou → log; com avisar=True
+    (modo debug) também warnings.warn(OrcamentoQueriesExcedido).
+    """
+    limite = orcamento(endpoint)
+    if rastreio is None or len(rastreio) <= limite:
+        return True
+    dados = resumo(rastreio)
+    mais_repetida = f" — mais repetida ({dados['repetidas'][0][1]}x): {dados['repetidas'][0][0][:200]}" \
+        if dados["repetidas"] else ""
+    mensagem = f"{endpoint} rodou {dados['queries']} queries (orçamento {limite}){mais_repetida}"
+    logging.getLogger(__name__).warning(mensagem, extra={"endpoint": endpoint, "queries": dados["queries"],
+                                                        "budget": limite, "sql_ms": dados["ms"]})
+    if avisar:
+        warnings.warn(mensagem, OrcamentoQueriesExcedido, stacklevel=2)
+    return False
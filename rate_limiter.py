@@ -0,0 +1,135 @@
+# rate_limiter.py — Limitador de tentativas em memória (janela deslizante)
+#
+# Substitui a contagem por SQL (INSERT em login_attempts + COUNT(*) a cada
+# falha): os contadores vivem na memória do processo e só a DECISÃO de
+# bloqueio vai para o banco (blocked_users), onde todos os workers a veem.
+#
+# Cada chave guarda no máximo `limite` timestamps — memória limitada por
+# chave — e o total de chaves é limitado por LRU (max_chaves).
+#
+# Os contadores são por processo: com N workers do gunicorn, um atacante
+# pode fazer até N × limite tentativas antes do bloqueio persistido valer
+# para todos. O bloqueio em si é global.
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class SlidingWindowLimiter:
+    """Conta eventos por chave numa janela deslizante de `janela` segundos."""
+
+    def __init__(self, limite: int, janela: float, max_chaves: int = 100_000, relogio=time.monotonic):
+        self.limite = limite
+        self.janela = janela
+        self.max_chaves = max_chaves
+        self.relogio = relogio
+        self._eventos = OrderedDict()   # chave → deque de timestamps (mais antigo à esquerda)
+        self._lock = threading.Lock()
+
+    def _podar(self, fila: deque, agora: float):
+        inicio = agora - self.janela
+        while fila and fila[0] <= inicio:
+            fila.popleft()
+
+    def registrar(self, chave: str) -> int:
+        """Registra um evento para `chave` e retorna quantos há na janela (no máx. `limite`)."""
+        agora = self.relogio()
+        with self._lock:
+            fila = self._eventos.get(chave)
+            if fila is None:
+                fila = self._eventos[chave] = deque(maxlen=self.limite)
+                if len(self._eventos) > self.max_chaves:
+                    self._eventos.popitem(last=False)
+            else:
+                self._eventos.move_to_end(chave)
+            self._podar(fila, agora)
+            fila.append(agora)
+            return len(fila)
+
+    def contagem(self, chave: str) -> int:
+        agora = self.relogio()
+        with self._lock:
+            fila = self._eventos.get(chave)
+            if not fila:
+                return 0
+            self._podar(fila, agora)
+            return len(fila)
+
+    def excedido(self, chave: str) -> bool:
+        return self.contagem(chave) >= self.limite
+
+    def limpar(self, chave: str):
+        with self._lock:
+            self._eventos.pop(chave, None)
+
+    def __len__(self):
+        return len(self._eventos)
+
+
+class LoginLimiter:
+    """
+    Falhas de login por e-mail e por IP (basta um dos dois estourar).
+    `persistir_bloqueio(email, ip, ate)` grava a decisão; os bloqueios
+    ativos ficam também num cache local para não regravar a cada tentativa.
+    """
+
+    def __init__(self, max_falhas: int, janela_minutos: float, bloqueio_minutos: float,
+                 persistir_bloqueio=None, relogio=time.time):
+        self.falhas = SlidingWindowLimiter(max_falhas, janela_minutos * 60, relogio=relogio)
+        self.bloqueio_segundos = bloqueio_minutos * 60
+        self.persistir_bloqueio = persistir_bloqueio
+        self.relogio = relogio
+        self._bloqueios = {}            # chave → epoch até quando está bloqueada
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _chaves(email: str, ip: str) -> list:
+        chaves = []
+        if email:
+            chaves.append(f"email:{email.lower()}")
+        if ip:
+            chaves.append(f"ip:{ip}")
+        return chaves
+
+    def falhas_recentes(self, email: str, ip: str) -> int:
+        return max((self.falhas.contagem(k) for k in self._chaves(email, ip)), default=0)
+
+    def bloqueado_localmente(self, email: str, ip: str) -> bool:
+        agora = self.relogio()
+        with self._lock:
+            return any(self._bloqueios.get(k, 0) > agora for k in self._chaves(email, ip))
+
+    def bloquear(self, email: str, ip: str) -> bool:
+        """Bloqueia email+IP. Retorna False se já estava bloqueado (nada é gravado)."""
+        if self.bloqueado_localmente(email, ip):
+            return False
+        ate = self.relogio() + self.bloqueio_segundos
+        with self._lock:
+            for k in self._chaves(email, ip):
+                self._bloqueios[k] = ate
+            # Limpa bloqueios vencidos (o dicionário só cresce com ataques)
+            agora = self.relogio()
+            for k in [k for k, v in self._bloqueios.items() if v <= agora]:
+                del self._bloqueios[k]
+        if self.persistir_bloqueio:
+            self.persistir_bloqueio(email, ip, ate)
+        return True
+
+    def registrar_falha(self, email: str, ip: str) -> bool:
+        """Conta uma falha. Retorna True se esta falha disparou um bloqueio novo."""
+        total = max((self.falhas.registrar(k) for k in self._chaves(email, ip)), default=0)
+        if total >= self.falhas.limite:
+            return self.bloquear(email, ip)
+        return False
+
+    def registrar_sucesso(self, email: str, ip: str):
+        """Login bem-sucedido zera as falhas do e-mail (as do IP continuam contando)."""
+        if email:
+            self.falhas.limpar(f"email:{email.lower()}")
+
+    def desbloquear(self, email: str = None, ip: str = None):
+        with self._lock:
+            for k in self._chaves(email, ip):
+                self._bloqueios.pop(k, None)
+        for k in self._chaves(email, ip):
+            self.falhas.limpar(k)
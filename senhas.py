@@ -0,0 +1,86 @@
+# senhas.py — Hash e verificação de senhas (bcrypt) num pool de threads limitado
+#
+# - bcrypt libera o GIL: N threads usam N núcleos sem travar o worker web
+# - fila limitada (BCRYPT_MAX_PENDING): acima disso falha na hora com
+#   SobrecargaSenhas em vez de empilhar logins e estourar o timeout
+# - custo configurável (BCRYPT_ROUNDS) + precisa_rehash() para regravar
+#   o hash no próximo login quando o custo mudar
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeout
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_POOL_WORKERS = int(os.getenv("BCRYPT_POOL_WORKERS", str(os.cpu_count() or 2)))
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", str(BCRYPT_POOL_WORKERS * 4)))
+BCRYPT_TIMEOUT = float(os.getenv("BCRYPT_TIMEOUT", "10"))
+
+_RE_CUSTO = re.compile(r"^\$2[abxy]?\$(\d{2})\$")
+
+
+class SobrecargaSenhas(Exception):
+    """Pool de hash cheio (ou lento demais): o chamador deve responder 503 / tentar depois."""
+
+
+_pool = ThreadPoolExecutor(max_workers=BCRYPT_POOL_WORKERS, thread_name_prefix="tlux-bcrypt")
+_vagas = threading.BoundedSemaphore(BCRYPT_MAX_PENDING)
+
+
+def _bytes(valor) -> bytes:
+    return valor if isinstance(valor, bytes) else str(valor).encode("utf-8")
+
+
+def _executar(funcao, *args):
+    if not _vagas.acquire(blocking=False):
+        raise SobrecargaSenhas("fila de hash cheia")
+    try:
+        futuro = _pool.submit(funcao, *args)
+    except Exception:
+        _vagas.release()
+        raise
+    futuro.add_done_callback(lambda _f: _vagas.release())
+    try:
+        return futuro.result(timeout=BCRYPT_TIMEOUT)
+    except FuturoTimeout as e:
+        raise SobrecargaSenhas("hash demorou demais") from e
+
+
+def hash_senha(senha, rounds: int = None) -> str:
+    """Gera o hash bcrypt (str) com o custo configurado."""
+    salt = bcrypt.gensalt(rounds or BCRYPT_ROUNDS)
+    return _executar(bcrypt.hashpw, _bytes(senha), salt).decode("utf-8")
+
+
+def verificar_senha(senha, hash_armazenado) -> bool:
+    """Compara a senha com o hash guardado. Hash vazio/inválido → False."""
+    if not hash_armazenado:
+        return False
+    try:
+        return _executar(bcrypt.checkpw, _bytes(senha), _bytes(hash_armazenado))
+    except ValueError:
+        # "Invalid salt": hash corrompido ou não-bcrypt
+        return False
+
+
+def custo(hash_armazenado) -> int:
+    """Custo (rounds) de um hash bcrypt; 0 se não for reconhecido."""
+    if isinstance(hash_armazenado, bytes):
+        hash_armazenado = hash_armazenado.decode("utf-8", "replace")
+    m = _RE_CUSTO.match(hash_armazenado or "")
+    return int(m.group(1)) if m else 0
+
+
+def precisa_rehash(hash_armazenado, rounds: int = None) -> bool:
+    """True se o hash foi gerado com custo diferente do configurado."""
+    return custo(hash_armazenado) != (rounds or BCRYPT_ROUNDS)
+
+
+def estatisticas() -> dict:
+    return {
+        "rounds": BCRYPT_ROUNDS,
+        "workers": BCRYPT_POOL_WORKERS,
+        "max_pending": BCRYPT_MAX_PENDING,
+        "pendentes": BCRYPT_MAX_PENDING - _vagas._value,
+    }
@@ -0,0 +1,138 @@
+# stripe_eventos.py — Ledger de eventos do webhook Stripe (idempotência + entrega adiada)
+#
+# Uso típico:
+#   ledger = LedgerStripe(DB_FILE)
+#   ledger.registrar(event["id"], event["type"], payload)   # no webhook → 200 na hora
+#   ledger.iniciar(handler, contexto=app.app_context)        # worker drena em ordem
+#
+# - os eventos são jobs da JobQueue (kind "stripe_event", idempotency_key =
+#   event_id): lease, renovação, backoff e JobFatal são os mesmos da fila
+# - o retry do Stripe com o mesmo evento não é gravado de novo e, portanto,
+#   nunca roda a entrega (licença / ordem de desbloqueio) duas vezes
+# - o webhook só responde 200 depois do INSERT commitado (evento durável)
+# - um único worker processa os eventos prontos na ordem de chegada;
+#   falha temporária volta com backoff sem travar os eventos seguintes,
+#   JobFatal (ou tentativas esgotadas) marca 'failed'
+import json
+import logging
+import os
+import socket
+import threading
+
+from job_queue import JobQueue
+
+logger = logging.getLogger(__name__)
+
+STRIPE_EVENT_MAX_ATTEMPTS = int(os.getenv("STRIPE_EVENT_MAX_ATTEMPTS", "8"))
+JOB_STRIPE_EVENT = "stripe_event"
+
+
+class LedgerStripe:
+    def __init__(self, db_path: str, max_attempts: int = STRIPE_EVENT_MAX_ATTEMPTS, fila: JobQueue = None):
+        self.fila = fila or JobQueue(db_path)
+        self.max_attempts = max_attempts
+        self._migrado = False
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def garantir_tabela(self):
+        self.fila.garantir_tabela()
+        if not self._migrado:
+            self._migrar_tabela_antiga()
+            self._migrado = True
+
+    def _migrar_tabela_antiga(self, antiga: str = "stripe_eventos"):
+        """Traz para a fila os eventos da tabela própria das versões anteriores (uma vez)."""
+        conn = self.fila._connect()
+        existe = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (antiga,)).fetchone()
+        if not existe:
+            return
+        try:
+            # Eventos já entregues também vêm: o event_id continua bloqueando o retry do Stripe
+            conn.execute(f"""
+                INSERT OR IGNORE INTO {self.fila.table}
+                    (kind, idempotency_key, payload, status, attempts, max_attempts, run_at, last_error)
+                SELECT ?, event_id, payload,
+                       CASE WHEN status='running' THEN 'queued' ELSE status END,
+                       attempts, ?, run_at, last_error
+                FROM {antiga} ORDER BY id
+            """, (JOB_STRIPE_EVENT, self.max_attempts))
+            conn.execute(f"ALTER TABLE {antiga} RENAME TO {antiga}_migrado")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info("Ledger Stripe: eventos de %s movidos para a fila %s", antiga, self.fila.table)
+
+    # ===============================
+    #  Webhook
+    # ===============================
+    def registrar(self, event_id: str, tipo: str, payload: str) -> bool:
+        """
+        Grava o evento (commit antes de retornar).
+        Retorna False se o event_id já estava no ledger (retry do Stripe).
+        """
+        self.garantir_tabela()
+        novo = self.fila.enfileirar(JOB_STRIPE_EVENT, json.loads(payload), idempotency_key=event_id,
+                                    max_attempts=self.max_attempts)
+        conn = self.fila._connect()
+        if conn.in_transaction:
+            conn.commit()  # o Stripe só recebe 200 com o evento gravado
+        if novo:
+            self._acordar.set()
+        return novo
+
+    # ===============================
+    #  Worker
+    # ===============================
+    def _falhou(self, evento: dict, erro):
+        logger.error("Evento Stripe %s (%s) falhou de vez: %s", evento.get("id"), evento.get("type"), erro,
+                     extra={"event_id": evento.get("id")})
+
+    def processar(self, handler, limite: int = 10, worker: str = "stripe") -> int:
+        """
+        Executa `handler(evento)` para os eventos prontos, em ordem.
+        Exceção → nova tentativa com backoff; JobFatal → 'failed' direto.
+        """
+        self.garantir_tabela()
+        return self.fila.processar(JOB_STRIPE_EVENT, handler, worker, limite=limite, on_failure=self._falhou)
+
+    def contagem(self) -> dict:
+        """Quantidade de eventos por status (para o painel admin)."""
+        self.garantir_tabela()
+        return self.fila.contagem(JOB_STRIPE_EVENT)
+
+    def iniciar(self, handler, contexto=None, intervalo: float = 2.0, limite: int = 10):
+        """Sobe o worker (thread daemon única, para preservar a ordem dentro do processo)."""
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        self.garantir_tabela()
+        self._parar.clear()
+        worker = f"{socket.gethostname()}:{os.getpid()}:{JOB_STRIPE_EVENT}"
+
+        def loop():
+            while not self._parar.is_set():
+                try:
+                    if contexto:
+                        with contexto():
+                            feitos = self.processar(handler, limite, worker)
+                    else:
+                        feitos = self.processar(handler, limite, worker)
+                except Exception:
+                    logger.exception("Erro no worker de eventos Stripe")
+                    feitos = 0
+                if not feitos:
+                    self._acordar.wait(intervalo)
+                    self._acordar.clear()
+
+        self._thread = threading.Thread(target=loop, name="tlux-stripe-eventos", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def parar(self, timeout: float = 5.0):
+        self._parar.set()
+        self._acordar.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
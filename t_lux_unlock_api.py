@@ -3,7 +3,7 @@
 # ============================================
 
 import os
-import requests
+import http_client
 import xml.etree.ElementTree as ET
 from datetime import datetime
 
@@ -45,11 +45,11 @@ class DhruClient:
         }
 
         try:
-            resp = requests.post(
+            resp = http_client.post(
                 self.url,
                 data={"xml": xml_data},
                 headers=headers,
-                timeout=30,
+                action=action,
                 verify=False
             )
             resp.raise_for_status()
@@ -0,0 +1,277 @@
+# tabela_precos.py — Livro de preços compilado (modelos de iPhone e pacotes)
+#
+# Tudo que antes vivia em dicts soltos no app.py (preço com/sem sinal, custo
+# iRemoval, SERVICEID, pacotes) vira um LivroPrecos imutável, montado uma vez:
+#   - chave = nome exato do modelo, como no merge antigo ("iPhone Xr" com sinal
+#     e "iPhone XR" sem sinal continuam distintos); o nome normalizado só é
+#     usado quando não é ambíguo ("iPhone SE (2ª Geração)" acha "(2nd gen)")
+#   - cada ItemPreco já traz preço, custo, margem, service_id e o preço em
+#     todas as moedas de EXCHANGE_RATES (sem conta por request)
+#   - pacotes indexados por nome (nada de next(...) na lista)
+#
+# TabelaPrecos segura o livro atual e o troca (atomicamente) quando o arquivo
+# PRICEBOOK_FILE muda — preço novo sem reiniciar o processo. Chaves ausentes
+# no arquivo usam os valores padrão do código.
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+PRICEBOOK_CHECK_SECONDS = float(os.getenv("PRICEBOOK_CHECK_SECONDS", "10"))
+
+# Chaves aceitas no arquivo (e em `padrao`)
+CHAVES = ("sinal", "sem_sinal", "custo_sinal", "custo_sem_sinal", "unlock", "service_ids", "pacotes")
+
+_RE_GERACAO = re.compile(r"\(\s*(\d)\s*(?:ª|º|st|nd|rd|th)?\s*(?:gera[çc][ãa]o|generation|gen)\s*\)")
+_ORDINAL = {"1": "1st", "2": "2nd", "3": "3rd"}
+
+
+def normalizar_modelo(nome: str) -> str:
+    """'iPhone SE (2ª Geração)' → 'iphone se (2nd gen)'; 'iPhone 6S+' → 'iphone 6s plus'."""
+    s = " ".join(str(nome or "").casefold().split())
+    s = _RE_GERACAO.sub(lambda m: f"({_ORDINAL.get(m.group(1), m.group(1) + 'th')} gen)", s)
+    s = re.sub(r"\s*\+$", " plus", s)
+    if s == "iphone se":
+        s = "iphone se (1st gen)"
+    return s
+
+
+def _variantes_service_id(nome: str) -> list:
+    """'iPhone 6/6+' → ['iPhone 6', 'iPhone 6+']; 'iPhone SE/6S/6S+' → SE, 6S, 6S+."""
+    partes = nome.split("/")
+    if len(partes) == 1:
+        return partes
+    prefixo = partes[0].rsplit(" ", 1)[0]
+    return [partes[0]] + [f"{prefixo} {p.strip()}" for p in partes[1:]]
+
+
+class _Indice:
+    """
+    Dict por nome exato que também aceita o nome normalizado — só quando ele não
+    é ambíguo ("iPhone SE (2ª Geração)" acha "(2nd Gen)", mas "iPhone xr" não
+    escolhe entre "iPhone Xr" e "iPhone XR").
+    """
+    __slots__ = ("_exato", "_normalizado")
+
+    def __init__(self, itens: dict):
+        self._exato = MappingProxyType(dict(itens))
+        normalizado = {}
+        for nome in self._exato:
+            chave = normalizar_modelo(nome)
+            normalizado[chave] = None if chave in normalizado else nome
+        self._normalizado = MappingProxyType(normalizado)
+
+    def ambiguo(self, nome: str) -> bool:
+        chave = normalizar_modelo(nome)
+        return chave in self._normalizado and self._normalizado[chave] is None
+
+    def get(self, nome: str, padrao=None, ambiguo: bool = False):
+        """`ambiguo=True`: o nome colide em outra tabela, então só vale o nome exato."""
+        if nome in self._exato:
+            return self._exato[nome]
+        exato = None if ambiguo else self._normalizado.get(normalizar_modelo(nome))
+        return self._exato[exato] if exato is not None else padrao
+
+    def items(self):
+        return self._exato.items()
+
+    def values(self):
+        return self._exato.values()
+
+    def __len__(self):
+        return len(self._exato)
+
+
+class ItemPreco:
+    """Uma linha do livro (imutável depois de montada)."""
+    __slots__ = ("modelo", "chave", "preco_usd", "custo_usd", "margem_usd", "margem_pct",
+                 "service_id", "locais")
+
+    def __init__(self, modelo: str, preco_usd: float, custo_usd, service_id, taxas: dict):
+        self.modelo = modelo
+        self.chave = normalizar_modelo(modelo)
+        self.preco_usd = float(preco_usd)
+        self.custo_usd = float(custo_usd) if custo_usd is not None else None
+        custo = self.custo_usd or 0.0
+        self.margem_usd = round(self.preco_usd - custo, 2)
+        self.margem_pct = round(100.0 * self.margem_usd / self.preco_usd, 2) if self.preco_usd else 0.0
+        self.service_id = service_id
+        self.locais = MappingProxyType({moeda: round(self.preco_usd * taxa, 2) for moeda, taxa in taxas.items()})
+
+    def preco_local(self, moeda: str):
+        return self.locais.get((moeda or "USD").upper())
+
+    def __repr__(self):
+        return f"ItemPreco({self.modelo!r}, {self.preco_usd}, custo={self.custo_usd}, service_id={self.service_id})"
+
+
+class LivroPrecos:
+    """
+    Livro de preços imutável.
+      preco(modelo)                 → ItemPreco do checkout (tabela unificada)
+      preco(modelo, sem_sinal=True) → ItemPreco da tabela SEM SINAL
+      service_id(modelo), pacote(nome)
+    """
+
+    def __init__(self, fonte: dict, taxas: dict, versao: int = 1):
+        self.versao = versao
+        taxas = {moeda.upper(): float(taxa) for moeda, taxa in taxas.items() if taxa}
+        self.taxas = MappingProxyType(taxas)
+        self.moedas = tuple(sorted(taxas))
+        self._por_moeda = {}
+
+        service_ids = {}
+        for nome, sid in (fonte.get("service_ids") or {}).items():
+            for variante in _variantes_service_id(nome):
+                service_ids[normalizar_modelo(variante)] = int(sid)
+        self._service_ids = MappingProxyType(service_ids)
+
+        custo_sinal = _Indice(fonte.get("custo_sinal") or {})
+        custo_sem_sinal = _Indice(fonte.get("custo_sem_sinal") or {})
+
+        def item(modelo, preco, custo):
+            return ItemPreco(modelo, preco, custo, service_ids.get(normalizar_modelo(modelo)), taxas)
+
+        # Sem sinal: custo vem da tabela do fornecedor SEM SINAL (pode faltar → None)
+        sem_sinal = _Indice(fonte.get("sem_sinal") or {})
+        sem_sinal = _Indice({modelo: item(modelo, preco, custo_sem_sinal.get(modelo, ambiguo=sem_sinal.ambiguo(modelo)))
+                             for modelo, preco in sem_sinal.items()})
+
+        # Checkout (unificada): com sinal, sobrescrita pela sem sinal e depois por `unlock`,
+        # com o custo iRemoval padrão — a mesma precedência do merge antigo. A chave é o
+        # nome exato: "iPhone Xr" (com sinal) e "iPhone XR" (sem sinal) são itens distintos.
+        precos = {}
+        for tabela in ("sinal", "sem_sinal", "unlock"):
+            precos.update(fonte.get(tabela) or {})
+        unificada = _Indice(precos)
+        unificada = _Indice({modelo: item(modelo, preco, custo_sinal.get(modelo, 0.0, ambiguo=unificada.ambiguo(modelo)))
+                             for modelo, preco in unificada.items()})
+
+        self._sem_sinal = sem_sinal
+        self._unificada = unificada
+
+        # Para os templates (nome de exibição → preço USD), na ordem original
+        self.tabela_sinal = MappingProxyType(dict(fonte.get("sinal") or {}))
+        self.tabela_sem_sinal = MappingProxyType(dict(fonte.get("sem_sinal") or {}))
+        self.modelos = MappingProxyType(dict(sorted((it.modelo, it.preco_usd) for it in unificada.values())))
+
+        # Hash do conteúdo (preços + taxas): igual em todos os workers e após reinício,
+        # ao contrário de `versao`, que é um contador do processo
+        conteudo = json.dumps([sorted(self.modelos.items()), sorted(taxas.items())], separators=(",", ":"))
+        self.assinatura = hashlib.sha1(conteudo.encode("utf-8")).hexdigest()[:16]
+
+        pacotes = tuple(MappingProxyType(dict(p)) for p in (fonte.get("pacotes") or []))
+        self.pacotes = pacotes
+        self._pacotes = MappingProxyType({p["nome"].casefold(): p for p in pacotes})
+
+    def preco(self, modelo: str, sem_sinal: bool = False):
+        tabela = self._sem_sinal if sem_sinal else self._unificada
+        return tabela.get(modelo)
+
+    def service_id(self, modelo: str):
+        return self._service_ids.get(normalizar_modelo(modelo))
+
+    def pacote(self, nome: str):
+        return self._pacotes.get((nome or "").casefold())
+
+    def itens(self):
+        return self._unificada.values()
+
+    def precos_em(self, moeda: str):
+        """{modelo: preço em `moeda`} do checkout, a partir de ItemPreco.locais. KeyError se a moeda não existe."""
+        moeda = (moeda or "USD").upper()
+        precos = self._por_moeda.get(moeda)
+        if precos is None:
+            if moeda not in self.taxas:
+                raise KeyError(moeda)
+            precos = self._por_moeda[moeda] = MappingProxyType(
+                {it.modelo: it.locais[moeda] for it in self._unificada.values()})
+        return precos
+
+    def __len__(self):
+        return len(self._unificada)
+
+
+# Arquivo ilegível, JSON inválido ou com tipos errados (preço null, pacote sem nome...)
+_ERROS_ARQUIVO = (OSError, ValueError, TypeError, KeyError, AttributeError)
+
+
+class TabelaPrecos:
+    """
+    Livro atual + recarga a quente. `padrao` tem as chaves de CHAVES; o arquivo
+    JSON `arquivo` (opcional) sobrescreve chave por chave. O arquivo é conferido
+    (mtime) no máximo a cada `intervalo` segundos; JSON inválido mantém o livro atual.
+    """
+
+    def __init__(self, padrao: dict, taxas: dict, arquivo: str = None,
+                 intervalo: float = PRICEBOOK_CHECK_SECONDS):
+        self.padrao = dict(padrao)
+        self.taxas = dict(taxas)
+        self.arquivo = arquivo
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._conferido_em = time.monotonic()
+        try:
+            self._livro = LivroPrecos(self._fonte(), self.taxas, versao=1)
+        except _ERROS_ARQUIVO as e:
+            logger.error("Livro de preços: %s inválido, usando os preços padrão: %s", self.arquivo, e)
+            self._livro = LivroPrecos(dict(self.padrao), self.taxas, versao=1)
+
+    def _fonte(self) -> dict:
+        fonte = dict(self.padrao)
+        if not self.arquivo or not os.path.exists(self.arquivo):
+            self._mtime = None
+            return fonte
+        self._mtime = os.path.getmtime(self.arquivo)
+        with open(self.arquivo, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        if not isinstance(dados, dict):
+            raise ValueError(f"esperado um objeto JSON, veio {type(dados).__name__}")
+        desconhecidas = set(dados) - set(CHAVES)
+        if desconhecidas:
+            logger.warning("Chaves ignoradas em %s: %s", self.arquivo, sorted(desconhecidas))
+        fonte.update({k: v for k, v in dados.items() if k in CHAVES})
+        return fonte
+
+    def atual(self) -> LivroPrecos:
+        if time.monotonic() - self._conferido_em >= self.intervalo:
+            self._conferir()
+        return self._livro
+
+    def _conferir(self):
+        with self._lock:
+            if time.monotonic() - self._conferido_em < self.intervalo:
+                return
+            self._conferido_em = time.monotonic()
+            try:
+                mtime = os.path.getmtime(self.arquivo) if self.arquivo and os.path.exists(self.arquivo) else None
+            except OSError:
+                return
+            if mtime != self._mtime:
+                self._recarregar()
+
+    def _recarregar(self):
+        try:
+            livro = LivroPrecos(self._fonte(), self.taxas, versao=self._livro.versao + 1)
+        except _ERROS_ARQUIVO as e:
+            logger.error("Livro de preços não recarregado (%s): %s", self.arquivo, e)
+            return
+        self._livro = livro
+        logger.info("Livro de preços v%s carregado (%s modelos)", livro.versao, len(livro),
+                    extra={"versao": livro.versao})
+
+    def recarregar(self, taxas: dict = None) -> LivroPrecos:
+        """Remonta agora (ex.: novas taxas de câmbio)."""
+        with self._lock:
+            if taxas is not None:
+                self.taxas = dict(taxas)
+            self._recarregar()
+            self._conferido_em = time.monotonic()
+        return self._livro
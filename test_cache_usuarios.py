@@ -0,0 +1,72 @@
+# test_cache_usuarios.py — current_user: cache por request (g) e entre requests (TTL)
+import pytest
+
+import db_pool
+
+
+def _cliente(app_tlux, user_id, is_admin=False):
+    cliente = app_tlux.app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao.update(user_id=user_id, email_verified=True, is_admin=is_admin)
+    return cliente
+
+
+def _vai_para(resposta, rota: str) -> bool:
+    return resposta.status_code == 302 and resposta.headers["Location"].endswith(rota)
+
+
+@pytest.fixture
+def admin(app_tlux, novo_usuario):
+    return _cliente(app_tlux, novo_usuario(is_admin=1, role="admin"), is_admin=True)
+
+
+def test_bloqueio_vale_no_proximo_request(app_tlux, novo_usuario, admin):
+    alvo = novo_usuario(role="user")
+    cliente = _cliente(app_tlux, alvo)
+    assert not _vai_para(cliente.get("/dashboard"), "/login")  # usuário agora no cache
+
+    assert admin.post(f"/admin/users/{alvo}/block").status_code == 302
+    assert _vai_para(cliente.get("/dashboard"), "/login")
+
+
+def test_troca_de_papel_vale_no_proximo_request(app_tlux, novo_usuario, admin):
+    alvo = novo_usuario(role="user")
+    cliente = _cliente(app_tlux, alvo)
+    assert _vai_para(cliente.get("/metrics"), "/dashboard")
+
+    admin.post(f"/admin/users/{alvo}/role", data={"role": "admin"})
+    assert not _vai_para(cliente.get("/metrics"), "/dashboard")
+
+    admin.post(f"/admin/users/{alvo}/role", data={"role": "user"})
+    assert _vai_para(cliente.get("/metrics"), "/dashboard")
+
+
+def test_uma_consulta_de_usuario_por_request(app_tlux, novo_usuario, monkeypatch):
+    monkeypatch.setattr(app_tlux, "USER_CACHE_TTL", 0)  # só o cache do request
+    cliente = _cliente(app_tlux, novo_usuario(role="user"))
+    consultas = []
+    conn = db_pool.get_connection()
+    conn.set_trace_callback(lambda sql: consultas.append(sql) if "FROM users WHERE id" in sql else None)
+    try:
+        # hard_guards, a view e inject_user (template) pedem o usuário; o segundo
+        # request consulta de novo (o `g` do import não vira cache sem TTL)
+        for _ in range(2):
+            consultas.clear()
+            assert cliente.get("/choose-package").status_code == 200
+            assert len(consultas) == 1
+    finally:
+        conn.set_trace_callback(None)
+
+
+def test_cache_entre_requests_evita_a_consulta(app_tlux, novo_usuario, monkeypatch):
+    monkeypatch.setattr(app_tlux, "USER_CACHE_TTL", 60)
+    cliente = _cliente(app_tlux, novo_usuario(role="user"))
+    cliente.get("/choose-package")
+    consultas = []
+    conn = db_pool.get_connection()
+    conn.set_trace_callback(lambda sql: consultas.append(sql) if "FROM users WHERE id" in sql else None)
+    try:
+        assert cliente.get("/choose-package").status_code == 200
+    finally:
+        conn.set_trace_callback(None)
+    assert consultas == []
@@ -0,0 +1,76 @@
+# test_cambio.py — Taxas de câmbio: fonte plugável, histórico e conversão em lote
+import json
+
+import pytest
+
+import cambio
+
+PADRAO = {"USD": 1.0, "MZN": 63.0, "EUR": 0.92}
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    caminho = tmp_path / "taxas.json"
+    caminho.write_text(json.dumps({"base": "USD", "rates": PADRAO}), encoding="utf-8")
+    return caminho
+
+
+def _servico(tmp_path, arquivo, intervalo=0):
+    return cambio.ServicoCambio(str(tmp_path / "cambio.db"), cambio.FonteArquivo(str(arquivo)),
+                                padrao=PADRAO, intervalo=intervalo)
+
+
+def test_fonte_de_config():
+    assert isinstance(cambio.fonte_de_config("", PADRAO), cambio.FonteFixa)
+    assert isinstance(cambio.fonte_de_config("https://open.er-api.com/v6/latest/USD", PADRAO), cambio.FonteHTTP)
+    assert cambio.fonte_de_config("file:/tmp/taxas.json", PADRAO).caminho == "/tmp/taxas.json"
+    assert cambio.validar({"mzn": "64.5", "EUR": 0, "XXXX": 1, "BRL": None}) == {"MZN": 64.5, "USD": 1.0}
+
+
+def test_atualiza_grava_historico_e_avisa(tmp_path, arquivo):
+    servico = _servico(tmp_path, arquivo)
+    avisos = []
+    servico.ao_atualizar(lambda taxas: avisos.append(taxas["MZN"]))
+
+    assert servico.atualizar() is False  # primeiro lote = padrão: nada muda em uso
+    versao = servico.versao
+
+    arquivo.write_text(json.dumps({"rates": {"MZN": 64.0}}), encoding="utf-8")
+    assert servico.atualizar() is True
+    assert servico.versao == versao + 1 and avisos == [64.0]
+    assert servico.taxa("eur") == 0.92  # moeda ausente na fonte mantém a taxa anterior
+    assert [t for _, t in servico.historico("MZN")] == [64.0, 63.0]
+
+    # Mesmas taxas: não grava lote novo nem muda a versão
+    assert servico.atualizar() is False
+    assert len(servico.historico("MZN")) == 2 and servico.versao == versao + 1
+
+
+def test_arranque_adota_o_ultimo_lote(tmp_path, arquivo):
+    _servico(tmp_path, arquivo).atualizar()
+    arquivo.write_text(json.dumps({"rates": {"MZN": 65.0}}), encoding="utf-8")
+    _servico(tmp_path, arquivo).atualizar()
+
+    # Outro processo: carrega do banco e, dentro do intervalo, não consulta a fonte
+    arquivo.write_text("{", encoding="utf-8")
+    outro = _servico(tmp_path, arquivo, intervalo=3600)
+    assert outro.carregar() is True and outro.taxa("MZN") == 65.0
+    assert outro.atualizar() is False
+
+
+def test_conversao_em_lote(tmp_path, arquivo):
+    servico = _servico(tmp_path, arquivo)
+    assert servico.converter([10.0, 1.5], "MZN") == [630.0, 94.5]
+    assert servico.para_usd([630.0, 94.5], "mzn") == [10.0, 1.5]
+    with pytest.raises(KeyError):
+        servico.converter([1.0], "ABC")
+
+
+def test_valor_invalido_da_fonte_mantem_a_taxa_anterior(tmp_path, arquivo):
+    servico = _servico(tmp_path, arquivo)
+    servico.atualizar()
+
+    arquivo.write_text(json.dumps({"rates": {"EUR": "n/a", "MZN": 64.0}}), encoding="utf-8")
+    assert servico.atualizar(forcar=True) is True
+    assert servico.taxa("EUR") == 0.92 and servico.taxa("MZN") == 64.0
+    assert [t for _, t in servico.historico("EUR")] == [0.92, 0.92]
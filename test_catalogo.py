@@ -0,0 +1,137 @@
+# test_catalogo.py — Sincronização do catálogo (diff por hash, transação única)
+import sqlite3
+
+import pytest
+
+import catalogo
+from migrate_db import SQL_FILE
+
+
+def _lista(servicos: dict) -> dict:
+    """Resposta imeiservicelist do fornecedor: {sid: (nome, credito)} num grupo só."""
+    return {"SUCCESS": [{"MESSAGE": "IMEI Service List", "LIST": {
+        "iPhone": {"GROUPNAME": "iPhone", "SERVICES": {
+            str(sid): {"SERVICEID": sid, "SERVICENAME": nome, "CREDIT": credito}
+            for sid, (nome, credito) in servicos.items()
+        }},
+    }}]}
+
+
+@pytest.fixture
+def conn():
+    db = sqlite3.connect(":memory:")
+    with open(SQL_FILE, "r", encoding="utf-8") as f:
+        db.executescript(f.read())
+    yield db
+    db.close()
+
+
+def _linhas(db):
+    return db.execute("SELECT id, nome, credit, available FROM services ORDER BY id").fetchall()
+
+
+def test_normalizar_aceita_os_dois_formatos():
+    assert catalogo.normalizar(_lista({75: ("iPhone 11", "14.00 USD"), 6: ("iPhone X", "8")})) == [
+        {"id": 6, "nome": "iPhone X", "group_name": "iPhone", "credit": 8.0},
+        {"id": 75, "nome": "iPhone 11", "group_name": "iPhone", "credit": 14.0},
+    ]
+    antigo = {"SERVICES": [{"GROUPNAME": "MDM", "SERVICES": [{"ID": "9", "NAME": "MDM Bypass", "CREDIT": 5}]}]}
+    assert catalogo.normalizar(antigo) == [{"id": 9, "nome": "MDM Bypass", "group_name": "MDM", "credit": 5.0}]
+
+
+def test_sync_aplica_so_o_que_mudou(conn):
+    resumo = catalogo.sincronizar(conn, lambda: _lista({6: ("iPhone X", "8.00"), 75: ("iPhone 11", "14.00")}))
+    assert resumo["inseridos"] == 2
+    assert _linhas(conn) == [(6, "iPhone X", 8.0, 1), (75, "iPhone 11", 14.0, 1)]
+
+    # Mesma lista: nada é regravado
+    mudancas = conn.total_changes
+    resumo = catalogo.sincronizar(conn, lambda: _lista({6: ("iPhone X", "8.00"), 75: ("iPhone 11", "14.00")}))
+    assert resumo == {"total": 2, "inseridos": 0, "atualizados": 0, "indisponiveis": 0, "inalterados": 2,
+                      "versao": 2}
+    assert conn.total_changes == mudancas
+
+    # Preço mudou, um serviço sumiu, outro apareceu
+    resumo = catalogo.sincronizar(conn, lambda: _lista({6: ("iPhone X", "9.00"), 105: ("iPhone 15", "40")}))
+    assert (resumo["inseridos"], resumo["atualizados"], resumo["indisponiveis"]) == (1, 1, 1)
+    assert _linhas(conn) == [(6, "iPhone X", 9.0, 1), (75, "iPhone 11", 14.0, 0), (105, "iPhone 15", 40.0, 1)]
+
+    # Serviço que volta é reativado
+    resumo = catalogo.sincronizar(conn, lambda: _lista({6: ("iPhone X", "9.00"), 75: ("iPhone 11", "14.00"),
+                                                        105: ("iPhone 15", "40")}))
+    assert (resumo["atualizados"], resumo["inalterados"]) == (1, 2)
+    assert [r[3] for r in _linhas(conn)] == [1, 1, 1]
+
+
+def test_lista_vazia_nao_apaga_o_catalogo(conn):
+    catalogo.sincronizar(conn, lambda: _lista({6: ("iPhone X", "8.00")}))
+    with pytest.raises(ValueError):
+        catalogo.sincronizar(conn, lambda: {"ERROR": [{"MESSAGE": "Authentication failed"}]})
+    assert _linhas(conn) == [(6, "iPhone X", 8.0, 1)]
+
+
+def test_execucao_registra_progresso(conn):
+    execucao_id = catalogo.nova_execucao(conn)
+    etapas = []
+
+    def progresso(etapa, feitos, total):
+        etapas.append(etapa)
+        catalogo.registrar_progresso(conn, execucao_id, etapa, feitos, total)
+
+    resumo = catalogo.sincronizar(conn, lambda: _lista({6: ("iPhone X", "8.00")}), progresso=progresso)
+    catalogo.finalizar_execucao(conn, execucao_id, resumo=resumo)
+
+    assert etapas == ["buscando", "gravando", "concluido"]
+    execucao = catalogo.ultima_execucao(conn)
+    assert (execucao["id"], execucao["status"], execucao["resumo"]["inseridos"]) == (execucao_id, "done", 1)
+
+
+def test_sync_incrementa_versao_so_quando_muda(conn):
+    assert catalogo.sincronizar(conn, lambda: _lista({6: ("iPhone X", "8.00")}))["versao"] == 2
+    assert catalogo.sincronizar(conn, lambda: _lista({6: ("iPhone X", "8.00")}))["versao"] == 2
+    assert catalogo.sincronizar(conn, lambda: _lista({6: ("iPhone X", "9.00")}))["versao"] == 3
+
+
+def test_cache_recarrega_so_com_nova_versao(conn):
+    catalogo.sincronizar(conn, lambda: _lista({75: ("iPhone 11", "14.00"), 6: ("iPhone X", "8.00")}))
+    cache = catalogo.CacheCatalogo(lambda: conn, ttl=0)
+
+    snap = cache.snapshot()
+    assert [s["id"] for s in snap.servicos] == [75, 6]  # group_name, nome
+    assert cache.servico(6)["nome"] == "iPhone X"
+    assert cache.snapshot() is snap and cache.recargas == 1
+
+    catalogo.sincronizar(conn, lambda: _lista({6: ("iPhone X", "8.00")}))
+    novo = cache.snapshot()
+    assert cache.recargas == 2 and novo.etag != snap.etag
+    assert cache.servico(75) is None  # indisponível sai do catálogo
+    lista = novo.lista_dhru()["SUCCESS"][0]["LIST"]
+    assert lista["iPhone"]["SERVICES"]["6"] == {"SERVICEID": 6, "SERVICENAME": "iPhone X", "CREDIT": "8.00"}
+
+
+def test_cache_respeita_ttl(conn):
+    catalogo.sincronizar(conn, lambda: _lista({6: ("iPhone X", "8.00")}))
+    cache = catalogo.CacheCatalogo(lambda: conn, ttl=3600)
+    snap = cache.snapshot()
+
+    catalogo.sincronizar(conn, lambda: _lista({6: ("iPhone X", "9.00")}))
+    assert cache.snapshot() is snap  # dentro do TTL não consulta o banco
+    cache.invalidar()
+    assert cache.servico(6)["credit"] == 9.0
+
+
+def test_filtro_nao_esconde_o_que_ficou_de_fora(conn):
+    lista = lambda: {"SUCCESS": [{"LIST": {
+        "iPhone": {"GROUPNAME": "iPhone", "SERVICES": {"75": {"SERVICEID": 75, "SERVICENAME": "iPhone 11", "CREDIT": "14"}}},
+        "MDM": {"GROUPNAME": "MDM", "SERVICES": {"9": {"SERVICEID": 9, "SERVICENAME": "MDM Bypass", "CREDIT": "5"}}},
+    }}]}
+    catalogo.sincronizar(conn, lista)
+
+    # Sync só dos não-iPhone (sync_services_non_iphone.py): o iPhone 11 continua disponível
+    resumo = catalogo.sincronizar(conn, lista, filtro=lambda s: s["group_name"] != "iPhone")
+    assert resumo["indisponiveis"] == 0
+    assert [r[3] for r in _linhas(conn)] == [1, 1]
+
+    # Mas o que o fornecedor tirou da lista some, mesmo fora do filtro
+    catalogo.sincronizar(conn, lambda: _lista({9: ("MDM Bypass", "5")}), filtro=lambda s: s["id"] == 9)
+    assert _linhas(conn) == [(9, "MDM Bypass", 5.0, 1), (75, "iPhone 11", 14.0, 0)]
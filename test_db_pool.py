@@ -0,0 +1,48 @@
+# test_db_pool.py — Testes do pool de conexões SQLite
+import threading
+
+import db_pool
+
+
+def test_mesma_conexao_na_mesma_thread(tmp_path):
+    path = str(tmp_path / "pool.db")
+    assert db_pool.get_connection(path) is db_pool.get_connection(path)
+
+
+def test_threads_diferentes_tem_conexoes_diferentes(tmp_path):
+    path = str(tmp_path / "pool.db")
+    principal = db_pool.get_connection(path)
+    outras = []
+    t = threading.Thread(target=lambda: outras.append(db_pool.get_connection(path)))
+    t.start()
+    t.join()
+    assert outras[0] is not principal
+
+
+def test_pragmas_aplicados(tmp_path):
+    conn = db_pool.get_connection(str(tmp_path / "pool.db"))
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == db_pool.DB_BUSY_TIMEOUT_MS
+
+
+def test_close_devolve_ao_pool_com_rollback(tmp_path):
+    path = str(tmp_path / "pool.db")
+    conn = db_pool.get_connection(path)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.close()
+
+    conn = db_pool.get_connection(path)
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_fechar_conexao_thread_abre_nova(tmp_path):
+    path = str(tmp_path / "pool.db")
+    antiga = db_pool.get_connection(path)
+    db_pool.fechar_conexao_thread(path)
+    assert db_pool.get_connection(path) is not antiga
+    assert db_pool.estatisticas()["abertas"] >= 2
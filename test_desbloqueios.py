@@ -0,0 +1,215 @@
+# test_desbloqueios.py — Poller de status e envio das ordens de desbloqueio (app.py)
+import sqlite3
+
+import pytest
+
+import db_pool
+from job_queue import JobFatal
+
+
+def _tx(user_id, status, order_id):
+    conn = db_pool.get_connection()
+    cur = conn.execute(
+        "INSERT INTO transactions (user_id, purpose, modelo, imei, status, order_id, created_at) "
+        "VALUES (?, 'unlock', 'iPhone 11', '356000000000000', ?, ?, datetime('now'))",
+        (user_id, status, order_id))
+    conn.commit()
+    return cur.lastrowid
+
+
+def _status(tx_id):
+    return tuple(db_pool.get_connection().execute(
+        "SELECT status, status_message FROM transactions WHERE id=?", (tx_id,)).fetchone())
+
+
+def test_normalizar_status_fornecedor(app_tlux):
+    normalizar = app_tlux.normalizar_status_fornecedor
+    assert normalizar({"status": "4", "message": "Done"}) == ("success", "Done")
+    assert normalizar({"STATUS": "Rejected", "CODE": "IMEI inválido"}) == ("failed", "IMEI inválido")
+    assert normalizar({"state": " In Process "}) == ("processing", "")
+    assert normalizar({"status": "algo novo"}) == ("pending", "")
+    # Falha da própria consulta: não mexe no status gravado
+    assert normalizar({"error": "timeout"}) is None
+    assert normalizar("resposta inválida") is None
+
+
+def test_poller_so_consulta_ordens_abertas(app_tlux, novo_usuario, monkeypatch):
+    uid = novo_usuario()
+    aberta = _tx(uid, "pending", "ORD-A1")
+    processando = _tx(uid, "processing", "ORD-A2")
+    concluida = _tx(uid, "success", "ORD-A3")
+    consultadas = []
+
+    def consultar_status(order_id):
+        consultadas.append(order_id)
+        return {"ORD-A1": {"status": "completed", "message": "ok"},
+                "ORD-A2": {"error": "timeout"}}.get(order_id, {"status": "failed"})
+
+    monkeypatch.setattr(app_tlux, "consultar_status", consultar_status)
+    assert app_tlux.atualizar_status_desbloqueios(limite=1000) == 1
+
+    assert "ORD-A3" not in consultadas  # estado terminal nunca vai ao fornecedor
+    assert _status(aberta) == ("success", "ok")
+    assert _status(processando) == ("processing", None)  # consulta falhou: status mantido
+    assert _status(concluida) == ("success", None)
+
+
+def test_poller_nao_sobrescreve_mudanca_feita_em_paralelo(app_tlux, novo_usuario, monkeypatch):
+    tx_id = _tx(novo_usuario(), "pending", "ORD-B1")
+
+    def consultar_status(order_id):
+        if order_id == "ORD-B1":
+            # Admin marca como falha enquanto o fornecedor ainda responde "processing"
+            outra = sqlite3.connect(db_pool.DB_FILE)
+            outra.execute("UPDATE transactions SET status='failed' WHERE id=?", (tx_id,))
+            outra.commit()
+            outra.close()
+            return {"status": "processing"}
+        return {"error": "ignorada"}
+
+    monkeypatch.setattr(app_tlux, "consultar_status", consultar_status)
+    app_tlux.atualizar_status_desbloqueios(limite=1000)
+    assert _status(tx_id)[0] == "failed"
+
+
+def test_lease_elege_um_worker_por_vez(app_tlux, monkeypatch):
+    assumir = app_tlux.assumir_lease_poller
+    assert assumir("teste", "w1", 60) is True
+    assert assumir("teste", "w2", 60) is False
+    assert assumir("teste", "w1", 60) is True  # o dono renova
+
+    # Dono sumiu: o lease expira e outro worker assume
+    agora = app_tlux.time.time()
+    monkeypatch.setattr(app_tlux.time, "time", lambda: agora + 61)
+    assert assumir("teste", "w2", 60) is True
+    assert assumir("teste", "w1", 60) is False
+
+
+# ===============================
+#  Envio da ordem pela fila (_job_enviar_ordem_unlock)
+# ===============================
+_imeis = iter(range(356000000001000, 356000000009999))
+
+
+@pytest.fixture
+def fornecedor(app_tlux, monkeypatch):
+    """criar_ordem fake: responde o que estiver em `respostas` e anota os IMEIs enviados."""
+    class Fornecedor:
+        respostas = []
+        enviados = []
+
+    def criar_ordem(service_id, imei):
+        Fornecedor.enviados.append(imei)
+        if Fornecedor.respostas:
+            return Fornecedor.respostas.pop(0)
+        return {"status": "success", "order_id": f"ORD-{imei}"}
+
+    monkeypatch.setattr(app_tlux, "criar_ordem", criar_ordem)
+    return Fornecedor
+
+
+def _tx_paga(app_tlux, user_id, status="pending"):
+    imei = str(next(_imeis))
+    conn = db_pool.get_connection()
+    tx_id = conn.execute(
+        "INSERT INTO transactions (user_id, purpose, modelo, imei, status, created_at) "
+        "VALUES (?, 'unlock', 'iPhone 11', ?, ?, datetime('now'))", (user_id, imei, status)).lastrowid
+    conn.commit()
+    assert app_tlux._submit_unlock_order(None, "iPhone 11", tx_id)
+    return tx_id, imei
+
+
+def _rodar_fila(app_tlux):
+    db_pool.get_connection().execute("UPDATE jobs SET run_at=0 WHERE status='queued'")
+    app_tlux.fila_jobs.processar(app_tlux.JOB_UNLOCK_ORDER, app_tlux._job_enviar_ordem_unlock, "teste",
+                                 limite=100, on_failure=app_tlux._job_unlock_falhou)
+
+
+def _job(app_tlux, tx_id):
+    return db_pool.get_connection().execute(
+        "SELECT status, attempts FROM jobs WHERE kind=? AND idempotency_key=?",
+        (app_tlux.JOB_UNLOCK_ORDER, str(tx_id))).fetchone()[:]
+
+
+def _tx_linha(tx_id):
+    return db_pool.get_connection().execute(
+        "SELECT status, order_id FROM transactions WHERE id=?", (tx_id,)).fetchone()[:]
+
+
+def test_ordem_aceita_grava_order_id(app_tlux, novo_usuario, fornecedor):
+    tx_id, imei = _tx_paga(app_tlux, novo_usuario())
+    _rodar_fila(app_tlux)
+    assert _tx_linha(tx_id) == ("pending", f"ORD-{imei}")
+    assert _job(app_tlux, tx_id) == ("done", 1)
+
+    # Job repetido (queda do worker depois do commit): não envia de novo
+    app_tlux._job_enviar_ordem_unlock({"tx_id": tx_id})
+    assert fornecedor.enviados.count(imei) == 1
+
+
+def test_ordem_recusada_falha_sem_repetir(app_tlux, novo_usuario, fornecedor):
+    tx_id, imei = _tx_paga(app_tlux, novo_usuario())
+    fornecedor.respostas = [{"status": "error", "falha": "rejeitada", "message": "IMEI inválido"}]
+    _rodar_fila(app_tlux)
+    assert _tx_linha(tx_id) == ("failed", None)
+    assert _job(app_tlux, tx_id) == ("failed", 1)
+    assert fornecedor.enviados.count(imei) == 1
+
+
+def test_ordem_nao_enviada_volta_para_a_fila(app_tlux, novo_usuario, fornecedor):
+    tx_id, imei = _tx_paga(app_tlux, novo_usuario())
+    fornecedor.respostas = [{"status": "error", "falha": "nao_enviada", "message": "circuito aberto"}]
+    _rodar_fila(app_tlux)
+    assert _tx_linha(tx_id) == ("pending", None)  # status anterior restaurado
+    assert _job(app_tlux, tx_id) == ("queued", 1)
+
+    _rodar_fila(app_tlux)
+    assert _tx_linha(tx_id) == ("pending", f"ORD-{imei}")
+    assert fornecedor.enviados.count(imei) == 2
+
+
+def test_resultado_ambiguo_vai_para_revisao_e_nunca_e_reenviado(app_tlux, novo_usuario, fornecedor):
+    tx_id, imei = _tx_paga(app_tlux, novo_usuario())
+    fornecedor.respostas = [{"status": "error", "falha": "ambigua", "message": "HTTP 502"}]
+    _rodar_fila(app_tlux)
+    assert _tx_linha(tx_id) == ("review", None)  # on_failure não troca review por failed
+    assert _job(app_tlux, tx_id) == ("failed", 1)
+
+    # Nem um novo enfileiramento nem um job repetido chegam ao fornecedor
+    assert app_tlux._submit_unlock_order(None, "iPhone 11", tx_id)
+    _rodar_fila(app_tlux)
+    with pytest.raises(JobFatal):
+        app_tlux._job_enviar_ordem_unlock({"tx_id": tx_id})
+    assert fornecedor.enviados.count(imei) == 1
+    assert _tx_linha(tx_id) == ("review", None)
+
+
+def test_envio_interrompido_vai_para_revisao_sem_reenviar(app_tlux, novo_usuario, fornecedor):
+    # Worker caiu entre marcar 'submitting' e gravar a resposta do fornecedor
+    tx_id, imei = _tx_paga(app_tlux, novo_usuario(), status="submitting")
+    _rodar_fila(app_tlux)
+    assert _tx_linha(tx_id) == ("review", None)
+    assert imei not in fornecedor.enviados
+
+
+def test_modelo_sem_service_id_e_fatal(app_tlux, novo_usuario, fornecedor, monkeypatch):
+    monkeypatch.setattr(app_tlux, "obter_service_id", lambda modelo: None)
+    tx_id, imei = _tx_paga(app_tlux, novo_usuario())
+    _rodar_fila(app_tlux)
+    assert _tx_linha(tx_id) == ("failed", None)
+    assert imei not in fornecedor.enviados
+
+
+def test_forcar_status_pelo_admin_consulta_no_maximo_um_lote(app_tlux, novo_usuario, monkeypatch):
+    uid = novo_usuario()
+    for n in range(5):
+        _tx(uid, "pending", f"ORD-C{n}")
+    consultadas = []
+    monkeypatch.setattr(app_tlux, "consultar_status", lambda order_id: consultadas.append(order_id) or {})
+    monkeypatch.setattr(app_tlux, "UNLOCK_POLL_BATCH", 3)
+
+    admin = app_tlux.app.test_client()
+    with admin.session_transaction() as sessao:
+        sessao.update(user_id=novo_usuario(is_admin=1, role="admin"), email_verified=True, is_admin=True)
+    assert admin.post("/admin/forcar_status_pendentes").status_code == 302
+    assert len(consultadas) == 3
@@ -0,0 +1,131 @@
+# test_email_service.py — Testes da fila de e-mail com sessão SMTP reaproveitada
+import smtplib
+
+import pytest
+
+from email_service import JOB_EMAIL, ServicoEmail, SessaoSMTP
+from job_queue import JobQueue
+
+
+class FakeSMTP:
+    """Servidor SMTP de mentira: conta conexões, logins e mensagens."""
+    instancias = []
+
+    def __init__(self, host, port, timeout=None):
+        self.enviadas = []
+        self.logins = 0
+        self.derrubar_no_proximo = False
+        self.recusar = None
+        FakeSMTP.instancias.append(self)
+
+    def starttls(self, context=None):
+        pass
+
+    def login(self, user, password):
+        self.logins += 1
+
+    def noop(self):
+        return (250, b"OK")
+
+    def send_message(self, msg):
+        if self.derrubar_no_proximo:
+            raise smtplib.SMTPServerDisconnected("idle timeout")
+        if self.recusar:
+            raise smtplib.SMTPRecipientsRefused({msg["To"]: (self.recusar, b"no")})
+        self.enviadas.append(msg)
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def servico(tmp_path):
+    FakeSMTP.instancias = []
+    fila = JobQueue(str(tmp_path / "mail.db"))
+    return ServicoEmail(
+        fila, remetente="noreply@t-lux.test",
+        sessao_factory=lambda: SessaoSMTP("smtp.test", 587, "u", "p", smtp_factory=FakeSMTP),
+    )
+
+
+def test_enfileirar_nao_conecta(servico):
+    assert servico.enfileirar("a@b.c", "Oi", body_text="x")
+    assert FakeSMTP.instancias == []
+    assert servico.fila.contagem(JOB_EMAIL) == {"queued": 1}
+
+
+def test_lote_reaproveita_uma_sessao(servico):
+    for i in range(5):
+        servico.enfileirar(f"u{i}@b.c", "Assunto", body_text="texto", body_html="<b>html</b>")
+    assert servico.processar() == 5
+    assert len(FakeSMTP.instancias) == 1
+    smtp = FakeSMTP.instancias[0]
+    assert smtp.logins == 1 and len(smtp.enviadas) == 5
+    assert smtp.enviadas[0].get_body(("html",)).get_content().strip() == "<b>html</b>"
+    assert servico.fila.contagem(JOB_EMAIL) == {"done": 5}
+
+
+def test_reconecta_quando_servidor_derruba(servico):
+    servico.enfileirar("a@b.c", "1", body_text="x")
+    servico.processar()
+    FakeSMTP.instancias[0].derrubar_no_proximo = True
+    servico.enfileirar("a@b.c", "2", body_text="x")
+    servico.processar()
+    assert len(FakeSMTP.instancias) == 2
+    assert servico.fila.contagem(JOB_EMAIL) == {"done": 2}
+
+
+def test_recusa_5xx_e_definitiva(servico):
+    servico.enfileirar("invalido@b.c", "x", body_text="x")
+    servico.sessao()._conectar()
+    FakeSMTP.instancias[0].recusar = 550
+    servico.processar()
+    assert servico.fila.contagem(JOB_EMAIL) == {"failed": 1}
+
+
+def test_recusa_4xx_volta_para_fila(servico):
+    servico.enfileirar("cheio@b.c", "x", body_text="x")
+    servico.sessao()._conectar()
+    FakeSMTP.instancias[0].recusar = 452
+    servico.processar()
+    assert servico.fila.contagem(JOB_EMAIL) == {"queued": 1}
+
+
+def _payloads(servico):
+    conn = servico.fila._connect()
+    return [p for (p,) in conn.execute("SELECT payload FROM jobs WHERE kind=? ORDER BY id", (JOB_EMAIL,))]
+
+
+def test_otp_enviado_nao_fica_no_banco(servico):
+    servico.enfileirar("a@b.c", "Código", body_text="Seu código: 482913")
+    assert "482913" in _payloads(servico)[0]  # precisa do corpo até enviar
+    servico.processar()
+    assert _payloads(servico) == ["{}"]
+
+
+def test_payload_apagado_so_quando_falha_de_vez(servico):
+    servico.enfileirar("cheio@b.c", "Reset", body_text="https://x/reset/tok123")
+    servico.sessao()._conectar()
+    FakeSMTP.instancias[0].recusar = 452
+    servico.processar()
+    assert "tok123" in _payloads(servico)[0]  # vai tentar de novo
+
+    servico.sessao()._conectar()  # a sessão foi descartada na falha
+    FakeSMTP.instancias[-1].recusar = 550
+    servico.fila._connect().execute("UPDATE jobs SET run_at=0")
+    servico.processar()
+    assert servico.fila.contagem(JOB_EMAIL) == {"failed": 1} and _payloads(servico) == ["{}"]
+
+
+def test_limpa_jobs_antigos_e_preserva_outros_kinds(servico):
+    fila = servico.fila
+    fila.enfileirar("outro", {"x": 1})
+    fila.processar("outro", lambda p: None, "w")
+    fila._connect().execute("INSERT INTO jobs (kind, payload, status, run_at) VALUES (?, ?, 'done', 0)",
+                            (JOB_EMAIL, '{"body_text": "482913"}'))
+    assert fila.limpar_payloads(JOB_EMAIL) == 1
+    assert _payloads(servico) == ["{}"]
+    assert fila._connect().execute("SELECT payload FROM jobs WHERE kind='outro'").fetchone()[0] != "{}"
@@ -0,0 +1,70 @@
+# test_email_templates.py — Testes da renderização em cache dos e-mails transacionais
+import pytest
+
+pytest.importorskip("jinja2")
+
+import email_templates
+from email_templates import html_para_texto, renderizar_email
+
+
+@pytest.fixture(autouse=True)
+def cache_limpo():
+    email_templates.limpar_cache()
+    yield
+    email_templates.limpar_cache()
+
+
+def test_otp_html_e_texto():
+    body_html, body_text = renderizar_email("email_codigo_otp.html", "en", code="12345678", minutes_lbl="10 minutes")
+    assert "12345678" in body_html and "10 minutes" in body_html
+    assert "12345678" in body_text and "<" not in body_text
+
+
+def test_valores_sao_escapados_no_html_mas_nao_no_texto():
+    body_html, body_text = renderizar_email(
+        "email_verificacao_message.html", "en",
+        first_name="<b>Ana</b>", link_verificacao="https://t-lux.store/verify?a=1&b=2",
+    )
+    assert "&lt;b&gt;Ana&lt;/b&gt;" in body_html
+    assert "a=1&amp;b=2" in body_html
+    assert "<b>Ana</b>" in body_text
+
+
+def test_compila_uma_vez_por_arquivo(monkeypatch):
+    chamadas = []
+    original = email_templates._compilar
+    monkeypatch.setattr(email_templates, "_compilar", lambda a: chamadas.append(a) or original(a))
+    for _ in range(3):
+        renderizar_email("email_nova_licenca.html", "pt", first_name="A", pacote="Pro",
+                         license_key="K", expires_at="2030-01-01", valid_days=30)
+    renderizar_email("email_nova_licenca.html", "en")
+    # Sem email_nova_licenca.pt.html os dois idiomas usam o mesmo arquivo compilado
+    assert chamadas == ["email_nova_licenca.html"]
+
+
+def test_variante_por_idioma(monkeypatch, tmp_path):
+    (tmp_path / "email_x.html").write_text("<p>Hello {{ quem }}</p>", encoding="utf-8")
+    (tmp_path / "email_x.pt.html").write_text("<p>Olá {{ quem }}</p>", encoding="utf-8")
+    monkeypatch.setattr(email_templates, "TEMPLATES_DIR", str(tmp_path))
+    monkeypatch.setattr(email_templates._env, "loader", email_templates.FileSystemLoader(str(tmp_path)))
+    assert renderizar_email("email_x.html", "pt", quem="Ana")[0] == "<p>Olá Ana</p>"
+    assert renderizar_email("email_x.html", "fr", quem="Ana")[0] == "<p>Hello Ana</p>"
+
+
+def test_precompilar_todos():
+    assert email_templates.precompilar(("en", "pt")) == len(email_templates.TEMPLATES_EMAIL)
+
+
+def test_html_para_texto():
+    texto = html_para_texto(
+        "<html><head><style>p{}</style></head><body><p>Olá <strong>Ana</strong>,</p>"
+        "<a href='https://x.y'>Entrar</a></body></html>"
+    )
+    assert texto == "Olá Ana,\nEntrar (https://x.y)\n"
+
+
+def test_verificacao_so_usa_variaveis_que_os_chamadores_passam():
+    env = email_templates._env
+    fonte = env.loader.get_source(env, "email_verificacao_message.html")[0]
+    variaveis = email_templates.meta.find_undeclared_variables(env.parse(fonte)) - set(env.globals)
+    assert variaveis == {"first_name", "link_verificacao"}  # sem {{ code }} vazio
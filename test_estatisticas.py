@@ -0,0 +1,73 @@
+# test_estatisticas.py — Rollups mantidos por triggers (migrations/0002)
+import sqlite3
+
+import pytest
+
+from migrate_db import SQL_FILE, aplicar_migracoes
+
+
+@pytest.fixture
+def conn():
+    db = sqlite3.connect(":memory:")
+    with open(SQL_FILE, "r", encoding="utf-8") as f:
+        db.executescript(f.read())
+    aplicar_migracoes(db)
+    yield db
+    db.close()
+
+
+def _rollup_tx(db):
+    return sorted(
+        row for row in db.execute(
+            "SELECT dia, purpose, status, qtd, valor, fornecedor, lucro FROM stats_transacoes WHERE qtd != 0"
+        )
+    )
+
+
+def _recalculado_tx(db):
+    return sorted(db.execute("""
+        SELECT COALESCE(strftime('%Y-%m-%d', created_at), ''), COALESCE(purpose, ''), COALESCE(status, ''),
+               COUNT(*), COALESCE(SUM(amount), 0), COALESCE(SUM(preco_fornecedor), 0), COALESCE(SUM(lucro), 0)
+        FROM transactions GROUP BY 1, 2, 3
+    """))
+
+
+def test_rollup_transacoes_acompanha_insert_update_delete(conn):
+    conn.execute("INSERT INTO users (email, password_hash) VALUES ('a@b.c', 'x')")
+    for i in range(5):
+        conn.execute("""
+            INSERT INTO transactions (user_id, purpose, status, amount, preco_fornecedor, lucro, created_at)
+            VALUES (1, ?, 'paid', 10, 4, 6, ?)
+        """, ("unlock" if i % 2 else "package", f"2025-10-0{i + 1} 12:00:00"))
+    conn.execute("UPDATE transactions SET status='successful' WHERE id IN (1, 2)")
+    conn.execute("UPDATE transactions SET amount=25 WHERE id=3")
+    conn.execute("DELETE FROM transactions WHERE id=4")
+
+    assert _rollup_tx(conn) == _recalculado_tx(conn)
+
+
+def test_backfill_considera_dados_existentes():
+    db = sqlite3.connect(":memory:")
+    with open(SQL_FILE, "r", encoding="utf-8") as f:
+        db.executescript(f.read())
+    db.execute("INSERT INTO users (email, password_hash, role) VALUES ('t@b.c', 'x', 'tech')")
+    db.execute("INSERT INTO transactions (user_id, purpose, status, amount, created_at) VALUES (1, 'unlock', 'pending', 30, '2025-09-01 08:00:00')")
+    aplicar_migracoes(db)
+
+    assert _rollup_tx(db) == _recalculado_tx(db)
+    assert db.execute("SELECT role, qtd FROM stats_usuarios").fetchall() == [("tech", 1)]
+
+
+def test_rollup_licencas_e_usuarios(conn):
+    conn.execute("INSERT INTO users (email, password_hash, role) VALUES ('a@b.c', 'x', 'user')")
+    conn.execute("INSERT INTO users (email, password_hash, role) VALUES ('b@b.c', 'x', 'tech')")
+    conn.execute("UPDATE users SET role='admin' WHERE email='a@b.c'")
+    conn.execute("DELETE FROM users WHERE email='b@b.c'")
+    roles = dict(conn.execute("SELECT role, qtd FROM stats_usuarios WHERE qtd != 0"))
+    assert roles == {"admin": 1}
+
+    conn.execute("INSERT INTO licenses (user_id, expires_at) VALUES (1, '2025-01-10T00:00:00')")
+    conn.execute("INSERT INTO licenses (user_id, expires_at) VALUES (1, NULL)")
+    conn.execute("UPDATE licenses SET expires_at='2026-02-01T00:00:00' WHERE id=1")
+    dias = dict(conn.execute("SELECT dia_expira, qtd FROM stats_licencas WHERE qtd != 0"))
+    assert dias == {"2026-02-01": 1, "": 1}
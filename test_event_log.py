@@ -0,0 +1,72 @@
+# test_event_log.py — Testes da gravação em lote dos eventos
+import gzip
+import json
+import sqlite3
+import time
+
+import db_pool
+from event_log import EventLog
+
+
+def _contar(path):
+    return sqlite3.connect(path).execute("SELECT COUNT(*) FROM eventos").fetchone()[0]
+
+
+def test_sem_thread_grava_na_hora(tmp_path):
+    path = str(tmp_path / "ev.db")
+    log = EventLog(path)
+    log.registrar(1, "Login")
+    assert _contar(path) == 1
+
+
+def test_com_thread_grava_em_lote(tmp_path):
+    path = str(tmp_path / "ev.db")
+    log = EventLog(path, flush_ms=50, flush_rows=1000)
+    log.iniciar()
+    try:
+        for i in range(300):
+            log.registrar(i, f"Dashboard view {i}")
+        deadline = time.time() + 3
+        while log.estatisticas()["gravados"] < 300 and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        log.parar()
+    stats = log.estatisticas()
+    assert stats["gravados"] == 300 and stats["lotes"] <= 3
+    assert _contar(path) == 300
+
+
+def test_buffer_cheio_descarta_e_conta(tmp_path):
+    log = EventLog(str(tmp_path / "ev.db"), buffer_max=5, flush_rows=1000)
+    log._thread = object()  # simula a thread ativa: nada é gravado até o flush
+    aceitos = [log.registrar(1, "x") for _ in range(8)]
+    assert aceitos.count(False) == 3
+    assert log.estatisticas()["descartados"] == 3
+    log._thread = None
+    assert log.flush() == 5
+
+
+def test_parar_grava_o_que_sobrou(tmp_path):
+    path = str(tmp_path / "ev.db")
+    log = EventLog(path, flush_ms=60_000, flush_rows=1000)
+    log.iniciar()
+    log.registrar(7, "Logout")
+    log.parar()
+    assert _contar(path) == 1
+
+
+def test_arquivar_move_eventos_antigos(tmp_path):
+    path = str(tmp_path / "ev.db")
+    log = EventLog(path)
+    log.registrar(1, "recente")
+    conn = db_pool.get_connection(path)
+    conn.executemany("INSERT INTO eventos (user_id, descricao, data) VALUES (?, ?, ?)",
+                     [(2, "antigo", "2020-01-01 10:00:00"), (3, "antigo", "2020-01-02 10:00:00")])
+    conn.commit()
+
+    arquivo = log.arquivar(dias=30, pasta=str(tmp_path / "arq"))
+    with gzip.open(arquivo, "rt", encoding="utf-8") as f:
+        linhas = [json.loads(l) for l in f]
+    assert [l["user_id"] for l in linhas] == [2, 3]
+    assert _contar(path) == 1
+    assert log.arquivar(dias=30, pasta=str(tmp_path / "arq")) is None
@@ -0,0 +1,74 @@
+# test_exportacao.py — Testes da exportação em streaming (CSV / NDJSON)
+import csv
+import io
+import json
+import sqlite3
+
+import pytest
+
+import exportacao
+from migrate_db import SQL_FILE, aplicar_migracoes
+
+
+@pytest.fixture
+def conn():
+    db = sqlite3.connect(":memory:")
+    db.row_factory = sqlite3.Row
+    with open(SQL_FILE, "r", encoding="utf-8") as f:
+        db.executescript(f.read())
+    aplicar_migracoes(db)
+    db.execute("INSERT INTO users (id, email, password_hash) VALUES (1, 'a@b.c', 'x')")
+    linhas = []
+    for i in range(1, 1201):
+        dia = f"2025-0{(i % 3) + 1}-15 12:00:00"
+        linhas.append((i, 1, "unlock" if i % 2 else "license", 10.0, "success" if i % 4 else "failed", dia))
+    db.executemany(
+        "INSERT INTO transactions (id, user_id, purpose, amount, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        linhas,
+    )
+    db.commit()
+    yield db
+    db.close()
+
+
+def test_csv_completo_em_varios_blocos(conn):
+    blocos = list(exportacao.exportar(conn, "transactions", "csv"))
+    assert len(blocos) == -(-1200 // exportacao.EXPORT_FETCH_SIZE)
+    linhas = list(csv.reader(io.StringIO("".join(blocos))))
+    assert linhas[0][:3] == ["id", "email", "purpose"]
+    assert len(linhas) == 1201
+    assert linhas[1][1] == "a@b.c"
+
+
+def test_ndjson_um_objeto_por_linha(conn):
+    texto = "".join(exportacao.exportar(conn, "unlocks", "ndjson"))
+    objetos = [json.loads(linha) for linha in texto.splitlines()]
+    assert len(objetos) == 600
+    assert all("preco_cliente" in o for o in objetos)
+
+
+def test_filtros_de_data_e_status(conn):
+    texto = "".join(exportacao.exportar(conn, "transactions", "ndjson",
+                                        desde="2025-02-01", ate="2025-02-15", status="failed,x"))
+    objetos = [json.loads(linha) for linha in texto.splitlines()]
+    esperado = conn.execute(
+        "SELECT COUNT(*) FROM transactions WHERE created_at LIKE '2025-02-%' AND status='failed'"
+    ).fetchone()[0]
+    assert esperado and len(objetos) == esperado
+    assert {o["status"] for o in objetos} == {"failed"}
+
+
+def test_tabela_vazia_so_cabecalho(conn):
+    assert "".join(exportacao.exportar(conn, "orders", "csv")).startswith("id,user_email")
+
+
+def test_entidade_ou_formato_desconhecido(conn):
+    with pytest.raises(KeyError):
+        exportacao.exportar(conn, "users", "csv")
+    with pytest.raises(KeyError):
+        exportacao.exportar(conn, "transactions", "xlsx")
+
+
+def test_data_invalida_e_ignorada():
+    sql, params = exportacao.montar_consulta("licenses", desde="ontem", ate=None, status="")
+    assert "WHERE" not in sql and params == []
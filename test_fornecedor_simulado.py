@@ -0,0 +1,48 @@
+# test_fornecedor_simulado.py — Testes do fornecedor local usado pelo benchmark_funil
+import json
+import time
+
+import pytest
+
+import http_client
+from fornecedor_simulado import FornecedorSimulado, assinatura_stripe
+
+
+@pytest.fixture
+def fornecedor():
+    with FornecedorSimulado(latencias={"placeimeiorder": 0.1}, latencia_padrao=0) as f:
+        yield f
+
+
+def test_dhru_ordem_e_status(fornecedor):
+    inicio = time.perf_counter()
+    ordem = http_client.post(fornecedor.url_dhru, data={"action": "placeimeiorder", "imei": "350000000000001"},
+                             provider="simulado", action="placeimeiorder").json()
+    assert time.perf_counter() - inicio >= 0.1
+    order_id = ordem["SUCCESS"][0]["ORDERID"]
+
+    status = http_client.post(fornecedor.url_dhru, data={"action": "getimeiorder", "id": order_id},
+                              provider="simulado", action="getimeiorder").json()
+    assert status["SUCCESS"][0]["IMEI"] == "350000000000001"
+    servicos = http_client.post(fornecedor.url_dhru, data={"xml": "<request><action>services</action></request>"},
+                                provider="simulado", action="services").json()
+    assert "iPhone" in servicos["SUCCESS"][0]["LIST"]
+    assert fornecedor.chamadas == {"placeimeiorder": 1, "getimeiorder": 1, "services": 1}
+
+
+def test_checkout_stripe_e_webhook_assinado(fornecedor):
+    stripe = pytest.importorskip("stripe")
+    stripe.api_base, antes = fornecedor.url, stripe.api_base
+    try:
+        sessao = stripe.checkout.Session.create(
+            api_key="sk_test_x", mode="payment", client_reference_id="TLUXULK-1",
+            success_url="http://x/ok", metadata={"tx_ref": "TLUXULK-1"},
+        )
+    finally:
+        stripe.api_base = antes
+    assert sessao.url.endswith(sessao.id)
+
+    payload = json.dumps(fornecedor.evento_checkout_concluido(sessao.id))
+    evento = stripe.Webhook.construct_event(payload, assinatura_stripe(payload, "whsec_t"), "whsec_t")
+    assert evento["type"] == "checkout.session.completed"
+    assert evento["data"]["object"]["metadata"]["tx_ref"] == "TLUXULK-1"
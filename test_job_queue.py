@@ -0,0 +1,109 @@
+# test_job_queue.py — Testes da fila de jobs (SQLite)
+import job_queue
+from job_queue import JobQueue, JobFatal
+
+
+def test_enfileirar_e_idempotente(tmp_path):
+    fila = JobQueue(str(tmp_path / "jobs.db"))
+    assert fila.enfileirar("unlock_order", {"tx_id": 1}, idempotency_key="1") is True
+    assert fila.enfileirar("unlock_order", {"tx_id": 1}, idempotency_key="1") is False
+    assert fila.contagem("unlock_order") == {"queued": 1}
+
+
+def test_processar_conclui_job(tmp_path):
+    fila = JobQueue(str(tmp_path / "jobs.db"))
+    fila.enfileirar("unlock_order", {"tx_id": 7}, idempotency_key="7")
+
+    vistos = []
+    assert fila.processar("unlock_order", lambda p: vistos.append(p["tx_id"]), "w1") == 1
+    assert vistos == [7]
+    assert fila.contagem("unlock_order") == {"done": 1}
+    # Nada mais para reservar
+    assert fila.processar("unlock_order", lambda p: None, "w1") == 0
+
+
+def test_falha_reagenda_ate_max_attempts(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_BACKOFF_BASE", 0)
+    fila = JobQueue(str(tmp_path / "jobs.db"))
+    fila.enfileirar("unlock_order", {"tx_id": 3}, idempotency_key="3", max_attempts=2)
+
+    falhas = []
+
+    def handler(payload):
+        raise RuntimeError("fornecedor fora")
+
+    fila.processar("unlock_order", handler, "w1", on_failure=lambda p, e: falhas.append(p))
+    assert fila.contagem("unlock_order") == {"queued": 1}
+    assert falhas == []
+
+    fila.processar("unlock_order", handler, "w1", on_failure=lambda p, e: falhas.append(p))
+    assert fila.contagem("unlock_order") == {"failed": 1}
+    assert falhas == [{"tx_id": 3}]
+
+
+def test_job_fatal_nao_repete(tmp_path):
+    fila = JobQueue(str(tmp_path / "jobs.db"))
+    fila.enfileirar("unlock_order", {"tx_id": 4}, idempotency_key="4")
+
+    def handler(payload):
+        raise JobFatal("modelo sem service_id")
+
+    fila.processar("unlock_order", handler, "w1")
+    assert fila.contagem("unlock_order") == {"failed": 1}
+
+
+def test_kinds_sao_independentes(tmp_path):
+    fila = JobQueue(str(tmp_path / "jobs.db"))
+    fila.enfileirar("unlock_order", {"n": 1}, idempotency_key="1")
+    fila.enfileirar("email", {"n": 1}, idempotency_key="1")
+    assert fila.processar("email", lambda p: None, "w1", limite=10) == 1
+    assert fila.contagem("unlock_order") == {"queued": 1}
+
+
+def test_falha_descarta_o_que_o_handler_nao_confirmou(tmp_path):
+    fila = JobQueue(str(tmp_path / "jobs.db"))
+    conn = fila._connect()
+    conn.execute("CREATE TABLE entregas (tx_id INTEGER)")
+    conn.commit()
+    fila.enfileirar("unlock_order", {"tx_id": 5}, idempotency_key="5")
+
+    def handler(payload):
+        conn.execute("INSERT INTO entregas (tx_id) VALUES (?)", (payload["tx_id"],))
+        raise RuntimeError("database is locked")
+
+    fila.processar("unlock_order", handler, "w1")
+    assert conn.execute("SELECT COUNT(*) FROM entregas").fetchone()[0] == 0
+    assert fila.contagem("unlock_order") == {"queued": 1}
+
+
+def test_enfileirar_entra_na_transacao_do_chamador(tmp_path):
+    fila = JobQueue(str(tmp_path / "jobs.db"))
+    conn = fila._connect()
+    conn.execute("CREATE TABLE pedidos (id INTEGER)")
+    conn.commit()
+
+    conn.execute("INSERT INTO pedidos (id) VALUES (1)")
+    fila.enfileirar("unlock_order", {"tx_id": 1}, idempotency_key="1")
+    assert conn.in_transaction  # não confirmou o INSERT do chamador
+    conn.rollback()
+    assert conn.execute("SELECT COUNT(*) FROM pedidos").fetchone()[0] == 0
+    assert fila.contagem("unlock_order") == {}
+
+
+def test_lote_longo_renova_o_lease(tmp_path, monkeypatch):
+    relogio = [1000.0]
+    monkeypatch.setattr(job_queue.time, "time", lambda: relogio[0])
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", 300)
+    fila = JobQueue(str(tmp_path / "jobs.db"))
+    for n in range(3):
+        fila.enfileirar("email", {"n": n}, idempotency_key=str(n))
+
+    roubados = []
+
+    def handler(payload):
+        relogio[0] += 200  # cada envio demora 200 s (timeout SMTP)
+        roubados.extend(fila.reservar("email", "w2", limite=10))
+
+    assert fila.processar("email", handler, "w1", limite=3) == 3
+    assert roubados == []  # sem renovação, w2 pegaria o 3º job e o e-mail sairia duas vezes
+    assert fila.contagem("email") == {"done": 3}
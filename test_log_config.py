@@ -0,0 +1,69 @@
+# test_log_config.py — Testes do logging estruturado (JSON + fila + request_id)
+import io
+import json
+import logging
+
+import pytest
+
+import log_config
+
+
+@pytest.fixture
+def saida():
+    root = logging.getLogger()
+    handlers, nivel = list(root.handlers), root.level
+    stream = io.StringIO()
+    log_config.parar_logging()
+    log_config.configurar_logging(nivel="INFO", niveis_modulo="ruidoso=ERROR", formato="json", stream=stream)
+    yield stream
+    log_config.parar_logging()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    for h in handlers:
+        root.addHandler(h)
+    root.setLevel(nivel)
+    logging.getLogger("ruidoso").setLevel(logging.NOTSET)
+
+
+def _registros(stream):
+    log_config.parar_logging()  # esvazia a fila
+    return [json.loads(l) for l in stream.getvalue().splitlines()]
+
+
+def test_json_com_request_id_e_campos_extras(saida):
+    token = log_config.request_id_var.set("abc123")
+    try:
+        log_config.log("WARNING", "Fornecedor lento", provider="iremoval", ms=812.5)
+    finally:
+        log_config.request_id_var.reset(token)
+    (registro,) = _registros(saida)
+    assert registro["level"] == "WARNING" and registro["logger"] == "tlux"
+    assert registro["msg"] == "Fornecedor lento"
+    assert registro["request_id"] == "abc123"
+    assert registro["provider"] == "iremoval" and registro["ms"] == 812.5
+
+
+def test_nivel_por_modulo(saida):
+    logging.getLogger("ruidoso").warning("some")
+    logging.getLogger("ruidoso").error("aparece")
+    logging.getLogger("outro").debug("some")
+    assert [r["msg"] for r in _registros(saida)] == ["aparece"]
+
+
+def test_excecao_vai_no_registro(saida):
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logging.getLogger("tlux").exception("falhou")
+    (registro,) = _registros(saida)
+    assert "ZeroDivisionError" in registro["exc"]
+
+
+def test_definir_request_id_gera_quando_vazio():
+    token = log_config.request_id_var.set(None)
+    try:
+        assert log_config.definir_request_id("  ") == log_config.obter_request_id()
+        assert len(log_config.obter_request_id()) == 16
+        assert log_config.definir_request_id("x" * 100) == "x" * 64
+    finally:
+        log_config.request_id_var.reset(token)
@@ -0,0 +1,82 @@
+# test_metricas.py — Testes dos histogramas e da coleta por request
+import random
+
+import db_pool
+import metricas
+from metricas import Histograma, Registro
+
+
+def test_percentis_dentro_da_precisao():
+    h = Histograma(1e-6)
+    valores = list(range(1, 100_001))  # 1 µs .. 100 ms
+    random.Random(1).shuffle(valores)
+    for v in valores:
+        h.registrar(v)
+    for p, esperado in ((50, 0.05), (95, 0.095), (99, 0.099)):
+        assert abs(h.percentil(p) - esperado) / esperado < 0.07
+    assert abs(h.percentil(100) - 0.1) < 1e-9
+
+
+def test_buckets_cumulativos():
+    h = Histograma()
+    for v in (0, 1, 1, 3, 7, 40, 600):
+        h.registrar(v)
+    assert h.acumulado_ate((1, 2, 5, 10, 50, 500)) == [3, 3, 4, 5, 6, 6]
+    assert h.total == 7 and h.soma == 652
+
+
+def test_sql_contado_no_request(tmp_path):
+    conn = db_pool.get_connection(str(tmp_path / "m.db"))
+    metricas.iniciar_request()
+    conn.execute("CREATE TABLE t (x)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(10)])
+    cur = conn.cursor()
+    cur.execute("SELECT x FROM t")
+    assert len(cur.fetchall()) == 10
+    coleta = metricas.coleta_atual()
+    assert coleta.sql_n == 3 and coleta.sql_us > 0
+
+    registro = Registro()
+    registro.finalizar_request("painel_unlocks", "GET", 200)
+    assert metricas.coleta_atual() is None
+    assert registro.resumo()["painel_unlocks"]["queries_p95"] == 3
+
+    # Fora de request nada é somado
+    conn.execute("SELECT 1")
+    assert metricas.coleta_atual() is None
+
+
+def test_http_soma_no_request():
+    coleta = metricas.iniciar_request()
+    metricas.somar_http(0.25)
+    metricas.somar_http(0.5)
+    assert coleta.http_n == 2 and coleta.http_us == 750_000
+    metricas.iniciar_request()  # descarta
+
+
+def test_exposicao_prometheus():
+    registro = Registro()
+    coleta = metricas.ColetaRequest()
+    coleta.sql_n = 4
+    registro.finalizar_request('admin"x', "GET", 200, coleta)
+    texto = registro.exposicao_prometheus()
+    assert "# TYPE tlux_request_duration_seconds histogram" in texto
+    assert 'tlux_request_sql_queries_bucket{endpoint="admin\\"x",le="5"} 1' in texto
+    assert 'tlux_request_sql_queries_bucket{endpoint="admin\\"x",le="2"} 0' in texto
+    assert 'tlux_request_sql_queries_sum{endpoint="admin\\"x"} 4' in texto
+    assert 'tlux_requests_total{endpoint="admin\\"x",method="GET",status="200"} 1' in texto
+    assert texto.endswith("\n")
+
+
+def test_request_com_excecao_conta_como_500():
+    registro = Registro()
+    metricas.iniciar_request()
+    assert registro.finalizar_pendente("checkout", "POST") is True
+    assert metricas.coleta_atual() is None
+    assert 'tlux_requests_total{endpoint="checkout",method="POST",status="500"} 1' in registro.exposicao_prometheus()
+
+    # Já fechado pelo after_request: o teardown não conta de novo
+    metricas.iniciar_request()
+    registro.finalizar_request("checkout", "POST", 200)
+    assert registro.finalizar_pendente("checkout", "POST") is False
+    assert registro.resumo()["checkout"]["count"] == 2
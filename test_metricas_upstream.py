@@ -0,0 +1,111 @@
+# test_metricas_upstream.py — Testes da instrumentação das chamadas aos fornecedores
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import http_client
+import metricas_upstream
+from metricas_upstream import RegistroUpstream
+
+
+class _Relogio:
+    def __init__(self):
+        self.agora = 1_000_000.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_percentis_falhas_e_bytes():
+    registro = RegistroUpstream(_Relogio())
+    for ms in range(1, 101):
+        registro.registrar("dhru", "services", ms / 1000, status=200, enviados=100, recebidos=2000)
+    registro.registrar("dhru", "services", 5.0, falha="timeout", retry=True)
+    registro.registrar("dhru", "services", status=None, falha="circuito")
+    (linha,) = registro.resumo()
+    assert linha["chamadas"] == 102
+    assert 90 <= linha["p95_ms"] <= 101
+    assert linha["timeout"] == 1 and linha["circuito"] == 1 and linha["retries"] == 1
+    assert linha["bytes_enviados"] == 10_000 and linha["bytes_recebidos"] == 200_000
+
+
+def test_slo_janela_movel(monkeypatch):
+    monkeypatch.setattr(metricas_upstream, "UPSTREAM_SLO_P95_MS", 500)
+    monkeypatch.setattr(metricas_upstream, "UPSTREAM_SLO_JANELA_MIN", 5)
+    relogio = _Relogio()
+    registro = RegistroUpstream(relogio)
+    for _ in range(20):
+        registro.registrar("imei.info", "imei_info", 2.0, status=200)
+    assert registro.resumo()[0]["slo_ok"] is False
+
+    # 10 minutos depois as lentas saíram da janela; 4xx não conta como erro do fornecedor
+    relogio.agora += 600
+    for _ in range(20):
+        registro.registrar("imei.info", "imei_info", 0.1, status=200)
+    registro.registrar("imei.info", "imei_info", 0.1, status=404)
+    linha = registro.resumo()[0]
+    assert linha["slo_ok"] is True and linha["janela_chamadas"] == 21
+    assert linha["http_4xx"] == 1 and linha["janela_erro_pct"] == 0.0
+    assert linha["p95_ms"] >= 1900  # acumulado desde o início continua vendo as lentas
+
+
+def test_exposicao_prometheus():
+    registro = RegistroUpstream(_Relogio())
+    registro.registrar("dhru", "placeimeiorder", 0.2, status=502)
+    texto = registro.exposicao_prometheus()
+    assert 'tlux_upstream_duration_seconds_bucket{provider="dhru",action="placeimeiorder",le="0.25"} 1' in texto
+    assert 'tlux_upstream_failures_total{provider="dhru",action="placeimeiorder",kind="http_5xx"} 1' in texto
+
+
+class _Fornecedor(BaseHTTPRequestHandler):
+    def do_POST(self):
+        corpo = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        status = 503 if b"falha" in corpo else 200
+        resposta = b'{"SUCCESS": [{"MESSAGE": "ok"}]}'
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(resposta)))
+        self.end_headers()
+        self.wfile.write(resposta)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fornecedor():
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Fornecedor)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}/api"
+    servidor.shutdown()
+
+
+def test_http_client_registra_tentativas(fornecedor, monkeypatch):
+    registro = RegistroUpstream()
+    monkeypatch.setattr(metricas_upstream, "registro", registro)
+    monkeypatch.setattr(http_client, "_espera", lambda *a: 0)
+
+    http_client.post(fornecedor, data={"action": "services"}, provider="teste", action="services")
+    http_client.post(fornecedor, data={"action": "falha"}, provider="teste", action="order", retries=1)
+    with pytest.raises(requests.ConnectionError):
+        http_client.post("http://127.0.0.1:9/api", data={"x": "1"}, provider="fora", action="order", retries=0)
+
+    linhas = {(l["provider"], l["action"]): l for l in registro.resumo()}
+    services = linhas[("teste", "services")]
+    assert services["chamadas"] == 1 and services["bytes_enviados"] == len("action=services")
+    assert services["bytes_recebidos"] == len('{"SUCCESS": [{"MESSAGE": "ok"}]}')
+    order = linhas[("teste", "order")]
+    assert order["chamadas"] == 2 and order["http_5xx"] == 2 and order["retries"] == 1
+    assert linhas[("fora", "order")]["rede"] == 1
+
+
+def test_nao_enviado_so_para_falhas_de_conexao():
+    with pytest.raises(requests.ConnectionError) as recusada:
+        http_client.post("http://127.0.0.1:9/api", data={"x": "1"}, provider="fora2", action="placeimeiorder")
+    assert http_client.nao_enviado(recusada.value)
+    assert http_client.nao_enviado(requests.ConnectTimeout())
+    assert http_client.nao_enviado(http_client.CircuitOpenError())
+    # Pode ter chegado ao fornecedor: não é seguro repetir
+    assert not http_client.nao_enviado(requests.ReadTimeout())
+    assert not http_client.nao_enviado(requests.ConnectionError("Connection aborted."))
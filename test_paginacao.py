@@ -0,0 +1,85 @@
+# test_paginacao.py — Testes da paginação por cursor (keyset)
+import base64
+import sqlite3
+
+import pytest
+
+from paginacao import decode_cursor, encode_cursor, limite_pagina, paginar
+
+
+@pytest.fixture
+def conn():
+    db = sqlite3.connect(":memory:")
+    db.row_factory = sqlite3.Row
+    db.execute("CREATE TABLE itens (id INTEGER PRIMARY KEY, created_at TEXT, tipo TEXT)")
+    # Datas repetidas e algumas NULL: o desempate pelo id precisa funcionar
+    linhas = []
+    for i in range(1, 38):
+        data = None if i % 9 == 0 else f"2025-01-{(i % 5) + 1:02d} 10:00:00"
+        linhas.append((i, data, "unlock" if i % 2 else "license"))
+    db.executemany("INSERT INTO itens VALUES (?, ?, ?)", linhas)
+    yield db
+    db.close()
+
+
+def _todas_as_paginas(conn, limite, **kw):
+    ids, cursor, paginas = [], None, 0
+    while True:
+        linhas, cursor = paginar(conn, "SELECT id, tipo FROM itens", cursor=cursor, limite=limite, **kw)
+        ids.extend(r["id"] for r in linhas)
+        paginas += 1
+        if cursor is None:
+            return ids, paginas
+
+
+def _ordem_esperada(conn, where=""):
+    sql = f"SELECT id FROM itens {where} ORDER BY created_at DESC, id DESC"
+    return [r["id"] for r in conn.execute(sql)]
+
+
+@pytest.mark.parametrize("limite", [1, 4, 10, 37, 100])
+def test_percorre_tudo_sem_repetir_nem_pular(conn, limite):
+    ids, paginas = _todas_as_paginas(conn, limite)
+    assert ids == _ordem_esperada(conn)
+    assert paginas == max(1, -(-37 // limite))
+
+
+def test_filtro_extra(conn):
+    ids, _ = _todas_as_paginas(conn, 3, where="tipo = ?", params=("unlock",))
+    assert ids == _ordem_esperada(conn, "WHERE tipo = 'unlock'")
+
+
+def test_cursor_ida_e_volta():
+    assert decode_cursor(encode_cursor("2025-01-01 10:00:00", 42)) == ("2025-01-01 10:00:00", 42)
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+    assert decode_cursor(encode_cursor(12.5, 3)) == (12.5, 3)
+
+
+def _token(bruto: str) -> str:
+    return base64.urlsafe_b64encode(bruto.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+CURSORES_INVALIDOS = [None, "", "!!!", "bm9wZQ", "WzFd",
+                      encode_cursor([1, 2], 3), encode_cursor({"a": 1}, 3),
+                      _token("[1,1e999]"), _token("[1e999,1]"), _token("[NaN,1]"),
+                      encode_cursor(1, 10**23), encode_cursor(10**23, 1), encode_cursor(1, -2**63 - 1)]
+
+
+@pytest.mark.parametrize("token", CURSORES_INVALIDOS)
+def test_cursor_invalido_volta_para_primeira_pagina(token):
+    assert decode_cursor(token) is None
+
+
+@pytest.mark.parametrize("token", CURSORES_INVALIDOS[-4:])
+def test_cursor_forjado_nao_chega_ao_sqlite(conn, token):
+    primeira, _ = paginar(conn, "SELECT id FROM itens", limite=5)
+    linhas, _ = paginar(conn, "SELECT id FROM itens", cursor=token, limite=5)
+    assert [r["id"] for r in linhas] == [r["id"] for r in primeira]
+
+
+def test_limite_pagina():
+    assert limite_pagina(None) == 50
+    assert limite_pagina("abc") == 50
+    assert limite_pagina("0") == 1
+    assert limite_pagina("20") == 20
+    assert limite_pagina("10000") == 200
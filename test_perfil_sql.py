@@ -0,0 +1,61 @@
+# test_perfil_sql.py — Testes do profiler SQL (normalização, slow log, orçamento)
+import logging
+import warnings
+
+import pytest
+
+import db_pool
+import perfil_sql
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = db_pool.get_connection(str(tmp_path / "p.db"))
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, nome TEXT)")
+    conn.executemany("INSERT INTO t (nome) VALUES (?)", [(f"n{i}",) for i in range(20)])
+    conn.commit()
+    yield conn
+    perfil_sql.finalizar_rastreio()
+
+
+def test_normalizar():
+    sql = "SELECT *  FROM t\n WHERE id = 42 AND nome = 'O''Brien' AND x IN (?, ?, ?) AND v > -1.5"
+    assert perfil_sql.normalizar(sql) == "SELECT * FROM t WHERE id = ? AND nome = ? AND x IN (?...) AND v > ?"
+    assert perfil_sql.normalizar("SELECT col1 FROM t2") == "SELECT col1 FROM t2"
+
+
+def test_rastreio_guarda_sql_tempo_e_linhas(conn):
+    perfil_sql.iniciar_rastreio()
+    conn.execute("SELECT * FROM t WHERE id < ?", (6,)).fetchall()
+    for _ in conn.execute("SELECT * FROM t WHERE id > 15"):
+        pass
+    conn.execute("UPDATE t SET nome = 'x' WHERE id <= 3")
+    rastreio = perfil_sql.finalizar_rastreio()
+
+    assert [e.linhas for e in rastreio] == [5, 5, 3]
+    assert rastreio[1].normalizado == "SELECT * FROM t WHERE id > ?"
+    assert all(e.segundos > 0 for e in rastreio)
+    assert not perfil_sql.rastreando()
+
+
+def test_slow_query_log(conn, monkeypatch, caplog):
+    monkeypatch.setattr(perfil_sql, "SQL_SLOW_MS", 0.000001)
+    with caplog.at_level(logging.WARNING, logger="sql_lento"):
+        conn.execute("SELECT nome FROM t WHERE id = 7").fetchone()
+    assert "SELECT nome FROM t WHERE id = ?" in caplog.text
+    assert perfil_sql.lentas_recentes()[0]["sql"] == "SELECT nome FROM t WHERE id = ?"
+
+
+def test_orcamento_estourado_avisa_em_debug(conn, monkeypatch):
+    monkeypatch.setattr(perfil_sql, "_ORCAMENTOS", perfil_sql._orcamentos("painel_unlocks=3"))
+    perfil_sql.iniciar_rastreio()
+    for i in range(5):  # N+1
+        conn.execute("SELECT nome FROM t WHERE id = ?", (i,)).fetchone()
+    rastreio = perfil_sql.finalizar_rastreio()
+
+    assert perfil_sql.verificar_orcamento("dashboard", rastreio) is True
+    with pytest.warns(perfil_sql.OrcamentoQueriesExcedido, match=r"5x"):
+        assert perfil_sql.verificar_orcamento("painel_unlocks", rastreio, avisar=True) is False
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        perfil_sql.verificar_orcamento("painel_unlocks", rastreio, avisar=False)
@@ -0,0 +1,132 @@
+# test_query_plans.py — Regressão de planos de consulta (EXPLAIN QUERY PLAN)
+#
+# Cria o schema (migrate_all.sql + migrations/) num banco em memória e falha
+# se alguma consulta quente cair num SCAN completo de tabela.
+import os
+import re
+import sqlite3
+
+import pytest
+
+from migrate_db import SQL_FILE, aplicar_migracoes
+
+CONSULTAS_QUENTES = {
+    "painel_unlocks": (
+        "SELECT * FROM transactions WHERE user_id=? AND purpose='unlock' ORDER BY created_at DESC",
+        (1,),
+    ),
+    "dashboard_transacoes": (
+        "SELECT * FROM transactions WHERE user_id=? ORDER BY created_at DESC",
+        (1,),
+    ),
+    "webhook_tx_ref": (
+        "SELECT * FROM transactions WHERE tx_ref=?",
+        ("tx_abc",),
+    ),
+    "overview_pendentes": (
+        "SELECT COUNT(*) FROM transactions WHERE status='pending'",
+        (),
+    ),
+    "overview_sucesso": (
+        "SELECT SUM(amount) FROM transactions WHERE status IN ('success','successful')",
+        (),
+    ),
+    "poller_desbloqueios": (
+        """SELECT id, order_id, status FROM transactions
+           WHERE purpose='unlock' AND status IN ('pending','processing')
+             AND order_id IS NOT NULL AND order_id != ''
+           ORDER BY COALESCE(updated_at, created_at) ASC LIMIT ?""",
+        (200,),
+    ),
+    "failed_attempts": (
+        """SELECT COUNT(*) AS total FROM login_attempts
+           WHERE (email = ? OR ip_address = ?) AND status = 'failed' AND created_at >= ?""",
+        ("a@b.c", "1.2.3.4", "2025-01-01"),
+    ),
+    "is_blocked": (
+        """SELECT 1 FROM blocked_users
+           WHERE (email = ? OR ip_address = ?) AND blocked_until > ? LIMIT 1""",
+        ("a@b.c", "1.2.3.4", "2025-01-01"),
+    ),
+    "mensagens_nao_lidas": (
+        "SELECT COUNT(*) AS unread_count FROM messages WHERE seen=0 AND to_user_id=0",
+        (),
+    ),
+    "minhas_mensagens": (
+        "SELECT * FROM messages WHERE to_user_id=? OR from_user_id=? ORDER BY created_at ASC",
+        (1, 1),
+    ),
+    "codigo_verificacao": (
+        "SELECT id, code_hash, expires_at, used FROM verification_codes WHERE email=? AND used=0 ORDER BY id DESC LIMIT 1",
+        ("a@b.c",),
+    ),
+    "licencas_usuario": (
+        "SELECT * FROM licenses WHERE user_id=? ORDER BY issued_at DESC",
+        (1,),
+    ),
+    "licencas_recentes": (
+        "SELECT * FROM licenses ORDER BY issued_at DESC LIMIT 50",
+        (),
+    ),
+    "licenca_por_tx": (
+        "SELECT id FROM licenses WHERE tx_id=?",
+        (1,),
+    ),
+    # Listagens do admin paginadas por cursor (paginacao.paginar)
+    "admin_transacoes_pagina": (
+        """SELECT t.created_at AS _pg_valor, t.id AS _pg_id, t.* FROM transactions t
+           WHERE ((t.created_at, t.id) < (?, ?) OR t.created_at IS NULL)
+           ORDER BY t.created_at DESC, t.id DESC LIMIT ?""",
+        ("2025-01-01", 100, 51),
+    ),
+    "admin_unlocks_pagina": (
+        """SELECT t.created_at AS _pg_valor, t.id AS _pg_id, t.* FROM transactions t
+           WHERE (t.purpose='unlock') AND ((t.created_at, t.id) < (?, ?) OR t.created_at IS NULL)
+           ORDER BY t.created_at DESC, t.id DESC LIMIT ?""",
+        ("2025-01-01", 100, 51),
+    ),
+    "admin_usuarios_pagina": (
+        "SELECT created_at AS _pg_valor, id AS _pg_id, * FROM users ORDER BY created_at DESC, id DESC LIMIT ?",
+        (51,),
+    ),
+    "admin_pedidos_pagina": (
+        "SELECT created_at AS _pg_valor, id AS _pg_id, * FROM orders ORDER BY created_at DESC, id DESC LIMIT ?",
+        (51,),
+    ),
+    "admin_saldos_pagina": (
+        "SELECT u.balance AS _pg_valor, u.id AS _pg_id, u.email FROM users u ORDER BY u.balance DESC, u.id DESC LIMIT ?",
+        (51,),
+    ),
+}
+
+# "SCAN transactions" sem índice = varredura completa da tabela
+_SCAN_COMPLETO = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+@pytest.fixture(scope="module")
+def conn():
+    db = sqlite3.connect(":memory:")
+    with open(SQL_FILE, "r", encoding="utf-8") as f:
+        db.executescript(f.read())
+    aplicar_migracoes(db)
+    yield db
+    db.close()
+
+
+def _plano(conn, sql, params):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+@pytest.mark.parametrize("nome", sorted(CONSULTAS_QUENTES))
+def test_consulta_quente_usa_indice(conn, nome):
+    sql, params = CONSULTAS_QUENTES[nome]
+    plano = _plano(conn, sql, params)
+    scans = [linha for linha in plano if _SCAN_COMPLETO.match(linha)]
+    assert not scans, f"{nome}: varredura completa {scans} — plano: {plano}"
+
+
+def test_migracoes_sao_idempotentes(conn):
+    assert aplicar_migracoes(conn) == []
+    versoes = [row[0] for row in conn.execute("SELECT version FROM schema_migrations ORDER BY version")]
+    pasta = os.path.join(os.path.dirname(SQL_FILE), "migrations")
+    assert versoes == sorted(f[:4] for f in os.listdir(pasta) if f.endswith(".sql"))
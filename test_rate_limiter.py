@@ -0,0 +1,55 @@
+# test_rate_limiter.py — Testes do limitador de login em memória
+from rate_limiter import LoginLimiter, SlidingWindowLimiter
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_janela_deslizante_expira_eventos_antigos():
+    relogio = Relogio()
+    lim = SlidingWindowLimiter(3, 60, relogio=relogio)
+    assert [lim.registrar("k") for _ in range(3)] == [1, 2, 3]
+    assert lim.excedido("k")
+    relogio.agora += 61
+    assert lim.contagem("k") == 0
+
+
+def test_memoria_limitada_por_chave_e_por_total():
+    lim = SlidingWindowLimiter(5, 60, max_chaves=10, relogio=Relogio())
+    for _ in range(1000):
+        lim.registrar("mesma")
+    assert lim.contagem("mesma") == 5
+    for i in range(50):
+        lim.registrar(f"ip:{i}")
+    assert len(lim) == 10
+
+
+def test_bloqueio_persistido_uma_vez_por_email_ou_ip():
+    relogio = Relogio()
+    gravados = []
+    lim = LoginLimiter(3, 10, 10, persistir_bloqueio=lambda e, i, ate: gravados.append((e, i, ate)),
+                       relogio=relogio)
+    # Mesmo IP, e-mails diferentes (credential stuffing)
+    disparos = [lim.registrar_falha(f"u{n}@x.y", "1.2.3.4") for n in range(6)]
+    assert disparos == [False, False, True, False, False, False]
+    assert gravados == [("u2@x.y", "1.2.3.4", relogio.agora + 600)]
+    assert lim.bloqueado_localmente("outro@x.y", "1.2.3.4")
+    assert not lim.bloqueado_localmente("outro@x.y", "5.6.7.8")
+
+    relogio.agora += 601
+    assert not lim.bloqueado_localmente("u2@x.y", "1.2.3.4")
+
+
+def test_sucesso_zera_falhas_do_email():
+    lim = LoginLimiter(3, 10, 10, relogio=Relogio())
+    lim.registrar_falha("a@b.c", "1.1.1.1")
+    lim.registrar_falha("a@b.c", "2.2.2.2")
+    assert lim.falhas_recentes("a@b.c", None) == 2
+    lim.registrar_sucesso("A@b.c", "3.3.3.3")
+    assert lim.falhas_recentes("a@b.c", None) == 0
+    assert lim.falhas_recentes(None, "1.1.1.1") == 1
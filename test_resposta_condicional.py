@@ -0,0 +1,55 @@
+# test_resposta_condicional.py — GET condicional (ETag / 304) em /services e /api/precos
+
+
+def _cliente(app_tlux, user_id, is_admin=False):
+    cliente = app_tlux.app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao.update(user_id=user_id, email_verified=True, is_admin=is_admin)
+    return cliente
+
+
+def test_services_responde_304_com_o_mesmo_etag(app_tlux, novo_usuario):
+    cliente = _cliente(app_tlux, novo_usuario())
+    primeira = cliente.get("/services")
+    assert primeira.status_code == 200 and primeira.headers["ETag"]
+    assert "private" in primeira.headers["Cache-Control"]
+
+    segunda = cliente.get("/services", headers={"If-None-Match": primeira.headers["ETag"]})
+    assert segunda.status_code == 304 and segunda.data == b""
+    assert segunda.headers["ETag"] == primeira.headers["ETag"]
+
+
+def test_etag_muda_com_o_menu_de_admin(app_tlux, novo_usuario):
+    uid = novo_usuario()
+    cliente = _cliente(app_tlux, uid)
+    etag = cliente.get("/services").headers["ETag"]
+
+    # Virou admin: o menu em base.html muda, a cópia antiga não serve
+    with cliente.session_transaction() as sessao:
+        sessao["is_admin"] = True
+    resposta = cliente.get("/services", headers={"If-None-Match": etag})
+    assert resposta.status_code == 200 and resposta.headers["ETag"] != etag
+
+
+def test_flash_pendente_sai_completo_e_sem_validadores(app_tlux, novo_usuario):
+    cliente = _cliente(app_tlux, novo_usuario())
+    etag = cliente.get("/services").headers["ETag"]
+
+    with cliente.session_transaction() as sessao:
+        sessao["_flashes"] = [("info", "Serviço comprado")]
+    resposta = cliente.get("/services", headers={"If-None-Match": etag})
+    assert resposta.status_code == 200
+    assert "Serviço comprado" in resposta.get_data(as_text=True)
+    assert "ETag" not in resposta.headers and "no-store" in resposta.headers["Cache-Control"]
+
+    # Mensagem já exibida: volta o 304
+    assert cliente.get("/services", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_api_precos_publica_com_304(app_tlux):
+    cliente = app_tlux.app.test_client()
+    primeira = cliente.get("/api/precos?moeda=MZN")
+    assert primeira.status_code == 200 and "public" in primeira.headers["Cache-Control"]
+    segunda = cliente.get("/api/precos?moeda=MZN", headers={"If-None-Match": primeira.headers["ETag"]})
+    assert segunda.status_code == 304
+    assert cliente.get("/api/precos?moeda=XXX").status_code == 400
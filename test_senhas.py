@@ -0,0 +1,41 @@
+# test_senhas.py — Testes do pool de bcrypt
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("bcrypt")
+
+import senhas
+
+
+def test_hash_e_verificacao():
+    h = senhas.hash_senha("segredo", rounds=4)
+    assert h.startswith("$2b$04$")
+    assert senhas.verificar_senha(b"segredo", h)
+    assert senhas.verificar_senha("segredo", h.encode())
+    assert not senhas.verificar_senha("errada", h)
+
+
+def test_hash_invalido_nao_levanta():
+    assert not senhas.verificar_senha("x", "texto-puro")
+    assert not senhas.verificar_senha("x", None)
+
+
+def test_precisa_rehash_quando_custo_muda():
+    h = senhas.hash_senha("segredo", rounds=4)
+    assert senhas.custo(h) == 4
+    assert senhas.precisa_rehash(h, rounds=5)
+    assert not senhas.precisa_rehash(h, rounds=4)
+    assert senhas.precisa_rehash("sem-custo")
+
+
+def test_fila_cheia_falha_na_hora(monkeypatch):
+    liberar = threading.Event()
+    monkeypatch.setattr(senhas, "_vagas", threading.BoundedSemaphore(1))
+    threading.Thread(target=senhas._executar, args=(liberar.wait, 5), daemon=True).start()
+    while senhas._vagas._value:
+        time.sleep(0.001)
+    with pytest.raises(senhas.SobrecargaSenhas):
+        senhas.hash_senha("x", rounds=4)
+    liberar.set()
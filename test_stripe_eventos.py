@@ -0,0 +1,150 @@
+# test_stripe_eventos.py — Ledger de eventos do webhook Stripe e entrega no app
+#
+# Lease, backoff e rollback são da JobQueue (test_job_queue.py); aqui fica o
+# que é do ledger (event_id, ordem, migração) e a entrega _cumprir_evento_stripe.
+import json
+import sqlite3
+import time
+
+import pytest
+
+import db_pool
+from job_queue import JobFatal
+from stripe_eventos import LedgerStripe
+
+
+def _evento(n, tipo: str = "checkout.session.completed", tx_ref: str = None, sessao: str = None) -> tuple:
+    objeto = {"id": sessao or f"cs_{n}", "client_reference_id": tx_ref or f"tx{n}"}
+    payload = {"id": f"evt_{n}", "type": tipo, "data": {"object": objeto}}
+    return payload["id"], tipo, json.dumps(payload)
+
+
+def test_registrar_e_idempotente(tmp_path):
+    ledger = LedgerStripe(str(tmp_path / "stripe.db"))
+    assert ledger.registrar(*_evento(1)) is True
+    # Retry do Stripe com o mesmo event.id
+    assert ledger.registrar(*_evento(1)) is False
+    assert ledger.contagem() == {"queued": 1}
+    assert not ledger.fila._connect().in_transaction  # gravado antes do 200
+
+
+def test_processa_em_ordem_de_chegada(tmp_path):
+    ledger = LedgerStripe(str(tmp_path / "stripe.db"))
+    for n in (3, 1, 2):
+        ledger.registrar(*_evento(n))
+
+    vistos = []
+    assert ledger.processar(lambda ev: vistos.append(ev["id"])) == 3
+    assert vistos == ["evt_3", "evt_1", "evt_2"]
+    assert ledger.contagem() == {"done": 3}
+    # Evento já entregue não volta, nem se o Stripe reenviar
+    assert ledger.registrar(*_evento(1)) is False
+    assert ledger.processar(lambda ev: vistos.append(ev["id"])) == 0
+
+
+def test_job_fatal_nao_repete(tmp_path):
+    ledger = LedgerStripe(str(tmp_path / "stripe.db"))
+    ledger.registrar(*_evento(1))
+
+    def handler(ev):
+        raise JobFatal("sessão sem tx_ref")
+
+    ledger.processar(handler)
+    assert ledger.contagem() == {"failed": 1}
+
+
+def test_worker_drena_o_ledger(tmp_path):
+    ledger = LedgerStripe(str(tmp_path / "stripe.db"))
+    vistos = []
+    ledger.iniciar(lambda ev: vistos.append(ev["id"]), intervalo=0.05)
+    try:
+        ledger.registrar(*_evento(1))
+        ledger.registrar(*_evento(2))
+        for _ in range(100):
+            if len(vistos) == 2:
+                break
+            ledger._parar.wait(0.02)
+    finally:
+        ledger.parar()
+    assert vistos == ["evt_1", "evt_2"]
+
+
+def test_migra_a_tabela_antiga(tmp_path):
+    caminho = str(tmp_path / "stripe.db")
+    antiga = sqlite3.connect(caminho)
+    antiga.execute("""
+        CREATE TABLE stripe_eventos (id INTEGER PRIMARY KEY, event_id TEXT UNIQUE, tipo TEXT, payload TEXT,
+                                     status TEXT, attempts INTEGER, run_at REAL, last_error TEXT)
+    """)
+    antiga.executemany("INSERT INTO stripe_eventos VALUES (?, ?, ?, ?, ?, 0, ?, NULL)",
+                       [(1, "evt_1", "x", _evento(1)[2], "done", time.time()),
+                        (2, "evt_2", "x", _evento(2)[2], "running", time.time())])
+    antiga.commit()
+    antiga.close()
+
+    ledger = LedgerStripe(caminho)
+    assert ledger.contagem() == {"done": 1, "queued": 1}
+    assert ledger.registrar(*_evento(1)) is False  # já entregue antes da migração
+    vistos = []
+    ledger.processar(lambda ev: vistos.append(ev["id"]))
+    assert vistos == ["evt_2"]
+
+
+# ===============================
+#  Entrega no app (_cumprir_evento_stripe)
+# ===============================
+def _transacao(user_id, purpose, tx_ref, pacote=None, modelo=None):
+    conn = db_pool.get_connection()
+    cur = conn.execute(
+        "INSERT INTO transactions (user_id, purpose, pacote, modelo, imei, status, tx_ref, created_at) "
+        "VALUES (?, ?, ?, ?, '356000000000000', 'pending', ?, datetime('now'))",
+        (user_id, purpose, pacote, modelo, tx_ref))
+    conn.commit()
+    return cur.lastrowid
+
+
+def _cumprir(app_tlux, *evento):
+    app_tlux._cumprir_evento_stripe(json.loads(evento[2]))
+
+
+def test_pacote_pago_emite_uma_licenca_so(app_tlux, novo_usuario):
+    uid = novo_usuario()
+    tx_id = _transacao(uid, "package", "ref-pacote", pacote="Starter")
+    conn = db_pool.get_connection()
+
+    _cumprir(app_tlux, *_evento(10, tx_ref="ref-pacote", sessao="cs_pacote"))
+    chave = conn.execute("SELECT access_key FROM users WHERE id=?", (uid,)).fetchone()[0]
+    assert chave and chave.startswith("KEY-")
+    assert conn.execute("SELECT status, stripe_id FROM transactions WHERE id=?", (tx_id,)).fetchone()[:] == \
+        ("successful", "cs_pacote")
+
+    # Nova tentativa do mesmo pagamento (ex.: queda depois do commit): ja_pago
+    _cumprir(app_tlux, *_evento(11, tx_ref="ref-pacote", sessao="cs_pacote"))
+    assert conn.execute("SELECT access_key FROM users WHERE id=?", (uid,)).fetchone()[0] == chave
+
+
+def test_evento_sem_tx_ref_ou_sem_transacao_e_fatal(app_tlux):
+    evento = json.loads(_evento(20)[2])
+    evento["data"]["object"]["client_reference_id"] = None
+    with pytest.raises(JobFatal):
+        app_tlux._cumprir_evento_stripe(evento)
+    with pytest.raises(JobFatal):
+        _cumprir(app_tlux, *_evento(21, tx_ref="ref-que-nao-existe"))
+
+
+def test_outros_tipos_de_evento_sao_ignorados(app_tlux):
+    _cumprir(app_tlux, *_evento(30, tipo="payment_intent.created", tx_ref="ref-que-nao-existe"))
+
+
+def test_desbloqueio_pago_enfileira_a_ordem_uma_vez(app_tlux, novo_usuario):
+    tx_id = _transacao(novo_usuario(), "unlock", "ref-unlock", modelo="iPhone 11")
+
+    _cumprir(app_tlux, *_evento(40, tx_ref="ref-unlock", sessao="cs_unlock"))
+    _cumprir(app_tlux, *_evento(41, tx_ref="ref-unlock", sessao="cs_unlock"))
+
+    jobs = db_pool.get_connection().execute(
+        "SELECT payload FROM jobs WHERE kind=? AND idempotency_key=?",
+        (app_tlux.JOB_UNLOCK_ORDER, str(tx_id))).fetchall()
+    assert len(jobs) == 1
+    assert json.loads(jobs[0][0])["modelo"] == "iPhone 11"
+
@@ -0,0 +1,123 @@
+# test_tabela_precos.py — Livro de preços compilado e recarga a quente
+import json
+import os
+
+import pytest
+
+from tabela_precos import LivroPrecos, TabelaPrecos, normalizar_modelo
+
+TAXAS = {"USD": 1.0, "MZN": 63.0, "EUR": 0.92}
+
+PADRAO = {
+    "sinal": {"iPhone Xr": 79.37, "iPhone 11": 95.24, "iPhone SE (2nd Gen)": 47.62},
+    "sem_sinal": {"iPhone XR": 55.00, "iPhone 11": 66.00, "iPhone 5S": 10.00},
+    "custo_sinal": {"iPhone Xr": 90.00, "iPhone 11": 95.00, "iPhone SE (2nd gen)": 40.00},
+    "custo_sem_sinal": {"iPhone 11": 55.00, "iPhone SE (2ª Geração)": 55.00},
+    "unlock": {},
+    "service_ids": {"iPhone 6/6+": 2, "iPhone SE/6S/6S+": 3, "iPhone XR": 74, "iPhone 11": 75},
+    "pacotes": [{"nome": "Bronze", "dias": 30, "preco_usd": 39.00}],
+}
+
+
+def test_normalizar_modelo():
+    assert normalizar_modelo("  iPhone  Xr ") == normalizar_modelo("iPhone XR") == "iphone xr"
+    assert normalizar_modelo("iPhone SE (2ª Geração)") == normalizar_modelo("iPhone SE (2ND GEN)") == "iphone se (2nd gen)"
+    assert normalizar_modelo("iPhone 6S+") == normalizar_modelo("iPhone 6s Plus")
+
+
+def test_livro_unificado_mantem_a_precedencia_do_merge():
+    livro = LivroPrecos(PADRAO, TAXAS)
+    item = livro.preco("iPhone 11")
+    # Sem sinal sobrescreve com sinal; custo = tabela iRemoval padrão
+    assert (item.preco_usd, item.custo_usd, item.margem_usd) == (66.00, 95.00, -29.00)
+    assert item.service_id == 75
+    assert dict(item.locais) == {"USD": 66.0, "MZN": 4158.0, "EUR": 60.72}
+    assert item.preco_local("mzn") == 4158.0
+
+    # "(2nd Gen)" no preço e "(2nd gen)" no custo agora se encontram
+    assert livro.preco("iPhone SE (2nd Gen)").custo_usd == 40.00
+    assert livro.preco("iPhone Inexistente") is None
+
+
+def test_livro_sem_sinal_e_service_ids():
+    livro = LivroPrecos(PADRAO, TAXAS)
+    assert livro.preco("iPhone 11", sem_sinal=True).custo_usd == 55.00
+    assert livro.preco("iPhone 5S", sem_sinal=True).custo_usd is None
+    assert livro.service_id("iPhone Xr") == 74
+    assert [livro.service_id(m) for m in ("iPhone 6", "iPhone 6 Plus", "iPhone 6s Plus", "iPhone SE")] == [2, 2, 3, 3]
+    assert livro.pacote("bronze")["dias"] == 30
+    with pytest.raises(TypeError):
+        livro.pacote("Bronze")["dias"] = 1
+
+
+def test_recarga_a_quente(tmp_path):
+    arquivo = tmp_path / "precos.json"
+    tabela = TabelaPrecos(PADRAO, TAXAS, arquivo=str(arquivo), intervalo=0)
+    antes = tabela.atual()
+    assert antes.versao == 1 and antes.preco("iPhone 11").preco_usd == 66.00
+
+    arquivo.write_text(json.dumps({"unlock": {"iPhone 11": 70.0}}), encoding="utf-8")
+    depois = tabela.atual()
+    assert depois.versao == 2 and depois.preco("iPhone 11").preco_usd == 70.0
+    assert antes.preco("iPhone 11").preco_usd == 66.00  # livro antigo não muda
+
+    # JSON quebrado: mantém o livro atual
+    arquivo.write_text("{", encoding="utf-8")
+    os.utime(arquivo, (1, 1))
+    assert tabela.atual() is depois
+
+
+def test_xr_com_sinal_e_sem_sinal_continuam_distintos():
+    padrao = dict(PADRAO,
+                  sinal={"iPhone Xr": 79.37, "iPhone Xs": 82.54, "iPhone Xs Max": 87.30, "iPhone 11": 95.24},
+                  sem_sinal={"iPhone XR": 55.00, "iPhone XS": 60.00, "iPhone XS Max": 65.00, "iPhone 11": 66.00},
+                  custo_sinal={"iPhone Xr": 90.00, "iPhone Xs": 90.00, "iPhone Xs Max": 90.00})
+    livro = LivroPrecos(padrao, TAXAS)
+
+    # Os preços do MODELOS_IPHONE_USD antigo ({**sinal, **sem_sinal}) não mudam
+    baseline = {**padrao["sinal"], **padrao["sem_sinal"]}
+    assert {m: livro.preco(m).preco_usd for m in baseline} == baseline
+    assert dict(livro.modelos) == dict(sorted(baseline.items()))
+
+    assert (livro.preco("iPhone Xr").preco_usd, livro.preco("iPhone Xr").custo_usd) == (79.37, 90.00)
+    assert livro.preco("iPhone XR").custo_usd == 0.0  # sem custo exato, como antes
+    assert livro.preco("iphone xr") is None  # ambíguo: não escolhe um dos dois
+
+
+def test_precos_em_uma_moeda():
+    livro = LivroPrecos(PADRAO, TAXAS)
+    precos = livro.precos_em("mzn")
+    assert precos["iPhone 11"] == livro.preco("iPhone 11").preco_local("MZN") == 4158.0
+    assert livro.precos_em("MZN") is precos
+    with pytest.raises(KeyError):
+        livro.precos_em("ABC")
+
+
+def test_assinatura_depende_so_do_conteudo():
+    a, b = LivroPrecos(PADRAO, TAXAS, versao=1), LivroPrecos(PADRAO, TAXAS, versao=7)
+    assert a.assinatura == b.assinatura  # outro worker / reinício: mesmo ETag
+    assert LivroPrecos(PADRAO, dict(TAXAS, MZN=64.0)).assinatura != a.assinatura
+    assert LivroPrecos(dict(PADRAO, unlock={"iPhone 11": 70.0}), TAXAS).assinatura != a.assinatura
+
+
+@pytest.mark.parametrize("conteudo", [
+    [1, 2],
+    {"unlock": {"iPhone 11": None}},
+    {"pacotes": [{"dias": 30, "preco_usd": 39.0}]},
+])
+def test_arquivo_com_tipos_errados_usa_o_livro_atual(tmp_path, conteudo):
+    arquivo = tmp_path / "precos.json"
+    arquivo.write_text(json.dumps(conteudo), encoding="utf-8")
+
+    # Arranque: cai nos preços padrão em vez de derrubar o import do app
+    tabela = TabelaPrecos(PADRAO, TAXAS, arquivo=str(arquivo), intervalo=0)
+    assert tabela.atual().preco("iPhone 11").preco_usd == 66.00
+
+    # Recarga: mantém o livro que já estava em uso
+    arquivo.write_text(json.dumps({"unlock": {"iPhone 11": 70.0}}), encoding="utf-8")
+    os.utime(arquivo, (2, 2))
+    bom = tabela.atual()
+    assert bom.preco("iPhone 11").preco_usd == 70.0
+    arquivo.write_text(json.dumps(conteudo), encoding="utf-8")
+    os.utime(arquivo, (3, 3))
+    assert tabela.atual() is bom